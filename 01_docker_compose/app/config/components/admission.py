@@ -0,0 +1,36 @@
+"""Admission control settings, see "movies.admission"."""
+
+import os
+
+
+def _per_lane(name: str, default: str) -> dict:
+    """"admin=0,detail=0,..." environment value as {lane: number}."""
+    return {
+        lane.strip(): float(value)
+        for lane, _, value in (
+            pair.partition('=')
+            for pair in os.environ.get(name, default).split(',')
+            if pair.strip()
+        )
+    }
+
+
+# Requests of a lane served at once by a process, 0 - no limit. Lists
+# can't take every worker thread, admin and detail requests get the rest
+ADMISSION_CONCURRENCY = _per_lane(
+    'ADMISSION_CONCURRENCY', 'admin=0,detail=0,list=4,deep=1,export=1',
+)
+# Seconds a request may wait for a worker (nginx "X-Request-Start"),
+# a client which has waited longer is likely gone or about to retry
+ADMISSION_MAX_QUEUE_SECONDS = _per_lane(
+    'ADMISSION_MAX_QUEUE_SECONDS',
+    'admin=30,detail=5,list=2,deep=0.5,export=2',
+)
+# Seconds of SQL per request, what is left is the "statement_timeout", 0 - none
+ADMISSION_DB_BUDGET_SECONDS = _per_lane(
+    'ADMISSION_DB_BUDGET_SECONDS', 'admin=25,detail=2,list=5,deep=3,export=0',
+)
+# List pages after this one are "deep": OFFSET reads all the rows before
+ADMISSION_DEEP_PAGE = int(os.environ.get('ADMISSION_DEEP_PAGE', 20))
+# "Retry-After" seconds of shed requests
+ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 5))
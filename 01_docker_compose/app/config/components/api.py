@@ -0,0 +1,37 @@
+"""Movies API serving settings."""
+
+import os
+
+# Serve movies endpoints by async views, for ASGI (uvicorn) deployment
+API_ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS', False) == 'True'
+
+# Unfiltered list totals above this come from planner statistics
+API_COUNT_ESTIMATE_THRESHOLD = int(
+    os.environ.get('API_COUNT_ESTIMATE_THRESHOLD', 10000),
+)
+# Seconds to reuse exact totals of filtered lists
+API_COUNT_CACHE_TIMEOUT = int(os.environ.get('API_COUNT_CACHE_TIMEOUT', 60))
+# Days to keep change feed records, older ones are dropped by compaction
+API_CHANGES_RETENTION_DAYS = int(
+    os.environ.get('API_CHANGES_RETENTION_DAYS', 7),
+)
+# "orjson" (if installed, the stdlib encoder otherwise) or "stdlib"
+API_JSON_ENCODER = os.environ.get('API_JSON_ENCODER', 'orjson')
+# Directory of static API snapshots served by nginx, empty to disable
+API_SNAPSHOT_ROOT = os.environ.get('API_SNAPSHOT_ROOT', '')
+# Republish snapshots of the films whenever their documents change
+API_SNAPSHOT_ON_CHANGE = (
+    os.environ.get('API_SNAPSHOT_ON_CHANGE', 'True') == 'True'
+)
+# List pages republished right away when films are added, removed or
+# dated anew; the pages after them are removed till the next full publish
+API_SNAPSHOT_REORDER_PAGES = int(
+    os.environ.get('API_SNAPSHOT_REORDER_PAGES', 20),
+)
+# 11 is the densest, but several times slower than 9
+API_SNAPSHOT_BROTLI_QUALITY = int(
+    os.environ.get('API_SNAPSHOT_BROTLI_QUALITY', 9),
+)
+# Seconds to use a typeahead index before it is loaded anew, changes
+# made by other processes show up by then
+SUGGEST_MAX_AGE = int(os.environ.get('SUGGEST_MAX_AGE', 600))
@@ -3,5 +3,6 @@
 from config.components.base import INSTALLED_APPS
 
 INSTALLED_APPS += (
+    'django.contrib.postgres',
     'movies',
 )
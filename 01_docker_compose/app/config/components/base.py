@@ -16,6 +16,11 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE = [
+    # First, so it measures the other middleware too
+    'movies.metrics.metrics_middleware',
+    # Before the others, a shed request costs next to nothing
+    'movies.admission.admission_middleware',
+    'movies.db.read_your_writes_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "debug_toolbar.middleware.DebugToolbarMiddleware",
@@ -0,0 +1,34 @@
+"""Project cache settings."""
+
+import os
+
+_API_CACHE_BACKEND = os.environ.get(
+    'API_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache',
+)
+
+_SHARED = not _API_CACHE_BACKEND.endswith('LocMemCache')
+# Entries are evicted on catalogue changes, TTL is only a safety net. A
+# local memory cache is evicted only in the process which has made the
+# change: there the TTL is how long other workers may serve old bodies.
+_API_CACHE_TIMEOUT = 24 * 60 * 60 if _SHARED else 5
+
+# Rendered API responses. Local memory backend is LRU bounded by
+# MAX_ENTRIES, set e.g. "django.core.cache.backends.redis.RedisCache"
+# (needs "redis" package) to share the cache between workers, as
+# docker-compose.yml does.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': _API_CACHE_BACKEND,
+        'LOCATION': os.environ.get('API_CACHE_LOCATION', 'movies-api'),
+        'TIMEOUT': int(
+            os.environ.get('API_CACHE_TIMEOUT', _API_CACHE_TIMEOUT),
+        ),
+    },
+}
+if not _API_CACHE_BACKEND.endswith('RedisCache'):
+    CACHES['api']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.environ.get('API_CACHE_MAX_ENTRIES', 10000)),
+    }
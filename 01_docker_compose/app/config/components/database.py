@@ -13,9 +13,49 @@ DATABASES = {
         'PASSWORD': os.environ.get('DB_PASSWORD'),
         'HOST': os.environ.get('DB_HOST', _DB_DEFAULT_IP),
         'PORT': os.environ.get('DB_PORT', _DB_DEFAULT_PORT),
-        'OPTIONS': {
-            # Add our 'content' schem
-            'options': '-c search_path=public,content',
-        },
+        # Seconds to keep a connection between requests, 0 - close at once
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        # Ping a kept connection before a request uses it
+        'CONN_HEALTH_CHECKS':
+            os.environ.get('DB_CONN_HEALTH_CHECKS', False) == 'True',
+        # PgBouncer in transaction mode can't keep named cursors
+        'DISABLE_SERVER_SIDE_CURSORS':
+            os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', False) == 'True',
+        # Our 'content' schema is in the database search_path (see
+        # migrations), so connections don't need any startup options.
     },
 }
+
+# Read replicas of API film reads: comma separated "host" or "host:port",
+# the other connection settings are the primary ones
+for _number, _address in enumerate(filter(None, (
+    _address.strip()
+    for _address in os.environ.get('DB_REPLICA_HOSTS', '').split(',')
+)), 1):
+    _host, _, _port = _address.partition(':')
+    DATABASES['replica{0}'.format(_number)] = {
+        **DATABASES['default'],
+        'HOST': _host,
+        'PORT': _port or DATABASES['default']['PORT'],
+        # A replica which is down must not hold requests for long
+        'OPTIONS': {
+            'connect_timeout': int(
+                os.environ.get('DB_REPLICA_CONNECT_TIMEOUT', 2),
+            ),
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['movies.db.ReplicaRouter']
+# Seconds of replication lag which take a replica out of rotation
+DB_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+# Seconds between health checks of a replica (per process)
+DB_REPLICA_CHECK_INTERVAL = float(
+    os.environ.get('DB_REPLICA_CHECK_INTERVAL', 5),
+)
+# Seconds to skip a replica which failed its check
+DB_REPLICA_RETRY_AFTER = float(os.environ.get('DB_REPLICA_RETRY_AFTER', 30))
+# Seconds a client reads from the primary after it has written
+DB_READ_YOUR_WRITES_SECONDS = int(
+    os.environ.get('DB_READ_YOUR_WRITES_SECONDS', 10),
+)
@@ -0,0 +1,14 @@
+"""Request performance metrics settings."""
+
+import os
+
+# "Server-Timing" header with SQL and rendering time of each response
+METRICS_SERVER_TIMING = (
+    os.environ.get('METRICS_SERVER_TIMING', 'True') == 'True'
+)
+# Share of requests checked for repeated SQL (N+1 queries), 0..1
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 0.1))
+# Runs of the same SQL within a request reported as an N+1 pattern
+METRICS_REPEATED_SQL_THRESHOLD = int(
+    os.environ.get('METRICS_REPEATED_SQL_THRESHOLD', 5),
+)
@@ -12,6 +12,10 @@ DEBUG = os.environ.get('DEBUG', False) == 'True'
 include(
     'components/base.py',
     'components/database.py',
+    'components/cache.py',
+    'components/api.py',
+    'components/metrics.py',
+    'components/admission.py',
     'components/local.py',
     'components/apps.py',
 )
@@ -3,8 +3,11 @@
 from django.contrib import admin
 from django.urls import include, path
 
+from movies.metrics import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("movies.api.urls")),
     path("__debug__/", include("debug_toolbar.urls")),
+    path("metrics", metrics_view),
 ]
@@ -12,5 +12,8 @@ echo "DB started"
 echo "Apply DB migrations"
 python manage.py migrate
 
+echo "Build API read model"
+python manage.py rebuild_documents --if-empty
+
 
 exec "$@"
@@ -1,42 +1,341 @@
 """Admin panel models."""
 
-from django.contrib import admin
-from django.db.models import Prefetch
+from typing import Optional
 
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db.models import Case, IntegerField, QuerySet, When
+from django.forms.models import BaseInlineFormSet
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.translation import gettext_lazy as _
+
+from movies import bulk
 from movies import models as mov_model
+from movies.pagination import EstimatedCountPaginator
+from movies.search import match
+from movies.suggest import SUGGEST_MAX_LIMIT, get_index
+
+_CREDITS_PER_PAGE = 20
+# Merge target is picked from a list of the selected objects
+_MERGE_MAX_SELECTED = 100
+
+
+class _FilmTypeForm(forms.Form):
+    type = forms.ChoiceField(
+        label=_('type'),
+        choices=[
+            choice for choice in mov_model.FilmWork._FilmType.choices
+            if choice[0]
+        ],
+    )
+
+
+class _GenreForm(forms.Form):
+    genre = forms.ModelChoiceField(
+        label=_('genre'),
+        queryset=mov_model.Genre.objects.order_by('name'),
+    )
+
+
+class _MergeForm(forms.Form):
+    target = forms.ModelChoiceField(label=_('merge into'), queryset=None)
+
+    def __init__(self, *args, queryset: QuerySet, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['target'].queryset = queryset
+
+
+class _BulkActionsMixin:
+    """Bulk actions run as "BulkJob" chunks from a progress page.
+
+    An action asks for its parameters (if any) on an intermediate page,
+    then the selection is saved as a job and every request of the
+    progress page runs its next chunk, so no request runs long.
+    """
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path(
+                'bulk/<uuid:job_id>/',
+                self.admin_site.admin_view(self.bulk_job_view),
+                name='{0}_{1}_bulk_job'.format(*info),
+            ),
+            *super().get_urls(),
+        ]
+
+    def bulk_action(
+        self,
+        request,
+        queryset: QuerySet,
+        operation: str,
+        form: Optional[forms.Form] = None,
+        object_ids: Optional[QuerySet] = None,
+    ):
+        """Confirm the action and start the job of "operation"."""
+        if 'apply' in request.POST and (form is None or form.is_valid()):
+            params = {} if form is None else {
+                name: str(getattr(value, 'pk', value))
+                for name, value in form.cleaned_data.items()
+            }
+            if object_ids is None:
+                object_ids = queryset.values_list('pk', flat=True)
+            job = bulk.start_job(operation, object_ids, params)
+            info = self.model._meta.app_label, self.model._meta.model_name
+            return redirect(reverse(
+                'admin:{0}_{1}_bulk_job'.format(*info), args=[job.pk],
+            ))
+        context = {
+            **self.admin_site.each_context(request),
+            'title': self.get_action(request.POST['action'])[2],
+            'opts': self.model._meta,
+            'count': queryset.count(),
+            'form': form,
+            'media': self.media + (form.media if form else forms.Media()),
+            'action': request.POST['action'],
+            'action_checkbox_name': ACTION_CHECKBOX_NAME,
+            'selected': request.POST.getlist(ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+        }
+        return TemplateResponse(
+            request, 'admin/movies/bulk_action.html', context,
+        )
+
+    def has_bulk_job_permission(self, request, job) -> bool:
+        """Jobs of this admin model, with permissions of the operation."""
+        run = bulk.OPERATIONS.get(job.operation)
+        return run is not None and run.model is self.model and all(
+            getattr(self, 'has_{0}_permission'.format(permission))(request)
+            for permission in run.allowed_permissions
+        )
+
+    def bulk_job_view(self, request, job_id):
+        job = get_object_or_404(
+            mov_model.BulkJob.objects.defer('object_ids'), pk=job_id,
+        )
+        if not self.has_bulk_job_permission(request, job):
+            raise PermissionDenied
+        if request.method == 'POST':
+            bulk.run_next_chunk(job_id)
+            return redirect(request.path)
+        context = {
+            **self.admin_site.each_context(request),
+            'title': _('Bulk action progress'),
+            'opts': self.model._meta,
+            'job': job,
+        }
+        return TemplateResponse(request, 'admin/movies/bulk_job.html', context)
+
+    def merge_action(self, request, queryset: QuerySet, operation: str):
+        if queryset.count() > _MERGE_MAX_SELECTED:
+            self.message_user(
+                request,
+                _('Select at most %(count)d objects to merge.') % {
+                    'count': _MERGE_MAX_SELECTED,
+                },
+                messages.ERROR,
+            )
+            return None
+        data = request.POST if 'apply' in request.POST else None
+        form = _MergeForm(data, queryset=queryset)
+        object_ids = None
+        if form.is_bound and form.is_valid():
+            object_ids = queryset.exclude(
+                pk=form.cleaned_data['target'].pk,
+            ).values_list('pk', flat=True)
+        return self.bulk_action(
+            request, queryset, operation, form, object_ids=object_ids,
+        )
 
 
 @admin.register(mov_model.Genre)
-class GenreAdmin(admin.ModelAdmin):
+class GenreAdmin(_BulkActionsMixin, admin.ModelAdmin):
     """Admin model for ORM model "Genre"."""
+    ordering = ['name']
+    search_fields = ['name']
+    actions = ['merge_genres']
+
+    @admin.action(
+        description=_('Merge selected genres'),
+        permissions=['change', 'delete'],
+    )
+    def merge_genres(self, request, queryset):
+        return self.merge_action(request, queryset, 'merge_genres')
 
 
 @admin.register(mov_model.Person)
-class PersonAdmin(admin.ModelAdmin):
+class PersonAdmin(_BulkActionsMixin, admin.ModelAdmin):
     """Admin model for ORM model "Person"."""
     ordering = ['full_name']
     search_fields = ['full_name']
+    paginator = EstimatedCountPaginator
+    # Unfiltered total is a second COUNT(*) on every search
+    show_full_result_count = False
+    actions = ['merge_persons']
+
+    def get_search_results(self, request, queryset, search_term):
+        """Autocomplete by the typeahead index, best known persons first.
+
+        Persons are found by a prefix of their name words, without an
+        "icontains" scan per keystroke; the person list keeps it. The
+        index of the process lacks persons added by others till it is
+        reloaded, so a short result is completed by the database search.
+        """
+        match = request.resolver_match
+        autocomplete = match is not None and match.url_name == 'autocomplete'
+        if not autocomplete or not search_term.strip():
+            return super().get_search_results(
+                request, queryset, search_term,
+            )
+        person_ids = [
+            person_id for person_id, _full_name in get_index(
+                'persons',
+            ).search(search_term, SUGGEST_MAX_LIMIT)
+        ]
+        found = queryset.filter(pk__in=person_ids)
+        may_have_duplicates = False
+        if len(person_ids) < SUGGEST_MAX_LIMIT:
+            searched, may_have_duplicates = super().get_search_results(
+                request, queryset, search_term,
+            )
+            found |= searched
+        ranking = ['full_name']
+        if person_ids:
+            ranking.insert(0, Case(
+                *(
+                    When(pk=person_id, then=position)
+                    for position, person_id in enumerate(person_ids)
+                ),
+                default=len(person_ids),
+                output_field=IntegerField(),
+            ))
+        return found.order_by(*ranking), may_have_duplicates
+
+    @admin.action(
+        description=_('Merge selected persons'),
+        permissions=['change', 'delete'],
+    )
+    def merge_persons(self, request, queryset):
+        return self.merge_action(request, queryset, 'merge_persons')
 
 
 class _GenreFilmWorkInline(admin.TabularInline):
     model = mov_model.GenreFilmWork
+    autocomplete_fields = ['genre']
+    extra = 1
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('genre')
+
 
+class _LoadedAutocompleteSelect(AutocompleteSelect):
+    """Autocomplete which labels the selected option without a query.
 
-class _PersonFilmWorkInline(admin.StackedInline):
+    The stock widget fetches the selected object once per form, here the
+    form gives its already loaded one as "selected".
+    """
+
+    selected = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = self.selected
+        if selected is None or list(map(str, value)) != [str(selected.pk)]:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(self.create_option(
+            name, selected.pk, str(selected), True, len(options),
+        ))
+        return [(None, options, 0)]
+
+
+class _CreditsFormSet(BaseInlineFormSet):
+    """One page of film credits: a long-running show has thousands.
+
+    The page number comes from "page_param" of the change page URL. New
+    credits get to the last page, so earlier pages stay put between GET
+    and POST of the form.
+    """
+
+    page_param = 'credits_page'
+    # Set by "_PersonFilmWorkInline.get_formset"
+    query = None
+
+    def get_queryset(self):
+        if not hasattr(self, '_queryset'):
+            queryset = super().get_queryset().order_by('id')
+            paginator = Paginator(queryset, _CREDITS_PER_PAGE)
+            self.page = paginator.get_page(self.query.get(self.page_param))
+            self._queryset = self.page.object_list
+        return self._queryset
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        if form.instance.person_id is not None:
+            # Loaded by "select_related" of the inline queryset
+            form.fields['person'].widget.widget.selected = form.instance.person
+        return form
+
+    def page_url(self, number: int) -> str:
+        query = self.query.copy()
+        query[self.page_param] = number
+        return '?{0}'.format(query.urlencode())
+
+    def previous_url(self) -> str:
+        return self.page_url(self.page.previous_page_number())
+
+    def next_url(self) -> str:
+        return self.page_url(self.page.next_page_number())
+
+
+class _PersonFilmWorkInline(admin.TabularInline):
     model = mov_model.PersonFilmWork
+    formset = _CreditsFormSet
+    template = 'admin/movies/filmwork/credits_inline.html'
     autocomplete_fields = ['person']
-    list_prefetch_related = (Prefetch('film_work'), Prefetch('person'))
+    extra = 1
 
     def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related(
-            *self.list_prefetch_related
-        ).all()
+        return super().get_queryset(request).select_related('person')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'person':
+            kwargs['widget'] = _LoadedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get('using'),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.query = request.GET
+        return formset
+
+
+class _FilmWorkChangeList(ChangeList):
+
+    def get_queryset(self, request):
+        # Descriptions are long and never shown in the list
+        columns = {field.name for field in self.model._meta.concrete_fields}
+        return super().get_queryset(request).only(
+            'id', *(name for name in self.list_display if name in columns),
+        )
 
 
 @admin.register(mov_model.FilmWork)
-class FilmWorkAdmin(admin.ModelAdmin):
+class FilmWorkAdmin(_BulkActionsMixin, admin.ModelAdmin):
     """Admin model for ORM model "FilmWork"."""
 
+    paginator = EstimatedCountPaginator
+    # Unfiltered total is a second COUNT(*) on every search
+    show_full_result_count = False
     inlines = (_GenreFilmWorkInline, _PersonFilmWorkInline)
     list_display = (
         'title',
@@ -45,9 +344,53 @@ class FilmWorkAdmin(admin.ModelAdmin):
     )
     search_fields = ('title', 'description')
     list_filter = ('type',)
-    list_prefetch_related = (Prefetch('genres'), Prefetch('person'))
+    actions = [
+        'set_film_type', 'add_film_genre', 'remove_film_genre',
+        'delete_films',
+    ]
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related(
-            *self.list_prefetch_related
-        ).all()
+    def get_changelist(self, request, **kwargs):
+        return _FilmWorkChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search through the indexed API documents, not "icontains"."""
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        documents = match(
+            mov_model.FilmWorkDocument.objects.all(), search_term,
+        )
+        return queryset.filter(id__in=documents.values('id')), False
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        # Stock action deletes and signals credits one by one
+        actions.pop('delete_selected', None)
+        return actions
+
+    @admin.action(description=_('Change type'), permissions=['change'])
+    def set_film_type(self, request, queryset):
+        data = request.POST if 'apply' in request.POST else None
+        return self.bulk_action(
+            request, queryset, 'set_film_type', _FilmTypeForm(data),
+        )
+
+    @admin.action(description=_('Add genre'), permissions=['change'])
+    def add_film_genre(self, request, queryset):
+        data = request.POST if 'apply' in request.POST else None
+        return self.bulk_action(
+            request, queryset, 'add_film_genre', _GenreForm(data),
+        )
+
+    @admin.action(description=_('Remove genre'), permissions=['change'])
+    def remove_film_genre(self, request, queryset):
+        data = request.POST if 'apply' in request.POST else None
+        return self.bulk_action(
+            request, queryset, 'remove_film_genre', _GenreForm(data),
+        )
+
+    @admin.action(
+        description=_('Delete selected films'), permissions=['delete'],
+    )
+    def delete_films(self, request, queryset):
+        return self.bulk_action(request, queryset, 'delete_films')
@@ -0,0 +1,277 @@
+"""Admission control: shed excess load early instead of queueing it.
+
+A request falls into a lane by its view ("admission_lane" attribute of
+the view, "detail" by default) and query: "admin", "detail", "list",
+"deep" (list pages after "ADMISSION_DEEP_PAGE") and "export". A lane
+has, per process:
+
+* a concurrency limit, so list pages can't take every worker thread
+  and admin and detail requests always find a free one;
+* a queue time limit: nginx stamps "X-Request-Start", and a request
+  which has waited for a worker longer than its lane allows is not
+  served at all;
+* a database time budget: what is left of it is the
+  "statement_timeout" of the connection, and a request which has
+  spent it runs no more queries.
+
+Such requests get a fast 503 with "Retry-After", counted in
+"http_requests_shed_total" metric. Limits hold per process: multiply
+them by gunicorn workers, which need threads ("gthread") for a lane to
+have any company.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import math
+import threading
+import time
+from collections import Counter
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.urls import Resolver404, resolve
+from django.utils.decorators import sync_and_async_middleware
+
+from movies.metrics import registry, request_stats
+
+ADMIN = 'admin'
+DETAIL = 'detail'
+LIST = 'list'
+DEEP = 'deep'
+EXPORT = 'export'
+
+REQUEST_START_HEADER = 'HTTP_X_REQUEST_START'
+# "query_canceled": statement_timeout has expired
+_QUERY_CANCELED = '57014'
+_NO_TIMEOUT = 0
+# Share of the budget the timeout may lag behind what is left of it:
+# every change of the timeout is a round trip
+_TIMEOUT_STEP = 0.1
+
+
+class DatabaseBudgetExceeded(OperationalError):
+    """The request has spent its database time."""
+
+
+_budget: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    'db_budget', default=None,
+)
+_lock = threading.Lock()
+_in_flight = Counter()
+
+
+def _page_number(request: HttpRequest) -> int:
+    page = request.GET.get('page')
+    if page == 'last':
+        return math.inf
+    try:
+        return int(page or 1)
+    except ValueError:
+        return 1
+
+
+def request_lane(request: HttpRequest) -> str:
+    try:
+        match = resolve(request.path_info, getattr(request, 'urlconf', None))
+    except Resolver404:
+        return DETAIL
+    if ADMIN in match.namespaces:
+        return ADMIN
+    view = getattr(match.func, 'view_class', match.func)
+    lane = getattr(view, 'admission_lane', DETAIL)
+    if lane == LIST and _page_number(request) > settings.ADMISSION_DEEP_PAGE:
+        return DEEP
+    return lane
+
+
+def _queue_seconds(request: HttpRequest) -> Optional[float]:
+    """Time since nginx has received the request, "t=<seconds>"."""
+    stamp = request.META.get(REQUEST_START_HEADER, '')
+    try:
+        return time.time() - float(stamp.removeprefix('t='))
+    except ValueError:
+        return None
+
+
+def _admit(lane: str) -> Optional[str]:
+    """Take a place in the lane, or return why the request is shed."""
+    with _lock:
+        limit = settings.ADMISSION_CONCURRENCY.get(lane, 0)
+        if limit and _in_flight[lane] >= limit:
+            return 'concurrency'
+        _in_flight[lane] += 1
+        registry.set_in_flight(lane, _in_flight[lane])
+    return None
+
+
+def _leave(lane: str) -> None:
+    with _lock:
+        _in_flight[lane] -= 1
+        registry.set_in_flight(lane, _in_flight[lane])
+
+
+def _shed(lane: str, reason: str) -> JsonResponse:
+    registry.observe_shed(lane, reason)
+    response = JsonResponse({'error': 'overloaded, retry later'}, status=503)
+    response['Retry-After'] = str(settings.ADMISSION_RETRY_AFTER)
+    return response
+
+
+def _enter(request: HttpRequest) -> tuple[str, Optional[HttpResponse]]:
+    lane = request_lane(request)
+    request.admission_lane = lane
+    waited = _queue_seconds(request)
+    max_wait = settings.ADMISSION_MAX_QUEUE_SECONDS.get(lane, 0)
+    if waited is not None and max_wait and waited > max_wait:
+        return lane, _shed(lane, 'queue')
+    reason = _admit(lane)
+    if reason is not None:
+        return lane, _shed(lane, reason)
+    return lane, None
+
+
+def _released(content: Iterator, lane: str) -> Iterator:
+    try:
+        yield from content
+    finally:
+        _leave(lane)
+
+
+def _exit(lane: str, response: HttpResponse) -> HttpResponse:
+    if response.streaming:
+        # Served while the server iterates it, after the middleware
+        response.streaming_content = _released(
+            response.streaming_content, lane,
+        )
+    else:
+        _leave(lane)
+    return response
+
+
+def _settable(connection) -> bool:
+    """Whether a session setting can be made by the next query."""
+    # PgBouncer in transaction mode would pass a session setting to
+    # other clients, the budget is checked between queries only there.
+    # A rollback would undo a setting made in a transaction: it is made
+    # by an earlier query of the request (session, user) instead.
+    return not (
+        connection.in_atomic_block or
+        connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS')
+    )
+
+
+def _set_timeout(connection, timeout: int) -> None:
+    with connection.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('statement_timeout', %s, false)",
+            ['{0}ms'.format(timeout)],
+        )
+    connection.statement_timeout = timeout
+
+
+def _outdated(current: Optional[int], timeout: int, budget: int) -> bool:
+    """Whether the timeout of the session, in ms, is to be changed."""
+    if not (current and timeout):
+        return current != timeout
+    # It only grows with a new request
+    return timeout > current or current - timeout >= budget * _TIMEOUT_STEP
+
+
+@contextlib.contextmanager
+def unbudgeted() -> Iterator[None]:
+    """Lift the database budget of the request in the block.
+
+    For the work a request has already committed to, e.g. "on_commit"
+    callbacks: a 503 after the commit would only hide its outcome.
+    """
+    token = _budget.set(None)
+    try:
+        # Its queries may run in a transaction, which can't clear the
+        # timeout the request has set: it is cleared before them
+        for connection in connections.all():
+            limited = getattr(connection, 'statement_timeout', None)
+            if limited and connection.connection and _settable(connection):
+                _set_timeout(connection, _NO_TIMEOUT)
+        yield
+    finally:
+        _budget.reset(token)
+
+
+def enforce_budget(execute, sql, params, many, context):
+    """Execute wrapper, installed on every connection."""
+    budget = _budget.get()
+    if budget is None:
+        return execute(sql, params, many, context)
+    stats = request_stats()
+    spent = stats.db_seconds if stats is not None else 0
+    if budget and spent >= budget:
+        raise DatabaseBudgetExceeded(
+            'Database time budget of {0} s is spent'.format(budget),
+        )
+    connection = context['connection']
+    # No budget is 0, which clears a timeout left by another lane
+    timeout = math.ceil((budget - spent) * 1000) if budget else _NO_TIMEOUT
+    current = connection.statement_timeout
+    if _settable(connection) and _outdated(current, timeout, budget * 1000):
+        _set_timeout(connection, timeout)
+    return execute(sql, params, many, context)
+
+
+def install_wrapper(sender, connection, **kwargs) -> None:
+    """"connection_created" handler."""
+    # New session, with the server default
+    connection.statement_timeout = None
+    if enforce_budget not in connection.execute_wrappers:
+        connection.execute_wrappers.append(enforce_budget)
+
+
+def _process_exception(request, exception) -> Optional[HttpResponse]:
+    """Answer 503 to a request which has run out of database time."""
+    cause = exception.__cause__
+    canceled = getattr(cause, 'pgcode', None) == _QUERY_CANCELED
+    if isinstance(exception, DatabaseBudgetExceeded) or canceled:
+        return _shed(request.admission_lane, 'db_budget')
+    return None
+
+
+@sync_and_async_middleware
+def admission_middleware(get_response):
+    """Admit or shed each request, see the module docstring."""
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            lane, response = _enter(request)
+            if response is not None:
+                return response
+            token = _budget.set(
+                settings.ADMISSION_DB_BUDGET_SECONDS.get(lane, 0),
+            )
+            try:
+                response = await get_response(request)
+            except BaseException:
+                _leave(lane)
+                raise
+            finally:
+                _budget.reset(token)
+            return _exit(lane, response)
+    else:
+        def middleware(request):
+            lane, response = _enter(request)
+            if response is not None:
+                return response
+            token = _budget.set(
+                settings.ADMISSION_DB_BUDGET_SECONDS.get(lane, 0),
+            )
+            try:
+                response = get_response(request)
+            except BaseException:
+                _leave(lane)
+                raise
+            finally:
+                _budget.reset(token)
+            return _exit(lane, response)
+    # Django calls it for exceptions of views, as of a middleware class
+    middleware.process_exception = _process_exception
+    return middleware
@@ -0,0 +1,116 @@
+"""Async variants of movies endpoints for ASGI deployment.
+
+Django 4.0 ORM is synchronous, so every database call runs in a pool
+thread with its own connection: a slow query holds one thread, not the
+event loop. Independent queries of a page run concurrently.
+"""
+
+import asyncio
+import math
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+
+from movies import cache as api_cache
+from movies.db import read_alias, reads_from
+from movies.api.v1.views import MoviesDetailApi, MoviesListApi
+from movies.encoding import parse_fields
+from movies.pagination import InvalidCursor
+from movies.search import InvalidFilter
+
+
+def _in_thread(func):
+    """Awaitable running "func" in a pool thread.
+
+    Pool threads don't see request signals, so connections are recycled
+    (according to CONN_MAX_AGE) around each call.
+    """
+    def call(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False)
+
+
+def _cache_lookup(view: MoviesListApi) -> tuple:
+    key = view.get_cache_key()
+    return key, api_cache.get(key)
+
+
+async def _page_rows(view: MoviesListApi) -> tuple[dict, list[dict]]:
+    """Page number mode: the total and page rows are read concurrently."""
+    try:
+        number = int(view.request.GET.get('page') or 1)
+    except ValueError:
+        raise Http404('Invalid page')
+    if number < 1:
+        raise Http404('Invalid page')
+    per_page = view.paginate_by
+    offset = (number - 1) * per_page
+    queryset = view.object_list.order_by(*view.get_ordering())
+    paginator = view.get_paginator(queryset, per_page)
+
+    count, rows = await asyncio.gather(
+        _in_thread(lambda: paginator.count)(),
+        _in_thread(
+            lambda: list(queryset[offset:offset + per_page].values(
+                'id', 'modified',
+            )),
+        )(),
+    )
+    total_pages = max(1, math.ceil(count / per_page))
+    if number > total_pages:
+        raise Http404('Invalid page')
+
+    context = {
+        'count': count,
+        'count_exact': paginator.count_exact,
+        'total_pages': total_pages,
+        'prev': number - 1 if number > 1 else None,
+        'next': number + 1 if number < total_pages else None,
+    }
+    return context, rows
+
+
+async def movies_list(request, *args, **kwargs) -> HttpResponse:
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    # Pool threads copy the context, so they read from the same database
+    with reads_from(await _in_thread(read_alias)(request)):
+        return await _movies_list(request, *args, **kwargs)
+
+
+movies_list.admission_lane = MoviesListApi.admission_lane
+
+
+async def _movies_list(request, *args, **kwargs) -> HttpResponse:
+    view = MoviesListApi()
+    view.setup(request, *args, **kwargs)
+
+    key, entry = await _in_thread(_cache_lookup)(view)
+    if entry is not None:
+        return view.render_cached(entry)
+
+    try:
+        fields = parse_fields(request.GET)
+        view.object_list = view.get_queryset()
+        # Keyset pages are one query anyway, "last" page needs the count
+        if 'cursor' in request.GET or request.GET.get('page') == 'last':
+            context, rows = await _in_thread(view.get_page_rows)()
+        else:
+            context, rows = await _page_rows(view)
+    except (InvalidCursor, InvalidFilter) as exc:
+        return view.bad_request(exc)
+    return await _in_thread(view.respond)(key, context, rows, fields)
+
+
+async def movie_detail(request, pk, *args, **kwargs) -> HttpResponse:
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    view = MoviesDetailApi()
+    view.setup(request, *args, pk=pk, **kwargs)
+    with reads_from(await _in_thread(read_alias)(request)):
+        return await _in_thread(view.get)(request, *args, pk=pk, **kwargs)
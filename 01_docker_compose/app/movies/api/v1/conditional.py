@@ -0,0 +1,53 @@
+"""HTTP validators (ETag, Last-Modified) of API responses."""
+
+import datetime
+import hashlib
+from calendar import timegm
+from typing import Iterable, NamedTuple, Optional
+
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime.datetime]
+
+
+def make_validators(
+    parts: Iterable,
+    last_modified: Optional[datetime.datetime],
+) -> Validators:
+    """Build validators from anything which identifies a representation."""
+    digest = hashlib.md5(repr(tuple(parts)).encode())  # noqa: S303
+    return Validators(quote_etag(digest.hexdigest()), last_modified)
+
+
+def _timestamp(moment: Optional[datetime.datetime]) -> Optional[int]:
+    if moment is None:
+        return None
+    return timegm(moment.utctimetuple())
+
+
+def not_modified(
+    request: HttpRequest,
+    validators: Validators,
+) -> Optional[HttpResponse]:
+    """304 (or 412) response if the client copy is still valid."""
+    response = get_conditional_response(
+        request,
+        etag=validators.etag,
+        last_modified=_timestamp(validators.last_modified),
+    )
+    if response is not None:
+        set_validators(response, validators)
+    return response
+
+
+def set_validators(response: HttpResponse, validators: Validators) -> None:
+    response.headers['ETag'] = validators.etag
+    if validators.last_modified is not None:
+        response.headers['Last-Modified'] = http_date(
+            _timestamp(validators.last_modified),
+        )
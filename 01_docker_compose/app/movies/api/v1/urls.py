@@ -1,8 +1,44 @@
+from django.conf import settings
 from django.urls import path
 
-from movies.api.v1.views import MoviesDetailApi, MoviesListApi
+from movies.api.v1 import async_views
+from movies.api.v1.views import (
+    CacheStatsApi,
+    ChangesApi,
+    GenreFilmsApi,
+    GenresListApi,
+    MoviesBatchApi,
+    MoviesDetailApi,
+    MoviesExportApi,
+    MoviesListApi,
+    PersonDetailApi,
+    PersonsListApi,
+    SuggestApi,
+)
 
-urlpatterns = [
-    path("movies/", MoviesListApi.as_view()),
-    path("movies/<uuid:pk>/", MoviesDetailApi.as_view()),
+if settings.API_ASYNC_VIEWS:
+    urlpatterns = [
+        path("movies/", async_views.movies_list),
+        path("movies/<uuid:pk>/", async_views.movie_detail),
+        # Django 4.0 ASGI handler iterates streaming responses in the event
+        # loop, where ORM is forbidden: NDJSON export needs a WSGI server.
+    ]
+else:
+    urlpatterns = [
+        path("movies/", MoviesListApi.as_view()),
+        path("movies/<uuid:pk>/", MoviesDetailApi.as_view()),
+        path("movies/export/", MoviesExportApi.as_view()),
+    ]
+
+urlpatterns += [
+    path("movies/batch/", MoviesBatchApi.as_view()),
+    # Also without the slash: APPEND_SLASH can't redirect a POST body
+    path("movies/batch", MoviesBatchApi.as_view()),
+    path("persons/", PersonsListApi.as_view()),
+    path("persons/<uuid:pk>/", PersonDetailApi.as_view()),
+    path("genres/", GenresListApi.as_view()),
+    path("genres/<uuid:pk>/films/", GenreFilmsApi.as_view()),
+    path("suggest/", SuggestApi.as_view()),
+    path("changes/", ChangesApi.as_view()),
+    path("cache/stats/", CacheStatsApi.as_view()),
 ]
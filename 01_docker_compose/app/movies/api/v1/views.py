@@ -1,67 +1,227 @@
-from django.contrib.postgres.aggregates import ArrayAgg
-from django.db.models import QuerySet, Q
-from django.http import JsonResponse
+import json
+import uuid
+from http import HTTPStatus
+from typing import Optional
+
+from django.core.exceptions import PermissionDenied
+from django.db.models import QuerySet
+from django.http import (
+    Http404,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
 from django.views.generic.detail import BaseDetailView
 from django.views.generic.list import BaseListView
 
-from movies.models import FilmWork, PersonFilmWork
-
-
-PersonRole = PersonFilmWork.Role
+from movies import cache as api_cache
+from movies.admission import EXPORT, LIST
+from movies.api.v1.conditional import (
+    Validators,
+    make_validators,
+    not_modified,
+    set_validators,
+)
+from movies.db import read_alias, reads_from
+from movies.encoding import dumps, document_json, parse_fields, with_results
+from movies.export import export_lines, export_window, parse_modified_since
+from movies.metrics import rendering
+from movies.models import (
+    FilmWorkDocument,
+    Genre,
+    GenreFilmWork,
+    Person,
+    PersonFilmWork,
+)
+from movies.outbox import (
+    CHANGES_PAGE_SIZE,
+    changes_page,
+    decode_position,
+    encode_position,
+)
+from movies.pagination import (
+    CursorPaginator,
+    EstimatedCountPaginator,
+    InvalidCursor,
+    PersonCursorPaginator,
+    estimate_count,
+)
+from movies.search import (
+    FILTER_PARAMS,
+    InvalidFilter,
+    filter_documents,
+    is_filtered,
+    ordering,
+)
+from movies.serializers import ROLE_KEYS
+from movies.suggest import SUGGEST_MAX_LIMIT, suggest
 
 
 MoviesList = dict[int, int, int, int, list]
 
 MOVIES_PER_PAGE = 50
+BATCH_MAX_IDS = 200
+PERSONS_PER_PAGE = 50
+FILMOGRAPHY_PER_PAGE = 50
+SUGGESTIONS = 10
+# Films of person and genre pages, read from the document columns
+FILM_SUMMARY_FIELDS = ('id', 'title', 'creation_date', 'rating', 'type')
+
+_CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
 
 
 class MoviesApiMixin:
-    model = FilmWork
+    """Films are served from the precomputed "FilmWorkDocument" rows.
+
+    Validators come from "FilmWorkDocument.modified", so a conditional
+    request is answered with 304 before any document is read.
+    """
+
+    model = FilmWorkDocument
     http_method_names = ['get']
 
-    def get_queryset(self) -> QuerySet[FilmWork]:
-        return self.model.objects.all()
+    def dispatch(self, request, *args, **kwargs) -> HttpResponse:
+        # Film reads may be served by a read replica
+        with reads_from(read_alias(request)):
+            return super().dispatch(request, *args, **kwargs)
 
-    def render_to_response(self, context, **response_kwargs):
-        return JsonResponse(context)
+    def get_queryset(self) -> QuerySet[FilmWorkDocument]:
+        return self.model.objects.all()
 
-    @staticmethod
-    def get_person_aggregation(role: PersonRole):
-        return ArrayAgg(
-            'person__full_name',
-            filter=Q(person__personfilmwork__role=str(role)),
-            distinct=True
-        )
+    def render_json(self, content: bytes) -> HttpResponse:
+        response = HttpResponse(content, content_type='application/json')
+        response['X-Cache'] = 'MISS'
+        return response
 
     @staticmethod
-    def model_to_dict(fw_queryset: QuerySet) -> dict:
-        genre_list = ArrayAgg('genres__name', distinct=True)
-        actors = MoviesApiMixin.get_person_aggregation(PersonRole.ACTOR)
-        directors = MoviesApiMixin.get_person_aggregation(PersonRole.DIRECTOR)
-        writers = MoviesApiMixin.get_person_aggregation(PersonRole.WRITER)
-
-        queryset = fw_queryset.annotate(genre_list=genre_list).annotate(
-            actors=actors).annotate(directors=directors).annotate(
-            writers=writers)
-
-        tmp = list(queryset.values().all())
-        context = list()
-        for entry in tmp:
-            res = {
-                ("genres" if k == "genre_list" else k): v for (k, v) in
-                entry.items()
-            }
-            del res["created"], res["modified"]
-            context.append(res)
+    def bad_request(exc: ValueError) -> JsonResponse:
+        if isinstance(exc, InvalidCursor):
+            return JsonResponse({'error': 'invalid cursor'}, status=400)
+        return JsonResponse({'error': str(exc)}, status=400)
 
-        return context
+    def render_cached(self, entry: tuple[bytes, Validators]) -> HttpResponse:
+        content, validators = entry
+        response = not_modified(self.request, validators)
+        if response is None:
+            response = HttpResponse(content, content_type='application/json')
+            set_validators(response, validators)
+        response['X-Cache'] = 'HIT'
+        return response
 
 
 class MoviesListApi(MoviesApiMixin, BaseListView):
+    admission_lane = LIST
     paginate_by = MOVIES_PER_PAGE
+    paginator_class = EstimatedCountPaginator
+    # Only these parameters change the response (and its cache key)
+    cache_params = ('page', 'cursor', 'count', 'fields', *FILTER_PARAMS)
+
+    def get(self, request, *args, **kwargs) -> HttpResponse:
+        key = self.get_cache_key()
+        entry = api_cache.get(key)
+        if entry is not None:
+            return self.render_cached(entry)
+
+        try:
+            fields = parse_fields(request.GET)
+            self.object_list = self.get_queryset()
+            context, rows = self.get_page_rows()
+        except (InvalidCursor, InvalidFilter) as exc:
+            return self.bad_request(exc)
+        return self.respond(key, context, rows, fields)
+
+    def get_queryset(self) -> QuerySet[FilmWorkDocument]:
+        return filter_documents(super().get_queryset(), self.request.GET)
+
+    def get_ordering(self) -> tuple:
+        return ordering(self.request.GET)
+
+    def get_cache_key(self) -> str:
+        return api_cache.list_key(
+            (
+                (name, value)
+                for name, values in self.request.GET.lists()
+                if name in self.cache_params
+                for value in values
+            ),
+            filtered=is_filtered(self.request.GET),
+        )
+
+    def respond(
+        self,
+        key: str,
+        context: dict,
+        rows: list,
+        fields: Optional[tuple] = None,
+    ) -> HttpResponse:
+        """Answer (and cache) the page, or 304 if the client has it."""
+        response = not_modified(
+            self.request, self.page_validators(context, fields, rows),
+        )
+        if response is not None:
+            response['X-Cache'] = 'MISS'
+            return response
+
+        documents = {
+            film_id: (modified, body)
+            for film_id, modified, body in self.model.objects.filter(
+                id__in=[row['id'] for row in rows],
+            ).annotate(
+                body=document_json(fields),
+            ).values_list('id', 'modified', 'body')
+        }
+        # Films may have changed or gone since the page rows were read:
+        # the page and its validators are made of the documents served
+        rows = [
+            {'id': row['id'], 'modified': documents[row['id']][0]}
+            for row in rows
+            if row['id'] in documents
+        ]
+        validators = self.page_validators(context, fields, rows)
+        with rendering():
+            content = with_results(
+                context,
+                (documents[row['id']][1].encode() for row in rows),
+            )
+        response = self.render_json(content)
+        set_validators(response, validators)
+        if response.status_code == HTTPStatus.OK:
+            api_cache.set_list(
+                key,
+                (response.content, validators),
+                [row['id'] for row in rows],
+            )
+        return response
+
+    @staticmethod
+    def page_validators(
+        context: dict,
+        fields: Optional[tuple],
+        rows: list,
+    ) -> Validators:
+        return make_validators(
+            (context, fields, [(row['id'], row['modified']) for row in rows]),
+            max((row['modified'] for row in rows), default=None),
+        )
+
+    def paginate_queryset(self, queryset: QuerySet, page_size: int) -> tuple:
+        if self.request.GET.get(self.page_kwarg) != 'last':
+            return super().paginate_queryset(queryset, page_size)
+        # Not the page of the estimated total, which may be short
+        paginator = self.get_paginator(queryset, page_size)
+        page = paginator.last_page()
+        return paginator, page, page.object_list, page.has_other_pages()
 
-    def get_context_data(self, *, object_list=None, **kwargs) -> MoviesList:
-        queryset = self.object_list
+    def get_page_rows(self) -> tuple[dict, list[dict]]:
+        """Pagination part of the response and (id, modified) of films."""
+        # "cursor" (even empty) switches the endpoint to keyset pagination
+        if 'cursor' in self.request.GET:
+            return self.get_cursor_page_rows(self.request.GET['cursor'])
+
+        queryset = self.object_list.order_by(*self.get_ordering())
         paginator, page, queryset, is_paginated = self.paginate_queryset(
             queryset,
             self.paginate_by
@@ -69,20 +229,361 @@ class MoviesListApi(MoviesApiMixin, BaseListView):
 
         context = {
             'count': paginator.count,
+            'count_exact': paginator.count_exact,
             "total_pages": paginator.num_pages,
             "prev":
                 page.previous_page_number() if page.has_previous() else None,
             "next":
                 page.next_page_number() if page.has_next() else None,
-            "results": self.model_to_dict(queryset),
         }
 
-        return context
+        return context, list(queryset.values('id', 'modified'))
+
+    def get_cursor_page_rows(self, cursor: str) -> tuple[dict, list[dict]]:
+        if self.request.GET.get('sort'):
+            raise InvalidFilter('cursor pages are sorted by creation date')
+        paginator = CursorPaginator(self.object_list, self.paginate_by)
+        rows, next_cursor = paginator.split(list(
+            paginator.page(cursor).values('id', 'creation_date', 'modified'),
+        ))
+        # Total is optional here: exact COUNT(*) is what we try to avoid
+        count = None
+        if self.request.GET.get('count') == 'estimate':
+            count = estimate_count(self.model)
+
+        return {
+            'count': count,
+            'count_exact': False,
+            'next_cursor': next_cursor,
+        }, rows
 
 
 class MoviesDetailApi(MoviesApiMixin, BaseDetailView):
 
-    def get(self, request, pk, *args, **kwargs) -> JsonResponse:
-        queryset = self.model.objects.filter(pk=pk)
-        context = self.model_to_dict(queryset)
-        return JsonResponse(context[0])
+    def get(self, request, pk, *args, **kwargs) -> HttpResponse:
+        try:
+            fields = parse_fields(request.GET)
+        except InvalidFilter as exc:
+            return self.bad_request(exc)
+        # Only whole documents are cached, parts are cheap column reads
+        if fields is None:
+            entry = api_cache.get(api_cache.detail_key(pk))
+            if entry is not None:
+                return self.render_cached(entry)
+
+        queryset = self.get_queryset().filter(pk=pk).annotate(
+            body=document_json(fields),
+        )
+        # Don't read the document at all when the client copy may be valid
+        conditional = any(
+            header in request.META for header in _CONDITIONAL_HEADERS
+        )
+        row = queryset.values(
+            'modified', *(() if conditional else ('body',)),
+        ).first()
+        if row is None:
+            raise Http404
+        validators = self.get_validators(pk, fields, row['modified'])
+        response = not_modified(request, validators)
+        if response is not None:
+            response['X-Cache'] = 'MISS'
+            return response
+
+        if conditional:
+            row = queryset.values('body').first()
+            if row is None:
+                raise Http404
+        response = self.render_json(row['body'].encode())
+        set_validators(response, validators)
+        if fields is None:
+            api_cache.set_detail(pk, (response.content, validators))
+        return response
+
+    @staticmethod
+    def get_validators(pk, fields: Optional[tuple], modified) -> Validators:
+        return make_validators((pk, fields, modified), modified)
+
+
+def _parse_ids(values: list) -> list[uuid.UUID]:
+    if not values:
+        raise InvalidFilter('ids are required')
+    if len(values) > BATCH_MAX_IDS:
+        raise InvalidFilter('at most {0} ids'.format(BATCH_MAX_IDS))
+    try:
+        film_ids = [uuid.UUID(str(value).strip()) for value in values]
+    except ValueError:
+        raise InvalidFilter('invalid id')
+    return list(dict.fromkeys(film_ids))
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class MoviesBatchApi(MoviesApiMixin, View):
+    """Films of a list of ids, in the order of the list.
+
+    Ids are "ids" parameter (comma separated) of GET or "ids" list of POST
+    JSON body. Documents come from the detail cache, the rest is read by
+    a single query and cached for the detail endpoint as well.
+    """
+
+    admission_lane = LIST
+    http_method_names = ['get', 'post']
+
+    def get(self, request, *args, **kwargs) -> HttpResponse:
+        ids = request.GET.get('ids', '')
+        return self.respond(ids.split(',') if ids else [])
+
+    def post(self, request, *args, **kwargs) -> HttpResponse:
+        try:
+            ids = json.loads(request.body)['ids']
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': 'invalid body'}, status=400)
+        if not isinstance(ids, list):
+            return JsonResponse({'error': 'invalid body'}, status=400)
+        return self.respond(ids)
+
+    def respond(self, ids: list) -> HttpResponse:
+        try:
+            fields = parse_fields(self.request.GET)
+            film_ids = _parse_ids(ids)
+        except InvalidFilter as exc:
+            return self.bad_request(exc)
+
+        documents = {}
+        # Only whole documents are cached, as by the detail endpoint
+        if fields is None:
+            documents = {
+                film_id: content
+                for film_id, (content, _) in api_cache.get_details(
+                    film_ids,
+                ).items()
+            }
+        absent = [film_id for film_id in film_ids if film_id not in documents]
+        if absent:
+            rows = self.get_queryset().filter(id__in=absent).annotate(
+                body=document_json(fields),
+            ).values_list('id', 'modified', 'body')
+            entries = {}
+            for film_id, modified, body in rows:
+                documents[film_id] = body.encode()
+                entries[film_id] = (
+                    documents[film_id],
+                    MoviesDetailApi.get_validators(film_id, None, modified),
+                )
+            if fields is None:
+                api_cache.set_details(entries)
+
+        missing = [
+            str(film_id) for film_id in film_ids if film_id not in documents
+        ]
+        with rendering():
+            content = with_results({'missing': missing}, (
+                documents[film_id] for film_id in film_ids
+                if film_id in documents
+            ))
+        return self.render_json(content)
+
+
+class MoviesExportApi(View):
+    """Whole catalogue (or its changes) as NDJSON stream of film documents.
+
+    "X-Modified-Until" header is the "modified_since" of the next pull.
+    Pulls may overlap, the last document of a film id is the current one.
+    """
+
+    admission_lane = EXPORT
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs) -> HttpResponse:
+        modified_since = None
+        if request.GET.get('modified_since'):
+            try:
+                modified_since = parse_modified_since(
+                    request.GET['modified_since'],
+                )
+            except ValueError:
+                return JsonResponse(
+                    {'error': 'invalid modified_since'}, status=400,
+                )
+        modified_until = export_window(modified_since)
+
+        response = StreamingHttpResponse(
+            export_lines(modified_since, modified_until),
+            content_type='application/x-ndjson',
+        )
+        if modified_until is not None:
+            response['X-Modified-Until'] = modified_until.isoformat()
+        return response
+
+
+class ChangesApi(View):
+    """Change feed: ids of films changed after the cursor position.
+
+    An empty "cursor" starts from the oldest kept change. "next_cursor"
+    is the position to pass next time, also when nothing was returned.
+    """
+
+    admission_lane = LIST
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs) -> JsonResponse:
+        try:
+            position = None
+            if request.GET.get('cursor'):
+                position = decode_position(request.GET['cursor'])
+            limit = int(request.GET.get('limit', CHANGES_PAGE_SIZE))
+        except InvalidCursor:
+            return JsonResponse({'error': 'invalid cursor'}, status=400)
+        except ValueError:
+            return JsonResponse({'error': 'invalid limit'}, status=400)
+        if not 0 < limit <= CHANGES_PAGE_SIZE:
+            return JsonResponse({'error': 'invalid limit'}, status=400)
+
+        changes, position, has_more = changes_page(position, limit)
+        return JsonResponse({
+            'changes': changes,
+            'next_cursor': encode_position(position) if position else '',
+            'has_more': has_more,
+        })
+
+
+def _render(data: dict) -> HttpResponse:
+    with rendering():
+        content = dumps(data)
+    return HttpResponse(content, content_type='application/json')
+
+
+def _films_page(
+    films: QuerySet[FilmWorkDocument],
+    cursor: Optional[str],
+    per_page: int,
+) -> dict:
+    """Keyset page of film summaries, by (creation_date, id)."""
+    paginator = CursorPaginator(films, per_page)
+    rows, next_cursor = paginator.split(list(
+        paginator.page(cursor).values(*FILM_SUMMARY_FIELDS),
+    ))
+    return {'next_cursor': next_cursor, 'results': rows}
+
+
+class PersonsListApi(View):
+    """Persons by full name, keyset paginated by "cursor"."""
+
+    admission_lane = LIST
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs) -> HttpResponse:
+        paginator = PersonCursorPaginator(
+            Person.objects.all(), PERSONS_PER_PAGE,
+        )
+        try:
+            rows, next_cursor = paginator.split(list(
+                paginator.page(request.GET.get('cursor')).values(
+                    'id', 'full_name',
+                ),
+            ))
+        except InvalidCursor:
+            return JsonResponse({'error': 'invalid cursor'}, status=400)
+        return _render({'next_cursor': next_cursor, 'results': rows})
+
+
+class PersonDetailApi(View):
+    """Person with the films grouped by role.
+
+    Each role group is the first keyset page of the role films; its
+    "next_cursor" goes back with "role" parameter to page that role only.
+    Credits are found by the (person, film work) index and only a page
+    of films is read, however many films the person has.
+    """
+
+    http_method_names = ['get']
+
+    def get(self, request, pk, *args, **kwargs) -> HttpResponse:
+        role = request.GET.get('role')
+        cursor = request.GET.get('cursor')
+        if role and role not in ROLE_KEYS:
+            return JsonResponse({'error': 'unknown role'}, status=400)
+        if cursor and not role:
+            return JsonResponse({'error': 'cursor needs role'}, status=400)
+        person = Person.objects.filter(pk=pk).values('id', 'full_name').first()
+        if person is None:
+            raise Http404
+
+        films = {}
+        try:
+            for credit_role in ([role] if role else ROLE_KEYS):
+                credits = PersonFilmWork.objects.filter(
+                    person_id=pk, role=credit_role,
+                ).values('film_work_id')
+                films[ROLE_KEYS[credit_role]] = _films_page(
+                    FilmWorkDocument.objects.filter(id__in=credits),
+                    cursor,
+                    FILMOGRAPHY_PER_PAGE,
+                )
+        except InvalidCursor:
+            return JsonResponse({'error': 'invalid cursor'}, status=400)
+        return _render({**person, 'films': films})
+
+
+class GenresListApi(View):
+    """All genres by name, there are few of them."""
+
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs) -> HttpResponse:
+        return _render({'results': list(
+            Genre.objects.order_by('name').values('id', 'name'),
+        )})
+
+
+class GenreFilmsApi(View):
+    """Films of a genre, keyset paginated by "cursor"."""
+
+    admission_lane = LIST
+    http_method_names = ['get']
+
+    def get(self, request, pk, *args, **kwargs) -> HttpResponse:
+        genre = Genre.objects.filter(pk=pk).values('id', 'name').first()
+        if genre is None:
+            raise Http404
+        films = FilmWorkDocument.objects.filter(
+            id__in=GenreFilmWork.objects.filter(
+                genre_id=pk,
+            ).values('film_work_id'),
+        )
+        try:
+            page = _films_page(
+                films, request.GET.get('cursor'), MOVIES_PER_PAGE,
+            )
+        except InvalidCursor:
+            return JsonResponse({'error': 'invalid cursor'}, status=400)
+        return _render({'genre': genre, **page})
+
+
+class SuggestApi(View):
+    """Typeahead: best films and persons with a word starting "q".
+
+    Answered from the in-memory index of the process, see
+    "movies.suggest", without a database query.
+    """
+
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs) -> HttpResponse:
+        try:
+            limit = int(request.GET.get('limit', SUGGESTIONS))
+        except ValueError:
+            return JsonResponse({'error': 'invalid limit'}, status=400)
+        if not 0 < limit <= SUGGEST_MAX_LIMIT:
+            return JsonResponse({'error': 'invalid limit'}, status=400)
+        return _render(suggest(request.GET.get('q', ''), limit))
+
+
+class CacheStatsApi(View):
+    """Response cache counters of the serving process (staff only)."""
+
+    http_method_names = ['get']
+
+    def get(self, request, *args, **kwargs) -> JsonResponse:
+        if not request.user.is_staff:
+            raise PermissionDenied
+        return JsonResponse(dict(api_cache.stats))
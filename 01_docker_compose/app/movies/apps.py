@@ -1,6 +1,8 @@
 """Film work applications."""
 
 from django.apps import AppConfig
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
 from django.utils.translation import gettext_lazy as _
 
 
@@ -10,3 +12,13 @@ class MoviesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'movies'
     verbose_name = _('movies')
+
+    def ready(self):
+        # Connect catalogue change handlers
+        from movies import admission, metrics, signals  # noqa: F401
+        from movies.db import check_connections
+
+        request_started.connect(check_connections)
+        # Metrics first: they time the budget checks too
+        connection_created.connect(metrics.install_wrapper)
+        connection_created.connect(admission.install_wrapper)
@@ -0,0 +1,224 @@
+"""Set-based catalogue edits behind admin bulk actions.
+
+An operation changes one chunk of objects with a few statements, never
+object by object: no model signals are sent, so every operation
+records the films it touched in the change feed and schedules their
+read model refresh itself. A job
+commits each chunk together with its progress, so a chunk runs exactly
+once and an interrupted job just continues.
+"""
+
+import uuid
+from typing import Callable, Iterable
+
+from django.db import connection, transaction
+
+from movies import models as mov_model
+from movies.outbox import record_changes
+from movies.read_model import schedule_refresh
+from movies.suggest import apply_deleted
+
+BULK_CHUNK_SIZE = 1000
+
+# Operation name -> function(chunk of object ids, job parameters)
+OPERATIONS = {}
+
+
+def operation(model: type, *permissions: str) -> Callable:
+    """Register the operation on ids of "model" objects.
+
+    "permissions" are admin ones ("change", "delete") a user needs to
+    run it, kept as "allowed_permissions" like admin actions do.
+    """
+    def register(func: Callable) -> Callable:
+        func.model = model
+        func.allowed_permissions = permissions
+        OPERATIONS[func.__name__] = func
+        return func
+    return register
+
+
+def _table(model: type) -> str:
+    return '"{0}"'.format(model._meta.db_table)
+
+
+def _films_changed(film_ids: list, source: type) -> None:
+    record_changes(film_ids, source._meta.model_name)
+    schedule_refresh(film_ids)
+
+
+def _touch_films(cursor, film_ids: list, source: type) -> None:
+    """Catalogue changes of the films: "modified", feed and read model."""
+    if not film_ids:
+        return
+    cursor.execute(
+        'UPDATE {0} SET modified = now() WHERE id = ANY(%s)'.format(
+            _table(mov_model.FilmWork),
+        ),
+        [film_ids],
+    )
+    _films_changed(film_ids, source)
+
+
+@operation(mov_model.FilmWork, 'change')
+def set_film_type(film_ids: list, params: dict) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE {0} SET type = %s WHERE id = ANY(%s)'.format(
+                _table(mov_model.FilmWork),
+            ),
+            [params['type'], film_ids],
+        )
+        _touch_films(cursor, film_ids, mov_model.FilmWork)
+
+
+@operation(mov_model.FilmWork, 'change')
+def add_film_genre(film_ids: list, params: dict) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO {0} (film_work_id, genre_id) SELECT film.id, %s '
+            'FROM {1} film WHERE film.id = ANY(%s) '
+            'ON CONFLICT DO NOTHING RETURNING film_work_id'.format(
+                _table(mov_model.GenreFilmWork), _table(mov_model.FilmWork),
+            ),
+            [params['genre'], film_ids],
+        )
+        _touch_films(
+            cursor,
+            [row[0] for row in cursor.fetchall()],
+            mov_model.GenreFilmWork,
+        )
+
+
+@operation(mov_model.FilmWork, 'change')
+def remove_film_genre(film_ids: list, params: dict) -> None:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM {0} WHERE genre_id = %s AND film_work_id = ANY(%s) '
+            'RETURNING film_work_id'.format(_table(mov_model.GenreFilmWork)),
+            [params['genre'], film_ids],
+        )
+        _touch_films(
+            cursor,
+            [row[0] for row in cursor.fetchall()],
+            mov_model.GenreFilmWork,
+        )
+
+
+@operation(mov_model.FilmWork, 'delete')
+def delete_films(film_ids: list, params: dict) -> None:
+    with connection.cursor() as cursor:
+        for through in (mov_model.GenreFilmWork, mov_model.PersonFilmWork):
+            cursor.execute(
+                'DELETE FROM {0} WHERE film_work_id = ANY(%s)'.format(
+                    _table(through),
+                ),
+                [film_ids],
+            )
+        cursor.execute(
+            'DELETE FROM {0} WHERE id = ANY(%s)'.format(
+                _table(mov_model.FilmWork),
+            ),
+            [film_ids],
+        )
+    # Documents of deleted films are dropped by the refresh
+    _films_changed(film_ids, mov_model.FilmWork)
+    apply_deleted(mov_model.FilmWork, film_ids)
+
+
+@operation(mov_model.Person, 'change', 'delete')
+def merge_persons(person_ids: list, params: dict) -> None:
+    """Move credits of the persons to "target" person, drop the persons."""
+    credits = _table(mov_model.PersonFilmWork)
+    with connection.cursor() as cursor:
+        # Credits the target already has are deleted with the rest
+        cursor.execute(
+            'INSERT INTO {0} (film_work_id, person_id, role) '
+            'SELECT film_work_id, %s, role FROM {0} '
+            'WHERE person_id = ANY(%s) ORDER BY id '
+            'ON CONFLICT DO NOTHING'.format(credits),
+            [params['target'], person_ids],
+        )
+        cursor.execute(
+            'DELETE FROM {0} WHERE person_id = ANY(%s) '
+            'RETURNING film_work_id'.format(credits),
+            [person_ids],
+        )
+        film_ids = list({row[0] for row in cursor.fetchall()})
+        persons = _table(mov_model.Person)
+        cursor.execute(
+            'DELETE FROM {0} WHERE id = ANY(%s)'.format(persons),
+            [person_ids],
+        )
+        apply_deleted(mov_model.Person, person_ids)
+        cursor.execute(
+            'UPDATE {0} SET modified = now() WHERE id = %s'.format(persons),
+            [params['target']],
+        )
+        _touch_films(cursor, film_ids, mov_model.Person)
+
+
+@operation(mov_model.Genre, 'change', 'delete')
+def merge_genres(genre_ids: list, params: dict) -> None:
+    """Give films of the genres "target" genre instead, drop the genres."""
+    links = _table(mov_model.GenreFilmWork)
+    with connection.cursor() as cursor:
+        # "unique_film_genre" allows a film to get the target genre once
+        cursor.execute(
+            'INSERT INTO {0} (film_work_id, genre_id) '
+            'SELECT DISTINCT film_work_id, %s '
+            'FROM {0} WHERE genre_id = ANY(%s) '
+            'ON CONFLICT DO NOTHING'.format(links),
+            [params['target'], genre_ids],
+        )
+        cursor.execute(
+            'DELETE FROM {0} WHERE genre_id = ANY(%s) '
+            'RETURNING film_work_id'.format(links),
+            [genre_ids],
+        )
+        film_ids = list({row[0] for row in cursor.fetchall()})
+        genres = _table(mov_model.Genre)
+        cursor.execute(
+            'DELETE FROM {0} WHERE id = ANY(%s)'.format(genres),
+            [genre_ids],
+        )
+        cursor.execute(
+            'UPDATE {0} SET modified = now() WHERE id = %s'.format(genres),
+            [params['target']],
+        )
+        _touch_films(cursor, film_ids, mov_model.Genre)
+
+
+def start_job(
+    operation_name: str,
+    object_ids: Iterable[uuid.UUID],
+    params: dict,
+) -> mov_model.BulkJob:
+    object_ids = list(object_ids)
+    return mov_model.BulkJob.objects.create(
+        operation=operation_name,
+        params=params,
+        object_ids=object_ids,
+        total=len(object_ids),
+    )
+
+
+def run_next_chunk(job_id: uuid.UUID) -> mov_model.BulkJob:
+    """Run the next chunk of the job, return the job with its progress."""
+    jobs = mov_model.BulkJob.objects.defer('object_ids')
+    with transaction.atomic():
+        # Locked: a reload of the progress page can't run a chunk twice
+        job = jobs.select_for_update().get(pk=job_id)
+        if job.finished:
+            return job
+        chunk = mov_model.BulkJob.objects.filter(pk=job_id).values_list(
+            'object_ids__{0}_{1}'.format(job.done, job.done + BULK_CHUNK_SIZE),
+            flat=True,
+        ).get()
+        if chunk:
+            OPERATIONS[job.operation](chunk, job.params)
+            job.done += len(chunk)
+        else:
+            job.done = job.total
+        job.save(update_fields=['done', 'modified'])
+    return job
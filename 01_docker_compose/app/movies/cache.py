@@ -0,0 +1,171 @@
+"""Cache of rendered API responses.
+
+An entry is whatever the view needs to answer without the database,
+e.g. response body with its HTTP validators.
+
+Backend is any of Django cache backends configured as "api" alias
+(local memory LRU, file based, Redis). Entries are evicted precisely:
+every film has a version token, and an entry keeps the tokens of its
+films. A changed film gets a new token, which turns its detail entry and
+the list pages which show it into misses. When films are added, removed
+or reordered, every list page may shift, so the list generation is
+bumped instead. Any change may move a film in or out of search and
+filter results, so their pages have a generation of their own which is
+bumped on every change.
+
+A response read before an eviction may miss the change evicted for: it
+is only cached when every eviction is older than what the reads surely
+have, see "read_horizon".
+
+Evictions reach the processes which share the backend only: with the
+local memory one, other workers keep their entries till the (short by
+default) TTL expires.
+"""
+
+import hashlib
+import time
+import uuid
+from collections import Counter
+from typing import Any, Iterable, Optional
+
+from django.core.cache import caches
+
+from movies.db import read_horizon
+
+_ALIAS = 'api'
+_GENERATION_KEY = 'movies:list:generation'
+_FILTERED_GENERATION_KEY = 'movies:list:filtered-generation'
+# Wall clock time of the last eviction
+_INVALIDATED_KEY = 'movies:invalidated'
+
+# Per process counters: "hit", "miss" and "eviction"
+stats = Counter()
+
+
+def _cache():
+    return caches[_ALIAS]
+
+
+def detail_key(film_id) -> str:
+    return 'movies:detail:{0}'.format(film_id)
+
+
+def _version_key(film_id) -> str:
+    return 'movies:film-version:{0}'.format(film_id)
+
+
+def list_key(params: Iterable[tuple[str, str]], filtered: bool) -> str:
+    """Key of a list page, built from its (sorted) query parameters."""
+    cache = _cache()
+    generation = cache.get_or_set(_GENERATION_KEY, 0, timeout=None)
+    if filtered:
+        generation = '{0}.{1}'.format(generation, cache.get_or_set(
+            _FILTERED_GENERATION_KEY, 0, timeout=None,
+        ))
+    query = '&'.join('{0}={1}'.format(*param) for param in sorted(params))
+    # Search text is arbitrary, a digest keeps keys short and key-safe
+    digest = hashlib.md5(query.encode()).hexdigest()  # noqa: S303
+    return 'movies:list:{0}:{1}'.format(generation, digest)
+
+
+def _versions(cache, film_ids: Iterable) -> dict:
+    keys = {_version_key(film_id): film_id for film_id in film_ids}
+    found = cache.get_many(list(keys))
+    return {film_id: found.get(key) for key, film_id in keys.items()}
+
+
+def _fresh(cache, stored: dict) -> dict:
+    """Entries of stored (versions, entry) pairs whose films are unchanged.
+
+    Versions of all the entries are read at once.
+    """
+    versions = _versions(cache, {
+        film_id
+        for film_versions, _ in stored.values()
+        for film_id in film_versions
+    })
+    return {
+        key: entry
+        for key, (film_versions, entry) in stored.items()
+        if all(
+            versions[film_id] == version
+            for film_id, version in film_versions.items()
+        )
+    }
+
+
+def get(key: str) -> Optional[Any]:
+    cache = _cache()
+    stored = cache.get(key)
+    entry = None if stored is None else _fresh(cache, {key: stored}).get(key)
+    stats['miss' if entry is None else 'hit'] += 1
+    return entry
+
+
+def get_details(film_ids: Iterable) -> dict:
+    """Cached detail entries by film id, of the films which have one."""
+    cache = _cache()
+    keys = {detail_key(film_id): film_id for film_id in film_ids}
+    entries = _fresh(cache, cache.get_many(list(keys)))
+    stats['hit'] += len(entries)
+    stats['miss'] += len(keys) - len(entries)
+    return {keys[key]: entry for key, entry in entries.items()}
+
+
+def _store(entries: dict) -> None:
+    """Cache entries given as {key: (film ids, entry)}.
+
+    Versions are read before the eviction time is checked: an eviction
+    which comes later has given the films new versions already.
+    """
+    cache = _cache()
+    versions = _versions(cache, {
+        film_id for film_ids, _ in entries.values() for film_id in film_ids
+    })
+    for film_id, version in versions.items():
+        if version is None:
+            # "add" keeps the version another process may have just set
+            versions[film_id] = cache.get_or_set(
+                _version_key(film_id), uuid.uuid4().hex,
+            )
+    horizon = read_horizon()
+    if horizon is not None and cache.get(_INVALIDATED_KEY, 0) >= horizon:
+        return
+    cache.set_many({
+        key: ({film_id: versions[film_id] for film_id in film_ids}, entry)
+        for key, (film_ids, entry) in entries.items()
+    })
+
+
+def set_detail(film_id, entry: Any) -> None:
+    _store({detail_key(film_id): ([film_id], entry)})
+
+
+def set_details(entries: dict) -> None:
+    _store({
+        detail_key(film_id): ([film_id], entry)
+        for film_id, entry in entries.items()
+    })
+
+
+def set_list(key: str, entry: Any, film_ids: Iterable) -> None:
+    """Store a list page, valid while its films keep their versions."""
+    _store({key: (list(film_ids), entry)})
+
+
+def invalidate_films(film_ids: Iterable[uuid.UUID], reordered: bool) -> None:
+    """Evict cached responses of changed films."""
+    cache = _cache()
+    film_ids = list(film_ids)
+    # Before the versions: a fill which missed them sees this time
+    cache.set(_INVALIDATED_KEY, time.time(), timeout=None)
+    cache.set_many({
+        _version_key(film_id): uuid.uuid4().hex for film_id in film_ids
+    })
+    cache.set(_FILTERED_GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+    if reordered:
+        # Positions of films changed: all the list pages are stale
+        cache.set(_GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+    # Stale anyway, deleted to free the memory
+    cache.delete_many([detail_key(film_id) for film_id in film_ids])
+    stats['eviction'] += len(film_ids)
@@ -0,0 +1,223 @@
+"""Database connections management and read replicas routing.
+
+API film reads go to replicas (see "reads_from" and "ReplicaRouter"),
+everything else, admin included, uses the primary ("default").
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.http import HttpRequest, HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+# Replica aliases in DATABASES start with it
+REPLICA_PREFIX = 'replica'
+# Set for clients which have just written
+STICKY_COOKIE = 'db_primary'
+
+_LAG_SQL = (
+    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) '
+    'END'
+)
+
+
+def check_connections(**kwargs) -> None:
+    """Close broken persistent connections before a request uses them.
+
+    Enabled by "CONN_HEALTH_CHECKS" database option (native since Django
+    4.1), it costs a "SELECT 1" per request for each kept connection.
+    """
+    for connection in connections.all():
+        if (
+            connection.connection is not None and
+            connection.settings_dict.get('CONN_HEALTH_CHECKS') and
+            not connection.is_usable()
+        ):
+            connection.close()
+
+
+class _Replicas:
+    """Round-robin over the replicas which pass health checks.
+
+    A replica is checked (reachable, replication lag) at most every
+    "DB_REPLICA_CHECK_INTERVAL" seconds per process; one that fails is
+    skipped for "DB_REPLICA_RETRY_AFTER" seconds.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.turn = 0
+        # alias: monotonic time until which it's known healthy or down
+        self.healthy_until = {}
+        self.down_until = {}
+
+    def choose(self) -> Optional[str]:
+        aliases = replica_aliases()
+        for _ in aliases:
+            with self.lock:
+                alias = aliases[self.turn % len(aliases)]
+                self.turn += 1
+            if self.is_healthy(alias):
+                return alias
+        return None
+
+    def is_healthy(self, alias: str) -> bool:
+        now = time.monotonic()
+        if self.down_until.get(alias, 0) > now:
+            return False
+        if self.healthy_until.get(alias, 0) > now:
+            return True
+        try:
+            lag = replication_lag(alias)
+        except DatabaseError as exc:
+            logger.warning('Replica %s is unavailable: %s', alias, exc)
+            healthy = False
+        else:
+            healthy = lag <= settings.DB_REPLICA_MAX_LAG
+            if not healthy:
+                logger.warning('Replica %s lags %.1f seconds', alias, lag)
+        if healthy:
+            self.healthy_until[alias] = now + (
+                settings.DB_REPLICA_CHECK_INTERVAL
+            )
+        else:
+            self.down_until[alias] = now + settings.DB_REPLICA_RETRY_AFTER
+        return healthy
+
+
+_replicas = _Replicas()
+
+# Database of the reads of the current request, None for the primary
+_read_alias: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    'read_alias', default=None,
+)
+# Wall clock time of the start of the reads of the block
+_read_started: contextvars.ContextVar[Optional[float]] = (
+    contextvars.ContextVar('read_started', default=None)
+)
+# Models written by the current request, filled by the router
+_wrote: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar(
+    'wrote', default=None,
+)
+
+
+def replica_aliases() -> list[str]:
+    return [
+        alias for alias in settings.DATABASES
+        if alias.startswith(REPLICA_PREFIX)
+    ]
+
+
+def replication_lag(alias: str) -> float:
+    """Seconds the replica is behind the primary, 0 if it replayed all."""
+    with connections[alias].cursor() as cursor:
+        cursor.execute(_LAG_SQL)
+        lag = cursor.fetchone()[0]
+    # NULL on a server which isn't a replica
+    return float(lag or 0)
+
+
+def read_alias(request: HttpRequest) -> Optional[str]:
+    """Replica for the reads of the request, None for the primary.
+
+    Clients which wrote recently read from the primary, which surely
+    has their writes.
+    """
+    if request.COOKIES.get(STICKY_COOKIE):
+        return None
+    return _replicas.choose()
+
+
+@contextlib.contextmanager
+def reads_from(alias: Optional[str]) -> Iterator[None]:
+    """Route the ORM reads of the block to the database."""
+    token = _read_alias.set(alias)
+    started = _read_started.set(time.time())
+    try:
+        yield
+    finally:
+        _read_started.reset(started)
+        _read_alias.reset(token)
+
+
+def read_horizon() -> Optional[float]:
+    """Time before which the reads have all the commits, None out of block.
+
+    The primary has what committed before the reads started. A replica
+    lagged at most "DB_REPLICA_MAX_LAG" when it was last checked, and may
+    lag more till the next check.
+    """
+    started = _read_started.get()
+    if started is None or _read_alias.get() is None:
+        return started
+    return started - (
+        settings.DB_REPLICA_MAX_LAG + settings.DB_REPLICA_CHECK_INTERVAL
+    )
+
+
+class ReplicaRouter:
+    """Primary for everything but the reads in "reads_from" blocks."""
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints) -> str:
+        wrote = _wrote.get()
+        if wrote is not None:
+            wrote.append(model)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # Replicas have the same data
+        return True
+
+    def allow_migrate(self, db, app_label, **hints) -> bool:
+        return db == DEFAULT_DB_ALIAS
+
+
+def _stick_to_primary(response: HttpResponse, wrote: list) -> None:
+    if wrote and replica_aliases():
+        response.set_cookie(
+            STICKY_COOKIE, '1',
+            max_age=settings.DB_READ_YOUR_WRITES_SECONDS,
+            httponly=True, samesite='Lax',
+        )
+
+
+@sync_and_async_middleware
+def read_your_writes_middleware(get_response):
+    """Send the reads of a client which has just written to the primary.
+
+    Replicas lag a little, so a client could miss its own change.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            wrote = []
+            token = _wrote.set(wrote)
+            try:
+                response = await get_response(request)
+            finally:
+                _wrote.reset(token)
+            _stick_to_primary(response, wrote)
+            return response
+    else:
+        def middleware(request):
+            wrote = []
+            token = _wrote.set(wrote)
+            try:
+                response = get_response(request)
+            finally:
+                _wrote.reset(token)
+            _stick_to_primary(response, wrote)
+            return response
+    return middleware
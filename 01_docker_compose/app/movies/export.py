@@ -0,0 +1,86 @@
+"""Catalogue export as NDJSON: one API film document per line."""
+
+import datetime
+from typing import Iterator, Optional
+
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from movies.encoding import document_json
+from movies.models import FilmWorkDocument
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Start of the oldest open transaction of the other client sessions
+_HORIZON_SQL = (
+    'SELECT min(xact_start) FROM pg_stat_activity '
+    'WHERE datname = current_database() AND pid <> pg_backend_pid() '
+    "AND backend_type = 'client backend'"
+)
+
+
+def parse_modified_since(value: str) -> datetime.datetime:
+    """ISO 8601 date time, naive values are taken as UTC."""
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError('Invalid date time: {0}'.format(value))
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, datetime.timezone.utc)
+    return moment
+
+
+def export_window(
+    modified_since: Optional[datetime.datetime] = None,
+) -> Optional[datetime.datetime]:
+    """Upper "modified" bound of the export, the next "modified_since".
+
+    A document is dated by the start of the transaction which refreshes
+    it, and may commit after later dated ones. The bound is kept before
+    every open transaction, so a later pull can't miss such documents.
+    Sessions of other database roles are not seen, documents are written
+    by the one of the web service.
+    """
+    queryset = FilmWorkDocument.objects.all()
+    if modified_since is not None:
+        queryset = queryset.filter(modified__gt=modified_since)
+    with connection.cursor() as cursor:
+        cursor.execute(_HORIZON_SQL)
+        horizon = cursor.fetchone()[0]
+    if horizon is not None:
+        queryset = queryset.filter(modified__lt=horizon)
+    return queryset.aggregate(until=Max('modified'))['until']
+
+
+def export_lines(
+    modified_since: Optional[datetime.datetime],
+    modified_until: Optional[datetime.datetime],
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[str]:
+    """NDJSON blocks of documents changed in (since, until] window.
+
+    A film changed again after the window is exported by the next pull
+    as well: clients keep the last document of each id.
+
+    Documents are read by a server side cursor, so memory usage doesn't
+    depend on the catalogue size.
+    """
+    if modified_until is None:
+        return
+    queryset = FilmWorkDocument.objects.filter(modified__lte=modified_until)
+    if modified_since is not None:
+        queryset = queryset.filter(modified__gt=modified_since)
+    # JSON text as stored, no decoding and encoding back
+    documents = queryset.order_by('modified', 'id').annotate(
+        body=document_json(),
+    ).values_list('body', flat=True).iterator(chunk_size=chunk_size)
+
+    lines = []
+    for document in documents:
+        lines.append(document)
+        if len(lines) == chunk_size:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
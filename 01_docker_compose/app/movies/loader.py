@@ -0,0 +1,175 @@
+"""Bulk catalogue load through Postgres COPY.
+
+A batch is copied into a temporary staging table and then merged into
+the target table with a single INSERT ... ON CONFLICT, so loading the
+same rows twice is harmless and an interrupted load can be replayed.
+"""
+
+import csv
+import io
+from typing import Iterable, NamedTuple, Optional
+
+from django.db import connection, transaction
+
+from movies import models as mov_model
+from movies.outbox import record_changes
+
+# Written for None, as COPY can't tell NULL from an empty CSV string
+_NULL = r'\N'
+
+# Source column names which differ from ours
+COLUMN_ALIASES = {
+    'created_at': 'created',
+    'updated_at': 'modified',
+}
+
+
+class Table(NamedTuple):
+    name: str
+    model: type
+    columns: tuple
+    # SQL expressions for absent (NULL) values of NOT NULL columns
+    defaults: dict
+    # Columns to overwrite for existing rows, empty - keep existing rows
+    updates: tuple
+
+
+_TIMESTAMPS = {'created': 'now()', 'modified': 'now()'}
+
+# In the order of foreign keys
+TABLES = (
+    Table(
+        'genre', mov_model.Genre,
+        ('id', 'name', 'description', 'created', 'modified'),
+        _TIMESTAMPS,
+        ('name', 'description', 'modified'),
+    ),
+    Table(
+        'person', mov_model.Person,
+        ('id', 'full_name', 'created', 'modified'),
+        _TIMESTAMPS,
+        ('full_name', 'modified'),
+    ),
+    Table(
+        'film_work', mov_model.FilmWork,
+        (
+            'id', 'title', 'description', 'creation_date', 'rating', 'type',
+            'created', 'modified',
+        ),
+        {
+            'description': "''",
+            'type': "'{0}'".format(mov_model.FilmWork._FilmType.MOVIE),
+            **_TIMESTAMPS,
+        },
+        (
+            'title', 'description', 'creation_date', 'rating', 'type',
+            'modified',
+        ),
+    ),
+    Table(
+        'genre_film_work', mov_model.GenreFilmWork,
+        ('film_work_id', 'genre_id'),
+        {},
+        (),
+    ),
+    Table(
+        'person_film_work', mov_model.PersonFilmWork,
+        ('film_work_id', 'person_id', 'role'),
+        {},
+        (),
+    ),
+)
+
+
+# Merged rows of these tables change the film in the column
+_FILM_COLUMNS = {
+    'film_work': 'id',
+    'genre_film_work': 'film_work_id',
+    'person_film_work': 'film_work_id',
+}
+# Updated (not inserted) rows of these change films linked through
+_LINKS = {
+    'genre': (mov_model.GenreFilmWork, 'genre_id'),
+    'person': (mov_model.PersonFilmWork, 'person_id'),
+}
+
+
+def normalize(row: dict) -> dict:
+    """Rename aliased source columns."""
+    return {COLUMN_ALIASES.get(key, key): value for key, value in row.items()}
+
+
+def _to_copy_value(value) -> Optional[str]:
+    return _NULL if value is None else value
+
+
+def _merge_sql(table: Table, staging: str) -> str:
+    target = '"{0}"'.format(table.model._meta.db_table)
+    values = ', '.join(
+        'COALESCE({0}, {1})'.format(column, table.defaults[column])
+        if column in table.defaults else column
+        for column in table.columns
+    )
+    if table.updates:
+        # "genre" name or "film_work" fields may change between loads
+        conflict = 'ON CONFLICT (id) DO UPDATE SET {0}'.format(', '.join(
+            '{0} = EXCLUDED.{0}'.format(column) for column in table.updates
+        ))
+    else:
+        # Links are immutable and have natural unique keys, a link which
+        # is there already is skipped
+        conflict = 'ON CONFLICT DO NOTHING'
+    return 'INSERT INTO {0} ({1}) SELECT {2} FROM {3} {4}'.format(
+        target, ', '.join(table.columns), values, staging, conflict,
+    )
+
+
+def _linked_film_ids(table_name: str, ids: list) -> list:
+    if not ids or table_name not in _LINKS:
+        return []
+    through, column = _LINKS[table_name]
+    return list(through.objects.filter(
+        **{'{0}__in'.format(column): ids},
+    ).values_list('film_work_id', flat=True).distinct())
+
+
+def copy_batch(table: Table, rows: Iterable[dict]) -> int:
+    """Upsert a batch of rows in one transaction, return rows merged."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([
+            _to_copy_value(row.get(column)) for column in table.columns
+        ])
+    buffer.seek(0)
+
+    staging = 'staging_{0}'.format(table.name)
+    with transaction.atomic(), connection.cursor() as cursor:
+        # No constraints are copied: NOT NULL defaults are applied on merge
+        cursor.execute(
+            'CREATE TEMP TABLE {0} ON COMMIT DROP AS '
+            'SELECT {1} FROM "{2}" WITH NO DATA'.format(
+                staging,
+                ', '.join(table.columns),
+                table.model._meta.db_table,
+            ),
+        )
+        cursor.copy_expert(
+            "COPY {0} ({1}) FROM STDIN WITH (FORMAT csv, NULL '{2}')".format(
+                staging, ', '.join(table.columns), _NULL,
+            ),
+            buffer,
+        )
+        merge_sql = _merge_sql(table, staging)
+        if table.name in _FILM_COLUMNS:
+            cursor.execute('{0} RETURNING {1}'.format(
+                merge_sql, _FILM_COLUMNS[table.name],
+            ))
+            film_ids = [row[0] for row in cursor.fetchall()]
+        else:
+            # Zero "xmax" tells an inserted row from an updated one
+            cursor.execute('{0} RETURNING id, xmax <> 0'.format(merge_sql))
+            updated = [pk for pk, is_update in cursor.fetchall() if is_update]
+            film_ids = _linked_film_ids(table.name, updated)
+        record_changes(film_ids, table.model._meta.model_name)
+        return cursor.rowcount
@@ -0,0 +1 @@
+"""Film work application management commands."""
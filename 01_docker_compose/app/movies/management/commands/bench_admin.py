@@ -0,0 +1,91 @@
+"""Check that the film change page cost doesn't grow with its credits."""
+
+import datetime
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from movies import models as mov_model
+from movies.management.commands.bench_api import _CLIENT_ADDR, _HOST
+
+# All above one page of credits
+_DEFAULT_CREDITS = (100, 1000, 5000)
+_HEADER = '{0:>8} {1:>8} {2:>10} {3:>9}'
+_ROW = '{0:>8} {1:>8} {2:>10.1f} {3:>9.1f}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Create films with growing numbers of credits inside a transaction, '
+        'request their admin change pages and fail unless SQL queries and '
+        'page size stay bounded. Everything is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--credits', nargs='+', type=int, default=_DEFAULT_CREDITS,
+        )
+        parser.add_argument(
+            '--max-size-ratio', type=float, default=1.5,
+            help='Allowed ratio of the largest page to the smallest one.',
+        )
+
+    def handle(self, *args, **options):
+        client = Client(HTTP_HOST=_HOST, REMOTE_ADDR=_CLIENT_ADDR)
+        results = {}
+        self.stdout.write(_HEADER.format('credits', 'queries', 'KiB', 'ms'))
+        with transaction.atomic():
+            client.force_login(get_user_model().objects.create_superuser(
+                'bench-admin', password=None,
+            ))
+            for credits in options['credits']:
+                film = self.create_film(credits)
+                url = '/admin/movies/filmwork/{0}/change/'.format(film.id)
+                client.get(url)
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    elapsed = (time.perf_counter() - started) * 1000
+                if response.status_code != 200:
+                    raise CommandError('{0} answered {1}'.format(
+                        url, response.status_code,
+                    ))
+                results[credits] = (len(captured), len(response.content))
+                self.stdout.write(_ROW.format(
+                    credits, len(captured), len(response.content) / 1024,
+                    elapsed,
+                ))
+            transaction.set_rollback(True)
+
+        queries = {count for count, _ in results.values()}
+        sizes = [size for _, size in results.values()]
+        if len(queries) > 1:
+            raise CommandError('Query count depends on credits count')
+        if max(sizes) > min(sizes) * options['max_size_ratio']:
+            raise CommandError('Page size depends on credits count')
+        self.stdout.write(self.style.SUCCESS('Change page cost is bounded'))
+
+    @staticmethod
+    def create_film(credits: int) -> mov_model.FilmWork:
+        film = mov_model.FilmWork.objects.create(
+            title='Bench show {0}'.format(credits),
+            description='',
+            creation_date=datetime.date(2000, 1, 1),
+        )
+        persons = mov_model.Person.objects.bulk_create(
+            mov_model.Person(full_name='Bench person {0}'.format(number))
+            for number in range(credits)
+        )
+        mov_model.PersonFilmWork.objects.bulk_create(
+            mov_model.PersonFilmWork(
+                film_work=film,
+                person=person,
+                role=mov_model.PersonFilmWork.Role.ACTOR,
+            )
+            for person in persons
+        )
+        return film
@@ -0,0 +1,228 @@
+"""In-process benchmark of API and admin paths on the current catalogue."""
+
+import json
+import platform
+import random
+import subprocess  # noqa: S404
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from movies import models as mov_model
+from movies.api.v1.views import MOVIES_PER_PAGE
+from movies.management.commands.loadtest import percentile
+from movies.pagination import CURSOR_ORDERING, encode_cursor
+
+# Outside INTERNAL_IPS: debug toolbar must not take part in measurements
+_CLIENT_ADDR = '192.0.2.1'
+# Must be one of ALLOWED_HOSTS
+_HOST = '127.0.0.1'
+# Ids per request of "batch" scenario
+_BATCH_IDS = 100
+_HEADER = '{0:<18} {1:>9} {2:>9} {3:>9} {4:>9} {5:>9} {6:>11}'
+_ROW = '{0:<18} {1:>9.1f} {2:>9.1f} {3:>9.1f} {4:>9.1f} {5:>9.1f} {6:>11.1f}'
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(  # noqa: S603, S607
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True, check=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _summary(samples: list) -> dict:
+    samples = sorted(samples)
+    return {
+        'p50': percentile(samples, 0.5),
+        'p95': percentile(samples, 0.95),
+        'p99': percentile(samples, 0.99),
+        'mean': sum(samples) / len(samples),
+        'max': samples[-1],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Request list, detail and admin pages in-process and report latency '
+        'percentiles, SQL queries and peak Python memory per request. Seed '
+        'the database with "seed_catalogue" first, results go to a JSON file '
+        'to compare commits.'
+    )
+
+    scenarios = (
+        'list_first', 'list_middle', 'list_last', 'list_cursor', 'detail',
+        'batch', 'admin_changelist', 'admin_change',
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario', action='append', choices=self.scenarios,
+            help='Scenario to run, all by default.',
+        )
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument(
+            '--with-cache', action='store_true',
+            help='Keep API response cache between requests.',
+        )
+        parser.add_argument('--output', help='JSON file for the results.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        films = mov_model.FilmWorkDocument.objects.count()
+        if not films:
+            raise CommandError(
+                'No films in the read model, run "seed_catalogue" first',
+            )
+        self.rnd = random.Random(options['seed'])
+        self.films = films
+        self.with_cache = options['with_cache']
+        self.client = Client(HTTP_HOST=_HOST, REMOTE_ADDR=_CLIENT_ADDR)
+
+        results = {}
+        self.stdout.write(_HEADER.format(
+            'scenario', 'p50, ms', 'p95, ms', 'p99, ms', 'mean, ms',
+            'queries', 'peak, KiB',
+        ))
+        # Admin user only lives for the run
+        with transaction.atomic():
+            self.client.force_login(get_user_model().objects.create_superuser(
+                'bench-api', password=None,
+            ))
+            for scenario in options['scenario'] or self.scenarios:
+                path = getattr(self, 'path_{0}'.format(scenario))
+                results[scenario] = self.measure(
+                    path, options['requests'], options['warmup'],
+                )
+                self.stdout.write(_ROW.format(
+                    scenario,
+                    results[scenario]['latency_ms']['p50'],
+                    results[scenario]['latency_ms']['p95'],
+                    results[scenario]['latency_ms']['p99'],
+                    results[scenario]['latency_ms']['mean'],
+                    results[scenario]['queries']['mean'],
+                    results[scenario]['peak_kib']['mean'],
+                ))
+            transaction.set_rollback(True)
+
+        if options['output']:
+            report = {
+                'commit': _git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'dataset': {
+                    'films': films,
+                    'persons': mov_model.Person.objects.count(),
+                    'genres': mov_model.Genre.objects.count(),
+                    'person_links': mov_model.PersonFilmWork.objects.count(),
+                    'genre_links': mov_model.GenreFilmWork.objects.count(),
+                },
+                'options': {
+                    'requests': options['requests'],
+                    'with_cache': self.with_cache,
+                    'seed': options['seed'],
+                },
+                'scenarios': results,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2)
+
+    def measure(
+        self,
+        path: Callable[[], str],
+        requests: int,
+        warmup: int,
+    ) -> dict:
+        for _ in range(warmup):
+            self.request(path())
+
+        latencies, queries, peaks = [], [], []
+        tracemalloc.start()
+        try:
+            for _ in range(requests):
+                latency, query_count, peak = self.request(path())
+                latencies.append(latency)
+                queries.append(query_count)
+                peaks.append(peak)
+        finally:
+            tracemalloc.stop()
+        return {
+            'latency_ms': _summary(latencies),
+            'queries': _summary(queries),
+            'peak_kib': _summary(peaks),
+        }
+
+    def request(self, url: str) -> tuple[float, int, float]:
+        if not self.with_cache:
+            caches['api'].clear()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = self.client.get(url)
+            latency = (time.perf_counter() - started) * 1000
+        if response.status_code != 200:
+            raise CommandError('{0} answered {1}'.format(
+                url, response.status_code,
+            ))
+        peak = tracemalloc.get_traced_memory()[1] / 1024
+        return latency, len(captured), peak
+
+    def random_film(self) -> mov_model.FilmWorkDocument:
+        return mov_model.FilmWorkDocument.objects.order_by(
+            *CURSOR_ORDERING,
+        ).only(*CURSOR_ORDERING)[self.rnd.randrange(self.films)]
+
+    def last_page(self) -> int:
+        return max(1, -(-self.films // MOVIES_PER_PAGE))
+
+    def path_list_first(self) -> str:
+        return '/api/v1/movies/?page=1'
+
+    def path_list_middle(self) -> str:
+        return '/api/v1/movies/?page={0}'.format(self.last_page() // 2 or 1)
+
+    def path_list_last(self) -> str:
+        # The total may be an estimation, only the paginator knows the last
+        return '/api/v1/movies/?page=last'
+
+    def path_list_cursor(self) -> str:
+        film = self.random_film()
+        return '/api/v1/movies/?cursor={0}'.format(
+            encode_cursor(film.creation_date, film.id),
+        )
+
+    def path_detail(self) -> str:
+        return '/api/v1/movies/{0}/'.format(self.random_film().id)
+
+    def path_batch(self) -> str:
+        offset = self.rnd.randrange(max(1, self.films - _BATCH_IDS))
+        film_ids = [
+            str(film_id)
+            for film_id in mov_model.FilmWorkDocument.objects.order_by(
+                *CURSOR_ORDERING,
+            ).values_list('id', flat=True)[offset:offset + _BATCH_IDS]
+        ]
+        self.rnd.shuffle(film_ids)
+        return '/api/v1/movies/batch/?ids={0}'.format(','.join(film_ids))
+
+    def path_admin_changelist(self) -> str:
+        return '/admin/movies/filmwork/?p={0}'.format(
+            self.rnd.randrange(self.films // 100 + 1),
+        )
+
+    def path_admin_change(self) -> str:
+        return '/admin/movies/filmwork/{0}/change/'.format(
+            self.random_film().id,
+        )
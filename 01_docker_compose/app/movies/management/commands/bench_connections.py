@@ -0,0 +1,39 @@
+"""Measure what persistent connections save per request."""
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+_ROW = '{0:>10}: mean {1:.2f} ms, p50 {2:.2f} ms'
+
+
+def _first_query_ms(reconnect: bool) -> float:
+    if reconnect:
+        connection.close()
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    return (time.perf_counter() - started) * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the first query of a request on a new connection '
+        '(CONN_MAX_AGE=0) and on a kept one.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+
+    def handle(self, *args, **options):
+        for title, reconnect in (('new', True), ('persistent', False)):
+            samples = [
+                _first_query_ms(reconnect)
+                for _ in range(options['iterations'])
+            ]
+            self.stdout.write(_ROW.format(
+                title, statistics.mean(samples), statistics.median(samples),
+            ))
@@ -0,0 +1,124 @@
+"""Cost of rendering film list responses by each serialization path."""
+
+import statistics
+import time
+from typing import Callable, Optional
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.http import JsonResponse
+from django.test import override_settings
+
+from movies import encoding
+from movies.models import FilmWorkDocument
+
+_DEFAULT_SIZES = (50, 1000)
+_DEFAULT_FIELDS = ('id', 'title', 'rating')
+_CONTEXT = {'count': 0, 'count_exact': True, 'total_pages': 1}
+_HEADER = '{0:>6} {1:<22} {2:>9} {3:>11} {4:>9}'
+_ROW = '{0:>6} {1:<22} {2:>9.2f} {3:>11.2f} {4:>9.1f}'
+
+
+def _parsed(film_ids: list) -> Callable:
+    """Former path: documents decoded to dicts, encoded by JsonResponse."""
+    def render():
+        documents = dict(FilmWorkDocument.objects.filter(
+            id__in=film_ids,
+        ).values_list('id', 'document'))
+        return JsonResponse({
+            **_CONTEXT,
+            'results': [documents[film_id] for film_id in film_ids],
+        }).content
+    return render
+
+
+def _text(film_ids: list, fields: Optional[tuple] = None) -> Callable:
+    """Current path: JSON texts of documents put into the response."""
+    def render():
+        documents = dict(FilmWorkDocument.objects.filter(
+            id__in=film_ids,
+        ).annotate(
+            body=encoding.document_json(fields),
+        ).values_list('id', 'body'))
+        return encoding.with_results(
+            _CONTEXT,
+            (documents[film_id].encode() for film_id in film_ids),
+        )
+    return render
+
+
+def _measure(render: Callable, repeat: int) -> tuple[float, float, int]:
+    """Median ms of the whole render and of its Python part, body size."""
+    totals = []
+    python_parts = []
+    for _ in range(repeat):
+        queries_before = len(connection.queries)
+        started = time.perf_counter()
+        content = render()
+        total = time.perf_counter() - started
+        database = sum(
+            float(query['time'])
+            for query in connection.queries[queries_before:]
+        )
+        totals.append(total * 1000)
+        python_parts.append((total - database) * 1000)
+    return (
+        statistics.median(totals),
+        statistics.median(python_parts),
+        len(content),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Render pages of existing film documents by the former (decoded '
+        'documents, JsonResponse) and the current (JSON text) paths with '
+        'each encoder, print median time and response size.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=_DEFAULT_SIZES,
+            help='Films per page to render.',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--fields', default=','.join(_DEFAULT_FIELDS),
+            help='"fields" parameter of the narrowed path.',
+        )
+
+    def handle(self, *args, **options):
+        fields = tuple(options['fields'].split(','))
+        self.stdout.write(_HEADER.format(
+            'films', 'path', 'total, ms', 'python, ms', 'KiB',
+        ))
+        # Query timings are collected in "connection.queries" only
+        with override_settings(DEBUG=True):
+            for size in options['sizes']:
+                film_ids = list(FilmWorkDocument.objects.order_by(
+                    'creation_date', 'id',
+                ).values_list('id', flat=True)[:size])
+                if len(film_ids) < size:
+                    raise CommandError(
+                        'Only {0} documents, run seed_catalogue'.format(
+                            len(film_ids),
+                        ),
+                    )
+                self.measure(size, film_ids, fields, options['repeat'])
+
+    def measure(self, size, film_ids, fields, repeat):
+        paths = [('parsed, JsonResponse', _parsed(film_ids), 'stdlib')]
+        for encoder in encoding.ENCODERS:
+            paths.append(
+                ('text, {0}'.format(encoder), _text(film_ids), encoder),
+            )
+        fastest = 'orjson' if 'orjson' in encoding.ENCODERS else 'stdlib'
+        paths.append((
+            'fields, {0}'.format(fastest), _text(film_ids, fields), fastest,
+        ))
+        for name, render, encoder in paths:
+            with override_settings(API_JSON_ENCODER=encoder):
+                total, python_part, length = _measure(render, repeat)
+            self.stdout.write(_ROW.format(
+                size, name, total, python_part, length / 1024,
+            ))
@@ -0,0 +1,89 @@
+"""Plans and timings of list search and filters on the current catalogue."""
+
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q, QuerySet
+from django.http import QueryDict
+
+from movies import models as mov_model
+from movies.api.v1.views import MOVIES_PER_PAGE
+from movies.search import filter_documents, ordering
+
+_HEADER = '{0:<16} {1:>9} {2:>7}  {3}'
+_ROW = '{0:<16} {1:>9.1f} {2:>7}  {3}'
+
+
+def plan_summary(queryset: QuerySet) -> tuple[float, int, list[str]]:
+    """Execution time, top node rows and scans of the executed plan."""
+    plan = json.loads(queryset.explain(analyze=True, format='json'))[0]
+    scans = []
+    nodes = [plan['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if 'Scan' in node['Node Type']:
+            scans.append('{0} {1}'.format(
+                node['Node Type'],
+                node.get('Index Name', node.get('Relation Name', '')),
+            ).strip())
+        nodes.extend(node.get('Plans', ()))
+    return plan['Execution Time'], plan['Plan']['Actual Rows'], scans
+
+
+class Command(BaseCommand):
+    help = (
+        'EXPLAIN ANALYZE list pages with search, filters and sorts, and the '
+        'former admin "icontains" search, to check that indexes are used. '
+        'Seed a large catalogue with "seed_catalogue" first.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        documents = mov_model.FilmWorkDocument.objects.all()
+        total = documents.count()
+        if not total:
+            raise CommandError(
+                'No films in the read model, run "seed_catalogue" first',
+            )
+        rnd = random.Random(options['seed'])
+        sample = documents.order_by('id')[rnd.randrange(total)]
+        word = sample.title.split()[0]
+        person = (sample.actors or sample.directors or sample.writers or [''])
+        scenarios = {
+            'query': {'query': word},
+            'query_partial': {'query': word[:-1]},
+            'genre': {'genre': sample.genres[:1]},
+            'person': {'person': person[0]},
+            'rating_sort': {'rating_min': '8', 'sort': '-rating'},
+            'title_sort': {'sort': 'title', 'type': sample.type},
+        }
+
+        self.stdout.write('{0} documents'.format(total))
+        self.stdout.write(_HEADER.format('scenario', 'ms', 'rows', 'scans'))
+        for name, values in scenarios.items():
+            params = QueryDict(mutable=True)
+            for key, value in values.items():
+                if not isinstance(value, list):
+                    value = [value]
+                params.setlist(key, value)
+            page = filter_documents(documents, params).order_by(
+                *ordering(params),
+            )[:MOVIES_PER_PAGE]
+            self.stdout.write(_ROW.format(
+                name, *self.summary(page.values('id', 'modified')),
+            ))
+
+        legacy = mov_model.FilmWork.objects.filter(
+            Q(title__icontains=word) | Q(description__icontains=word),
+        ).order_by('-modified')[:MOVIES_PER_PAGE]
+        self.stdout.write(_ROW.format(
+            'admin_icontains', *self.summary(legacy.values('id')),
+        ))
+
+    @staticmethod
+    def summary(queryset: QuerySet) -> tuple[float, int, str]:
+        elapsed, rows, scans = plan_summary(queryset)
+        return elapsed, rows, ', '.join(scans)
@@ -0,0 +1,101 @@
+"""Compare aggregated and batched film serialization on synthetic data."""
+
+import json
+import time
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q, QuerySet
+
+from movies import models as mov_model
+from movies.management.commands.seed_catalogue import (
+    add_spec_arguments,
+    spec_from_options,
+)
+from movies.serializers import (
+    ROLE_KEYS,
+    genres_queryset,
+    persons_queryset,
+    serialize_films,
+)
+from movies.synthetic import seed_catalogue
+
+_DEFAULT_SIZES = (50, 500, 5000)
+
+
+def legacy_queryset(fw_queryset: QuerySet) -> QuerySet:
+    """Former "model_to_dict" query: one GROUP BY over all the joins."""
+    annotations = {
+        'genre_list': ArrayAgg('genres__name', distinct=True),
+    }
+    for role, key in ROLE_KEYS.items():
+        annotations[key] = ArrayAgg(
+            'person__full_name',
+            filter=Q(person__personfilmwork__role=str(role)),
+            distinct=True,
+        )
+    return fw_queryset.annotate(**annotations).values()
+
+
+def rows_scanned(queryset: QuerySet) -> int:
+    """Sum of rows read by all scan nodes of the executed plan."""
+    plan = json.loads(queryset.explain(analyze=True, format='json'))
+    nodes = [plan[0]['Plan']]
+    total = 0
+    while nodes:
+        node = nodes.pop()
+        if 'Scan' in node['Node Type']:
+            total += node['Actual Rows'] * node['Actual Loops']
+        nodes.extend(node.get('Plans', ()))
+    return total
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic catalogue inside a transaction, measure query time '
+        'and scanned rows of both serialization paths, then roll back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=_DEFAULT_SIZES,
+            help='Films per page to measure.',
+        )
+        add_spec_arguments(parser)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            for _ in seed_catalogue(spec_from_options(options)):
+                self.stdout.write('.', ending='')
+            self.stdout.write('')
+            self.stdout.write('{0:>6} {1:>10} {2:>10} {3:>12} {4:>12}'.format(
+                'films', 'agg, ms', 'batch, ms', 'agg rows', 'batch rows',
+            ))
+            for size in options['sizes']:
+                self.stdout.write(self.measure(size))
+            transaction.set_rollback(True)
+
+    def measure(self, size: int) -> str:
+        page = mov_model.FilmWork.objects.order_by(
+            'creation_date', 'id',
+        )[:size]
+
+        started = time.perf_counter()
+        list(legacy_queryset(page))
+        legacy_ms = (time.perf_counter() - started) * 1000
+        legacy_rows = rows_scanned(legacy_queryset(page))
+
+        started = time.perf_counter()
+        films = serialize_films(page)
+        batched_ms = (time.perf_counter() - started) * 1000
+        film_ids = [film['id'] for film in films]
+        batched_rows = (
+            rows_scanned(page) +
+            rows_scanned(genres_queryset(film_ids)) +
+            rows_scanned(persons_queryset(film_ids))
+        )
+
+        return '{0:>6} {1:>10.1f} {2:>10.1f} {3:>12} {4:>12}'.format(
+            size, legacy_ms, batched_ms, legacy_rows, batched_rows,
+        )
@@ -0,0 +1,94 @@
+"""Memory and lookup timings of the typeahead index on synthetic names."""
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies.suggest import SUGGEST_MAX_LIMIT, PrefixIndex, normalize
+from movies.synthetic import CatalogueSpec, film_rows, person_rows
+
+_MB = 2 ** 20
+
+
+def _films(spec: CatalogueSpec):
+    for row in film_rows(spec):
+        yield row['id'], row['title'], row['rating']
+
+
+def _persons(spec: CatalogueSpec):
+    for number, row in enumerate(person_rows(spec)):
+        # Synthetic persons are numbered by popularity, as credits
+        yield row['id'], row['full_name'], spec.persons - number
+
+
+# Kind -> names of a spec, scored as the loaded ones
+_KINDS = {'films': _films, 'persons': _persons}
+
+
+class Command(BaseCommand):
+    help = (
+        'Build typeahead indexes of synthetic film titles and person '
+        'names (no database), report their memory per million names and '
+        'lookup times of random typed prefixes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--names', type=int, default=1000000)
+        parser.add_argument('--lookups', type=int, default=10000)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        spec = CatalogueSpec(
+            films=options['names'],
+            persons=options['names'],
+            seed=options['seed'],
+        )
+        sample = CatalogueSpec(
+            films=options['lookups'],
+            persons=options['lookups'],
+            seed=options['seed'],
+        )
+        for kind, names in _KINDS.items():
+            started = time.perf_counter()
+            index = PrefixIndex(names(spec))
+            elapsed = time.perf_counter() - started
+            memory = index.memory()
+            self.stdout.write(
+                '{0}: {1} names built in {2:.1f} s, {3:.1f} MB, {4:.0f} '
+                'bytes a name, {5:.1f} MB per million names'.format(
+                    kind, len(index), elapsed, memory / _MB,
+                    memory / len(index), memory / _MB * 1000000 / len(index),
+                ),
+            )
+            labels = [row[1] for row in names(sample)]
+            self.lookups(index, labels, options)
+
+    def lookups(self, index: PrefixIndex, labels: list, options) -> None:
+        rnd = random.Random(options['seed'])
+        queries = []
+        for _ in range(options['lookups']):
+            words = normalize(rnd.choice(labels)).split()
+            first = rnd.randrange(len(words))
+            typed = ' '.join(words[first:first + rnd.randint(1, 2)])
+            queries.append(typed[:rnd.randint(1, len(typed))])
+        limit = min(options['limit'], SUGGEST_MAX_LIMIT)
+        # First lookups of common prefixes rank them, later ones are cached
+        for name in ('first', 'repeated'):
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                index.search(query, limit)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(
+                '  {0:<9} lookups, ms: median {1:.3f}, p99 {2:.3f}, '
+                'max {3:.3f}'.format(
+                    name,
+                    statistics.median(timings),
+                    timings[int(len(timings) * 0.99)],
+                    timings[-1],
+                ),
+            )
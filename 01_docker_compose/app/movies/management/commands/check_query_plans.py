@@ -0,0 +1,252 @@
+"""Query plan regression guard of the API and admin queries."""
+
+import json
+import re
+from typing import Callable, Iterator
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from movies import models as mov_model
+from movies.management.commands.bench_api import _CLIENT_ADDR, _HOST
+from movies.pagination import (
+    CURSOR_ORDERING,
+    encode_cursor,
+    encode_name_cursor,
+)
+from movies.read_model import refresh_documents
+from movies.signals import _film_ids_of
+
+# Statements which are safe to run by EXPLAIN ANALYZE
+_SELECT = re.compile(r'^\s*SELECT\b', re.IGNORECASE)
+_RELATION_KINDS = ('r', 'm')
+_SORTS = frozenset(('Sort', 'Incremental Sort'))
+# Cached responses and totals would answer without the queries to check
+_NO_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    for alias in ('default', 'api')
+}
+
+
+def _nodes(plan: dict) -> Iterator[tuple[dict, tuple]]:
+    """Plan nodes with the types of their ancestors, closest first."""
+    nodes = [(plan, ())]
+    while nodes:
+        node, ancestors = nodes.pop()
+        yield node, ancestors
+        for child in node.get('Plans', ()):
+            nodes.append((child, (node['Node Type'], *ancestors)))
+
+
+def _feeds_top_rows(ancestors: tuple) -> bool:
+    """Whole table is sorted to return its first rows: no order index."""
+    return bool(ancestors) and ancestors[0] in _SORTS and 'Limit' in ancestors
+
+
+class Command(BaseCommand):
+    help = (
+        'Request the canonical API and admin pages of a seeded database, '
+        'run EXPLAIN (ANALYZE, BUFFERS) on every SELECT they issue and '
+        'fail on sequential scans of large tables and on row estimates '
+        'far from the actual rows. Caches are off and everything is '
+        'rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--large-table-rows', type=int, default=10000,
+            help='Tables with more (estimated) rows must not be seq scanned.',
+        )
+        parser.add_argument(
+            '--seq-scan-share', type=float, default=0.5,
+            help=(
+                'Seq scans of large tables returning less than this share '
+                'of rows lack an index.'
+            ),
+        )
+        parser.add_argument(
+            '--max-estimate-ratio', type=float, default=100,
+            help='Allowed ratio of actual to estimated rows of a node.',
+        )
+        parser.add_argument(
+            '--min-estimate-rows', type=int, default=1000,
+            help='Ratio is checked for nodes with more rows only.',
+        )
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Print the plan summary of every query.',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.large_tables = self.get_large_tables()
+        if not self.large_tables:
+            raise CommandError(
+                'No tables above {0} rows, run "seed_catalogue" first'.format(
+                    options['large_table_rows'],
+                ),
+            )
+        problems = []
+        checked = 0
+        with override_settings(CACHES=_NO_CACHES), transaction.atomic():
+            for name, run in self.scenarios():
+                with CaptureQueriesContext(connection) as captured:
+                    run()
+                selects = [
+                    query for query in captured
+                    if _SELECT.match(query['sql'])
+                ]
+                if not selects:
+                    problems.append('{0}: no SELECT to check'.format(name))
+                for query in selects:
+                    checked += 1
+                    for problem in self.check_plan(query['sql']):
+                        problems.append('{0}: {1}\n    {2}'.format(
+                            name, problem, query['sql'][:300],
+                        ))
+            transaction.set_rollback(True)
+
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError('{0} plan problems in {1} queries'.format(
+                len(problems), checked,
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            'Plans of {0} queries are fine'.format(checked),
+        ))
+
+    def get_large_tables(self) -> dict:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT relname, reltuples FROM pg_class '
+                'JOIN pg_namespace ON pg_namespace.oid = relnamespace '
+                "WHERE nspname = 'content' AND relkind = ANY(%s) "
+                'AND reltuples >= %s',
+                [list(_RELATION_KINDS), self.options['large_table_rows']],
+            )
+            return dict(cursor.fetchall())
+
+    def check_plan(self, sql: str) -> Iterator[str]:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {0}'.format(
+                    sql.replace('%', '%%'),
+                ),
+            )
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        root = plan[0]['Plan']
+        if self.options['verbose_plans']:
+            self.stdout.write('{0:.1f} ms {1}'.format(
+                root['Actual Total Time'], sql[:120],
+            ))
+        for node, ancestors in _nodes(root):
+            if node['Node Type'] == 'Seq Scan':
+                yield from self.check_seq_scan(node, ancestors)
+            if node.get('Actual Loops'):
+                yield from self.check_estimate(node)
+
+    def check_seq_scan(self, node: dict, ancestors: tuple) -> Iterator[str]:
+        relation = node['Relation Name']
+        if relation not in self.large_tables:
+            return
+        rows = node['Actual Rows'] * node['Actual Loops']
+        # Reading most of a table, a seq scan is the best plan anyway
+        selective = rows < (
+            self.large_tables[relation] * self.options['seq_scan_share']
+        )
+        if selective or _feeds_top_rows(ancestors):
+            yield 'Seq Scan on {0} ({1} of {2:.0f} rows)'.format(
+                relation, rows, self.large_tables[relation],
+            )
+
+    def check_estimate(self, node: dict) -> Iterator[str]:
+        """Underestimates: they make the planner pick nested loops.
+
+        Overestimates are normal under LIMIT, the scan stops early.
+        """
+        estimated = node['Plan Rows']
+        actual = node['Actual Rows']
+        if actual < self.options['min_estimate_rows']:
+            return
+        if actual > max(estimated, 1) * self.options['max_estimate_ratio']:
+            yield '{0} on {1}: {2} rows estimated, {3} actual'.format(
+                node['Node Type'], node.get('Relation Name', '-'),
+                estimated, actual,
+            )
+
+    def scenarios(self) -> Iterator[tuple[str, Callable]]:
+        client = Client(HTTP_HOST=_HOST, REMOTE_ADDR=_CLIENT_ADDR)
+        client.force_login(get_user_model().objects.create_superuser(
+            'check-plans', password=None,
+        ))
+        documents = mov_model.FilmWorkDocument.objects.order_by(
+            *CURSOR_ORDERING,
+        )
+        middle = documents[documents.count() // 2]
+        film_ids = [
+            str(film_id) for film_id in documents.filter(
+                creation_date__gte=middle.creation_date,
+            ).values_list('id', flat=True)[:100]
+        ]
+        genre = mov_model.Genre.objects.order_by('name').first()
+        # Most credited persons are the costliest fan-outs
+        person = mov_model.PersonFilmWork.objects.values(
+            'person_id',
+        ).annotate(credits=Count('id')).order_by('-credits').first()
+        film = mov_model.FilmWork.objects.get(pk=middle.pk)
+        persons = mov_model.Person.objects.order_by('full_name', 'id')
+        middle_person = persons[persons.count() // 2]
+
+        urls = [
+            '/api/v1/movies/?page=1',
+            '/api/v1/movies/?page=2&sort=-rating',
+            '/api/v1/movies/?page=2&sort=title',
+            '/api/v1/movies/?cursor={0}'.format(
+                encode_cursor(middle.creation_date, middle.pk),
+            ),
+            '/api/v1/movies/{0}/'.format(middle.pk),
+            '/api/v1/movies/batch/?ids={0}'.format(','.join(film_ids)),
+            '/api/v1/changes/?limit=100',
+            '/api/v1/persons/',
+            '/api/v1/persons/?cursor={0}'.format(
+                encode_name_cursor(middle_person.full_name, middle_person.pk),
+            ),
+            '/admin/movies/filmwork/',
+            '/admin/movies/filmwork/?type=movie',
+            '/admin/movies/filmwork/{0}/change/'.format(film.pk),
+            '/admin/movies/person/',
+            '/admin/movies/genre/',
+        ]
+        if genre is not None:
+            urls.append('/api/v1/movies/?genre={0}'.format(genre.name))
+            urls.append('/api/v1/genres/{0}/films/'.format(genre.pk))
+        if person is not None:
+            urls.append('/api/v1/persons/{0}/'.format(person['person_id']))
+        for url in urls:
+            yield url, self.get(client, url)
+        yield 'read model refresh', lambda: refresh_documents(film_ids)
+        if person is not None:
+            yield 'person fan-out', lambda: _film_ids_of(
+                mov_model.PersonFilmWork, person_id=person['person_id'],
+            )
+        if genre is not None:
+            yield 'genre fan-out', lambda: _film_ids_of(
+                mov_model.GenreFilmWork, genre_id=genre.pk,
+            )
+
+    @staticmethod
+    def get(client: Client, url: str) -> Callable:
+        def run():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError('{0} answered {1}'.format(
+                    url, response.status_code,
+                ))
+        return run
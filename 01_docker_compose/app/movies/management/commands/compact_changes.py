@@ -0,0 +1,33 @@
+"""Compaction of the change feed, to run periodically (e.g. cron)."""
+
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from movies.outbox import compact
+
+
+class Command(BaseCommand):
+    help = (
+        'Drop change feed records superseded by a later change of the same '
+        'film and records older than the retention. Consumers lagging '
+        'more than the retention have to resync from the export.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-age', type=int, default=settings.API_CHANGES_RETENTION_DAYS,
+            help='Days to keep records, 0 - keep all.',
+        )
+
+    def handle(self, *args, **options):
+        max_age = None
+        if options['max_age']:
+            max_age = datetime.timedelta(days=options['max_age'])
+        superseded, expired = compact(max_age)
+        self.stdout.write(self.style.SUCCESS(
+            'Dropped {0} superseded and {1} expired records'.format(
+                superseded, expired,
+            ),
+        ))
@@ -0,0 +1,58 @@
+"""Dump the catalogue as NDJSON of API film documents."""
+
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.export import (
+    EXPORT_CHUNK_SIZE,
+    export_lines,
+    export_window,
+    parse_modified_since,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Write film documents (as "/api/v1/movies/<id>/" returns them) '
+        'one per line.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modified-since',
+            help='Only films changed after this ISO 8601 date time.',
+        )
+        parser.add_argument(
+            '--output', help='File to write, standard output by default.',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        modified_since = None
+        if options['modified_since']:
+            try:
+                modified_since = parse_modified_since(
+                    options['modified_since'],
+                )
+            except ValueError as exc:
+                raise CommandError(exc)
+        modified_until = export_window(modified_since)
+
+        output = sys.stdout
+        if options['output']:
+            output = open(options['output'], 'w', encoding='utf-8')
+        try:
+            for block in export_lines(
+                modified_since, modified_until, options['chunk_size'],
+            ):
+                output.write(block)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        if modified_until is not None:
+            self.stderr.write('Next --modified-since: {0}'.format(
+                modified_until.isoformat(),
+            ))
@@ -0,0 +1,147 @@
+"""Bulk load of the catalogue from CSV, NDJSON files or SQLite database."""
+
+import csv
+import itertools
+import json
+import sqlite3
+from pathlib import Path
+from typing import Iterator
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from movies.loader import TABLES, Table, copy_batch, normalize
+from movies.read_model import rebuild_documents
+
+_FORMATS = ('csv', 'ndjson', 'sqlite')
+
+
+def _read_csv(path: Path, skip: int) -> Iterator[dict]:
+    with open(path, newline='', encoding='utf-8') as source:
+        reader = csv.DictReader(source)
+        for row in itertools.islice(reader, skip, None):
+            # Empty CSV field is the only way to write NULL there
+            yield {key: value or None for key, value in row.items()}
+
+
+def _read_ndjson(path: Path, skip: int) -> Iterator[dict]:
+    with open(path, encoding='utf-8') as source:
+        for line in itertools.islice(source, skip, None):
+            if line.strip():
+                yield json.loads(line)
+
+
+def _read_sqlite(path: Path, table: str, skip: int) -> Iterator[dict]:
+    database = sqlite3.connect(path)
+    database.row_factory = sqlite3.Row
+    try:
+        rows = database.execute(
+            'SELECT * FROM {0} ORDER BY rowid LIMIT -1 OFFSET ?'.format(table),
+            (skip,),
+        )
+        for row in rows:
+            yield dict(row)
+    finally:
+        database.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Load genres, persons, films and their links. Source is a directory '
+        'with <table>.csv or <table>.ndjson files or an SQLite database '
+        'with tables of the same names: ' +
+        ', '.join(table.name for table in TABLES) + '. Absent files and '
+        'tables are skipped. Rows are upserted, so a failed load can be '
+        'resumed from its checkpoint file or just run again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Directory or SQLite file.')
+        parser.add_argument('--format', choices=_FORMATS, default='csv')
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Rows per transaction.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='JSON file with rows done per table, to resume a load.',
+        )
+        parser.add_argument(
+            '--no-rebuild', action='store_true',
+            help='Skip API read model rebuild after the load.',
+        )
+
+    def handle(self, *args, **options):
+        source = Path(options['source'])
+        if not source.exists():
+            raise CommandError('{0} does not exist'.format(source))
+        self.checkpoint_path = options['checkpoint']
+        self.done = {}
+        if self.checkpoint_path and Path(self.checkpoint_path).exists():
+            with open(self.checkpoint_path, encoding='utf-8') as checkpoint:
+                self.done = json.load(checkpoint)
+
+        for table in TABLES:
+            rows = self.read(source, options['format'], table)
+            if rows is not None:
+                self.load(table, rows, options['batch_size'])
+
+        # Loaded completely, the next run starts from scratch
+        if self.checkpoint_path and Path(self.checkpoint_path).exists():
+            Path(self.checkpoint_path).unlink()
+
+        if not options['no_rebuild']:
+            for processed in rebuild_documents():
+                self.stdout.write('Refreshed {0} films'.format(processed))
+        self.stdout.write(self.style.SUCCESS('Catalogue loaded'))
+
+    def read(self, source: Path, source_format: str, table: Table):
+        skip = self.done.get(table.name, 0)
+        if source_format == 'sqlite':
+            database = sqlite3.connect(source)
+            try:
+                exists = database.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                    'AND name = ?',
+                    (table.name,),
+                ).fetchone()
+            finally:
+                database.close()
+            return _read_sqlite(source, table.name, skip) if exists else None
+
+        path = source / '{0}.{1}'.format(table.name, source_format)
+        if not path.exists():
+            return None
+        if source_format == 'csv':
+            return _read_csv(path, skip)
+        return _read_ndjson(path, skip)
+
+    def load(self, table: Table, rows: Iterator[dict], batch_size: int):
+        done = self.done.get(table.name, 0)
+        if done:
+            self.stdout.write('{0}: resuming after {1} rows'.format(
+                table.name, done,
+            ))
+        rows = map(normalize, rows)
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            try:
+                copy_batch(table, batch)
+            except DatabaseError as exc:
+                raise CommandError(
+                    '{0}: batch after row {1} failed: {2}'.format(
+                        table.name, done, exc,
+                    ),
+                )
+            done += len(batch)
+            self.done[table.name] = done
+            self.save_checkpoint()
+            self.stdout.write('{0}: {1} rows'.format(table.name, done))
+
+    def save_checkpoint(self):
+        if not self.checkpoint_path:
+            return
+        with open(self.checkpoint_path, 'w', encoding='utf-8') as checkpoint:
+            json.dump(self.done, checkpoint)
@@ -0,0 +1,91 @@
+"""Fixed concurrency HTTP load test of running API servers."""
+
+import random
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+_DEFAULT_PATHS = ('/api/v1/movies/?page={page}',)
+_HEADER = '{0:>10} {1:>8} {2:>7} {3:>9} {4:>9} {5:>9} {6:>9}'
+_ROW = '{0:>10} {1:>8} {2:>7} {3:>9.1f} {4:>9.1f} {5:>9.1f} {6:>9.1f}'
+
+
+def percentile(samples: list, share: float) -> float:
+    """Nearest rank percentile of sorted samples."""
+    if not samples:
+        return 0
+    return samples[min(len(samples) - 1, int(len(samples) * share))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure throughput and latency percentiles of API servers, e.g. '
+        'sync (gunicorn) against async (uvicorn) deployment. Run servers '
+        'with API_CACHE_BACKEND=django.core.cache.backends.dummy.DummyCache '
+        'to load the database rather than the response cache.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True,
+            help='NAME=BASE_URL, e.g. sync=http://127.0.0.1:8000',
+        )
+        parser.add_argument(
+            '--path', action='append',
+            help='Request path, "{page}" is replaced by a random page.',
+        )
+        parser.add_argument('--max-page', type=int, default=20)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.stdout.write(_HEADER.format(
+            'target', 'requests', 'errors', 'req/s',
+            'p50, ms', 'p95, ms', 'p99, ms',
+        ))
+        for target in options['target']:
+            name, _, base_url = target.partition('=')
+            if not base_url:
+                raise CommandError('Target must be NAME=BASE_URL')
+            rnd = random.Random(options['seed'])
+            paths = options['path'] or _DEFAULT_PATHS
+            urls = [
+                base_url.rstrip('/') + rnd.choice(paths).format(
+                    page=rnd.randint(1, options['max_page']),
+                )
+                for _ in range(options['requests'])
+            ]
+            self.stdout.write(self.run(name, urls, options))
+
+    def run(self, name: str, urls: list, options: dict) -> str:
+        def fetch(url: str):
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(  # noqa: S310
+                    url, timeout=options['timeout'],
+                ) as response:
+                    response.read()
+            except (urllib.error.URLError, OSError):
+                return None
+            return (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(fetch, urls))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(ms for ms in results if ms is not None)
+        return _ROW.format(
+            name,
+            len(urls),
+            len(urls) - len(latencies),
+            len(latencies) / elapsed,
+            percentile(latencies, 0.5),
+            percentile(latencies, 0.95),
+            percentile(latencies, 0.99),
+        )
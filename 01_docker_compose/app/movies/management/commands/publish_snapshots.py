@@ -0,0 +1,34 @@
+"""Full publish of static API snapshots, see "movies.snapshots"."""
+
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.snapshots import publish_all, snapshot_root
+
+
+class Command(BaseCommand):
+    help = (
+        'Write film details and list pages of the API as static files '
+        '(with gzip and brotli variants) for nginx. Unchanged files are '
+        'kept, snapshots of deleted films are removed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--root', type=Path,
+            help='Snapshot directory, API_SNAPSHOT_ROOT by default.',
+        )
+
+    def handle(self, *args, **options):
+        root = options['root'] or snapshot_root()
+        if root is None:
+            raise CommandError('Set API_SNAPSHOT_ROOT or pass --root')
+        films = written = 0
+        for films, written in publish_all(root):
+            self.stdout.write('Published {0} films'.format(films))
+        self.stdout.write(self.style.SUCCESS(
+            'Published {0} films to {1}, {2} files changed'.format(
+                films, root, written,
+            ),
+        ))
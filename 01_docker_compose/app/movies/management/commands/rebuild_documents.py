@@ -0,0 +1,33 @@
+"""Full rebuild of "FilmWorkDocument" read model."""
+
+from django.core.management.base import BaseCommand
+
+from movies.models import FilmWork, FilmWorkDocument
+from movies.read_model import REFRESH_CHUNK_SIZE, rebuild_documents
+
+
+class Command(BaseCommand):
+    help = 'Recompute API documents of all the films.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=REFRESH_CHUNK_SIZE,
+            help='Films refreshed per transaction.',
+        )
+        parser.add_argument(
+            '--if-empty', action='store_true',
+            help='Do nothing if the read model is already populated.',
+        )
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and (
+            FilmWorkDocument.objects.exists() or
+            not FilmWork.objects.exists()
+        ):
+            return
+        processed = 0
+        for processed in rebuild_documents(options['chunk_size']):
+            self.stdout.write('Refreshed {0} films'.format(processed))
+        self.stdout.write(
+            self.style.SUCCESS('Rebuilt {0} documents'.format(processed)),
+        )
@@ -0,0 +1,58 @@
+"""Fill the database with a synthetic catalogue."""
+
+from django.core.management.base import BaseCommand
+
+from movies.read_model import rebuild_documents
+from movies.synthetic import CatalogueSpec, seed_catalogue
+
+
+def add_spec_arguments(parser) -> None:
+    """Options of "CatalogueSpec", shared by benchmark commands."""
+    defaults = CatalogueSpec()
+    parser.add_argument('--films', type=int, default=defaults.films)
+    parser.add_argument('--persons', type=int, default=defaults.persons)
+    parser.add_argument('--genres', type=int, default=defaults.genres)
+    parser.add_argument(
+        '--genres-per-film', type=int, nargs=2, metavar=('MIN', 'MAX'),
+        default=defaults.genres_per_film,
+    )
+    parser.add_argument(
+        '--persons-per-film', type=int, nargs=2, metavar=('MIN', 'MAX'),
+        default=defaults.persons_per_film,
+    )
+    parser.add_argument(
+        '--person-skew', type=float, default=defaults.person_skew,
+        help='Zipf exponent of person popularity, 0 - uniform.',
+    )
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+
+
+def spec_from_options(options: dict) -> CatalogueSpec:
+    return CatalogueSpec(
+        films=options['films'],
+        persons=options['persons'],
+        genres=options['genres'],
+        genres_per_film=tuple(options['genres_per_film']),
+        persons_per_film=tuple(options['persons_per_film']),
+        person_skew=options['person_skew'],
+        seed=options['seed'],
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Load a reproducible synthetic catalogue. Loading the same spec '
+        'again changes nothing, rows are keyed by generated ids.'
+    )
+
+    def add_arguments(self, parser):
+        add_spec_arguments(parser)
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        spec = spec_from_options(options)
+        for table, done in seed_catalogue(spec, options['batch_size']):
+            self.stdout.write('{0}: {1} rows'.format(table, done))
+        for processed in rebuild_documents():
+            self.stdout.write('Refreshed {0} films'.format(processed))
+        self.stdout.write(self.style.SUCCESS('Seeded {0}'.format(spec)))
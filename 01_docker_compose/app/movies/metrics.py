@@ -0,0 +1,340 @@
+"""Per request performance metrics: SQL, database and rendering time.
+
+Every database connection gets an execute wrapper which adds the query
+to the stats of the current request (a context variable, so queries run
+by async views in pool threads count too). The middleware reports the
+stats in "Server-Timing" header and aggregates them per route for
+"/metrics" in Prometheus text format.
+
+Metrics are per process: series are labeled with "pid", sum them over
+workers.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+_QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+_BYTES_BUCKETS = (1024, 10240, 102400, 1048576)
+# Longer repeated SQL is cut in the log
+_SQL_LOG_LENGTH = 300
+
+
+class RequestStats:
+    """Costs of one request, filled while it's processed."""
+
+    def __init__(self, sampled: bool):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        # SQL text counts, only gathered for sampled requests
+        self.statements = Counter() if sampled else None
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Statements run at least "threshold" times, an N+1 pattern."""
+        if self.statements is None:
+            return []
+        return [
+            (sql, count)
+            for sql, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = (
+    contextvars.ContextVar('request_stats', default=None)
+)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper, installed on every connection."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_seconds += time.perf_counter() - started
+        stats.queries += 1
+        if stats.statements is not None:
+            stats.statements[sql] += 1
+
+
+def request_stats() -> Optional[RequestStats]:
+    """Stats of the request being served, None outside requests."""
+    return _current.get()
+
+
+def install_wrapper(sender, connection, **kwargs) -> None:
+    """"connection_created" handler."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextlib.contextmanager
+def rendering() -> Iterator[None]:
+    """Count the block as response rendering (serialization) time."""
+    stats = _current.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.render_seconds += time.perf_counter() - started
+
+
+class _Histogram:
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.total += 1
+        self.sum += value
+
+
+class _Registry:
+    """Counters and histograms by (route, method, status) labels."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.db_seconds = Counter()
+        self.render_seconds = Counter()
+        self.sampled = Counter()
+        self.repeated = Counter()
+        self.duration = defaultdict(lambda: _Histogram(_DURATION_BUCKETS))
+        self.queries = defaultdict(lambda: _Histogram(_QUERIES_BUCKETS))
+        self.sizes = defaultdict(lambda: _Histogram(_BYTES_BUCKETS))
+        # By (lane, reason) and by lane, see "movies.admission"
+        self.shed = Counter()
+        self.in_flight = Counter()
+
+    def observe(
+        self,
+        labels: tuple,
+        stats: RequestStats,
+        seconds: float,
+        size: Optional[int],
+        repeated: int,
+    ) -> None:
+        route = labels[0]
+        with self.lock:
+            self.requests[labels] += 1
+            self.duration[route].observe(seconds)
+            self.queries[route].observe(stats.queries)
+            if size is not None:
+                self.sizes[route].observe(size)
+            self.db_seconds[route] += stats.db_seconds
+            self.render_seconds[route] += stats.render_seconds
+            if stats.statements is not None:
+                self.sampled[route] += 1
+            self.repeated[route] += repeated
+
+    def observe_shed(self, lane: str, reason: str) -> None:
+        with self.lock:
+            self.shed[lane, reason] += 1
+
+    def set_in_flight(self, lane: str, count: int) -> None:
+        with self.lock:
+            self.in_flight[lane] = count
+
+    def exposition(self) -> str:
+        """Prometheus text format of all the metrics."""
+        pid = str(os.getpid())
+        lines = []
+        with self.lock:
+            _counter(
+                lines, 'http_requests_total', 'Requests.',
+                ('route', 'method', 'status'), self.requests, pid,
+            )
+            _histogram(
+                lines, 'http_request_duration_seconds',
+                'Request processing time.', self.duration, pid,
+            )
+            _histogram(
+                lines, 'http_request_db_queries',
+                'SQL queries per request.', self.queries, pid,
+            )
+            _histogram(
+                lines, 'http_response_size_bytes',
+                'Response body size, streaming responses are not counted.',
+                self.sizes, pid,
+            )
+            for name, help_text, values in (
+                (
+                    'http_request_db_seconds_total', 'SQL time.',
+                    self.db_seconds,
+                ),
+                (
+                    'http_request_render_seconds_total',
+                    'Response serialization time.', self.render_seconds,
+                ),
+                (
+                    'http_requests_sampled_total',
+                    'Requests checked for repeated SQL.', self.sampled,
+                ),
+                (
+                    'http_requests_repeated_sql_total',
+                    'Sampled requests with repeated SQL (N+1 queries).',
+                    self.repeated,
+                ),
+            ):
+                _counter(
+                    lines, name, help_text, ('route',),
+                    {(route,): value for route, value in values.items()},
+                    pid,
+                )
+            _counter(
+                lines, 'http_requests_shed_total',
+                'Requests answered 503 by admission control.',
+                ('lane', 'reason'), self.shed, pid,
+            )
+            _counter(
+                lines, 'http_requests_in_flight',
+                'Requests being served, by admission lane.', ('lane',),
+                {(lane,): count for lane, count in self.in_flight.items()},
+                pid, kind='gauge',
+            )
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names: tuple, values: tuple, pid: str) -> str:
+    pairs = zip((*names, 'pid'), (*values, pid))
+    return '{{{0}}}'.format(','.join(
+        '{0}="{1}"'.format(name, _escape(str(value))) for name, value in pairs
+    ))
+
+
+def _counter(
+    lines, name, help_text, label_names, values, pid, kind='counter',
+) -> None:
+    lines.append('# HELP {0} {1}'.format(name, help_text))
+    lines.append('# TYPE {0} {1}'.format(name, kind))
+    for label_values, value in sorted(values.items()):
+        lines.append('{0}{1} {2}'.format(
+            name, _labels(label_names, label_values, pid), value,
+        ))
+
+
+def _histogram(lines, name, help_text, histograms, pid) -> None:
+    lines.append('# HELP {0} {1}'.format(name, help_text))
+    lines.append('# TYPE {0} histogram'.format(name))
+    for route, histogram in sorted(histograms.items()):
+        bounds = [*map(str, histogram.buckets), '+Inf']
+        for bound, count in zip(bounds, [*histogram.counts, histogram.total]):
+            lines.append('{0}_bucket{1} {2}'.format(
+                name, _labels(('route', 'le'), (route, bound), pid), count,
+            ))
+        labels = _labels(('route',), (route,), pid)
+        lines.append('{0}_sum{1} {2}'.format(name, labels, histogram.sum))
+        lines.append('{0}_count{1} {2}'.format(
+            name, labels, histogram.total,
+        ))
+
+
+registry = _Registry()
+
+
+def _route(request: HttpRequest) -> str:
+    # Patterns, not paths: the number of series stays bounded
+    match = request.resolver_match
+    if match is None:
+        return 'unmatched'
+    return '/{0}'.format(match.route)
+
+
+def _server_timing(stats: RequestStats, seconds: float) -> str:
+    return ', '.join((
+        'db;dur={0:.1f};desc="{1} queries"'.format(
+            stats.db_seconds * 1000, stats.queries,
+        ),
+        'render;dur={0:.1f}'.format(stats.render_seconds * 1000),
+        'total;dur={0:.1f}'.format(seconds * 1000),
+    ))
+
+
+def _start() -> tuple:
+    sampled = random.random() < settings.METRICS_SAMPLE_RATE  # noqa: S311
+    stats = RequestStats(sampled)
+    return stats, _current.set(stats), time.perf_counter()
+
+
+def _finish(
+    request: HttpRequest,
+    response: HttpResponse,
+    stats: RequestStats,
+    started: float,
+) -> None:
+    seconds = time.perf_counter() - started
+    route = _route(request)
+    repeated = stats.repeated(settings.METRICS_REPEATED_SQL_THRESHOLD)
+    for sql, count in repeated:
+        logger.warning(
+            'Repeated SQL (%d times) in %s %s: %s',
+            count, request.method, route, sql[:_SQL_LOG_LENGTH],
+        )
+    size = None if response.streaming else len(response.content)
+    registry.observe(
+        (route, request.method, str(response.status_code)),
+        stats, seconds, size, int(bool(repeated)),
+    )
+    if settings.METRICS_SERVER_TIMING:
+        response['Server-Timing'] = _server_timing(stats, seconds)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Measure each request, see the module docstring."""
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats, token, started = _start()
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            _finish(request, response, stats, started)
+            return response
+    else:
+        def middleware(request):
+            stats, token, started = _start()
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            _finish(request, response, stats, started)
+            return response
+    return middleware
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Prometheus scrape endpoint, keep it off the public proxy."""
+    return HttpResponse(
+        registry.exposition(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
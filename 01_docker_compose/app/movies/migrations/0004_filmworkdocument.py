@@ -0,0 +1,34 @@
+# Generated by Django 4.0.3 on 2026-10-18 14:42
+
+import django.contrib.postgres.fields
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_filmwork_creation_date_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmWorkDocument',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('creation_date', models.DateField()),
+                ('genres', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=100), default=list, size=None)),
+                ('actors', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=200), default=list, size=None)),
+                ('directors', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=200), default=list, size=None)),
+                ('writers', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=200), default=list, size=None)),
+                ('document', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+            ],
+            options={
+                'db_table': 'content"."film_work_document',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=models.Index(fields=['creation_date', 'id'], name='film_work_doc_creation_date_id'),
+        ),
+    ]
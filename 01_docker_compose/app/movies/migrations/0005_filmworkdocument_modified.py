@@ -0,0 +1,19 @@
+# Generated by Django 4.0.3 on 2026-10-18 14:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_filmworkdocument'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='filmworkdocument',
+            name='modified',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
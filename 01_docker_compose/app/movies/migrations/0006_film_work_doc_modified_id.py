@@ -0,0 +1,17 @@
+# Generated by Django 4.0.3 on 2026-10-18 14:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_filmworkdocument_modified'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=models.Index(fields=['modified', 'id'], name='film_work_doc_modified_id'),
+        ),
+    ]
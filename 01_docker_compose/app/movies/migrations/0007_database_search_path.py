@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# Applies to new sessions, so clients don't pass search_path on connect
+# (connection poolers like PgBouncer reject such startup options).
+SET_SEARCH_PATH = """
+DO $$
+BEGIN
+    EXECUTE format(
+        'ALTER DATABASE %I SET search_path = public, content',
+        current_database()
+    );
+END
+$$;
+"""
+
+RESET_SEARCH_PATH = """
+DO $$
+BEGIN
+    EXECUTE format(
+        'ALTER DATABASE %I RESET search_path', current_database()
+    );
+END
+$$;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_film_work_doc_modified_id'),
+    ]
+
+    operations = [
+        migrations.RunSQL(SET_SEARCH_PATH, RESET_SEARCH_PATH),
+    ]
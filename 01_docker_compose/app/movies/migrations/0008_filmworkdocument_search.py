@@ -0,0 +1,82 @@
+# Generated by Django 4.0.3 on 2026-10-18 14:57
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+import django.db.models.expressions
+
+# Existing documents get the new columns from their JSON
+_FILL_COLUMNS = """
+UPDATE "content"."film_work_document" SET
+    title = COALESCE(document->>'title', ''),
+    rating = (document->>'rating')::double precision,
+    type = COALESCE(document->>'type', ''),
+    search =
+        setweight(to_tsvector('english', COALESCE(document->>'title', '')), 'A') ||
+        setweight(to_tsvector('english', COALESCE(document->>'description', '')), 'B')
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_database_search_path'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='filmworkdocument',
+            name='rating',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='filmworkdocument',
+            name='search',
+            field=django.contrib.postgres.search.SearchVectorField(null=True),
+        ),
+        migrations.AddField(
+            model_name='filmworkdocument',
+            name='title',
+            field=models.CharField(default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='filmworkdocument',
+            name='type',
+            field=models.CharField(default='', max_length=15),
+        ),
+        migrations.RunSQL(_FILL_COLUMNS, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search'], name='film_work_doc_search'),
+        ),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='film_work_doc_title_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['genres'], name='film_work_doc_genres'),
+        ),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['actors'], name='film_work_doc_actors'),
+        ),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['directors'], name='film_work_doc_directors'),
+        ),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['writers'], name='film_work_doc_writers'),
+        ),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=models.Index(django.db.models.expressions.OrderBy(django.db.models.expressions.F('rating'), descending=True, nulls_last=True), django.db.models.expressions.OrderBy(django.db.models.expressions.F('id'), descending=True), name='film_work_doc_rating_id'),
+        ),
+        migrations.AddIndex(
+            model_name='filmworkdocument',
+            index=models.Index(fields=['title', 'id'], name='film_work_doc_title_id'),
+        ),
+    ]
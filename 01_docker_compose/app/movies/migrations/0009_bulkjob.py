@@ -0,0 +1,33 @@
+# Generated by Django 4.0.3 on 2026-10-18 15:09
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_filmworkdocument_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BulkJob',
+            fields=[
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='modified')),
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('operation', models.CharField(max_length=50, verbose_name='operation')),
+                ('params', models.JSONField(default=dict, verbose_name='parameters')),
+                ('object_ids', django.contrib.postgres.fields.ArrayField(base_field=models.UUIDField(), size=None)),
+                ('total', models.PositiveIntegerField(verbose_name='total')),
+                ('done', models.PositiveIntegerField(default=0, verbose_name='done')),
+            ],
+            options={
+                'verbose_name': 'bulk job',
+                'verbose_name_plural': 'bulk jobs',
+                'db_table': 'content"."bulk_job',
+            },
+        ),
+    ]
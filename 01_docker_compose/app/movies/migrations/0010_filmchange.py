@@ -0,0 +1,39 @@
+# Generated by Django 4.0.3 on 2026-10-18 15:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0009_bulkjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('txid', models.BigIntegerField()),
+                ('film_work_id', models.UUIDField()),
+                ('source', models.CharField(max_length=30)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'content"."film_change',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='filmchange',
+            index=models.Index(fields=['txid', 'id'], name='film_change_txid_id'),
+        ),
+        migrations.AddIndex(
+            model_name='filmchange',
+            index=models.Index(fields=['film_work_id'], name='film_change_film_work_id'),
+        ),
+        migrations.AddIndex(
+            model_name='filmchange',
+            index=models.Index(fields=['created'], name='film_change_created'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.0.3 on 2026-10-18 15:21
+
+from django.contrib.postgres.operations import (
+    AddIndexConcurrently,
+    RemoveIndexConcurrently,
+)
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes are built without locking writes, outside a transaction.
+    # New ones come first, so lookups are never left without an index.
+    atomic = False
+
+    dependencies = [
+        ('movies', '0010_filmchange'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='genrefilmwork',
+            index=models.Index(fields=['genre', 'film_work'], name='genre_film_work_genre_film'),
+        ),
+        AddIndexConcurrently(
+            model_name='person',
+            index=models.Index(fields=['full_name'], name='person_full_name'),
+        ),
+        AddIndexConcurrently(
+            model_name='personfilmwork',
+            index=models.Index(fields=['film_work', 'role', 'person'], name='person_film_work_film_role'),
+        ),
+        AddIndexConcurrently(
+            model_name='personfilmwork',
+            index=models.Index(fields=['person', 'film_work'], name='person_film_work_person_film'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='genrefilmwork',
+            name='genre_film_work_film_work_id',
+        ),
+        RemoveIndexConcurrently(
+            model_name='genrefilmwork',
+            name='genre_film_work_genre_id',
+        ),
+        RemoveIndexConcurrently(
+            model_name='personfilmwork',
+            name='person_film_work_film_work_id',
+        ),
+        RemoveIndexConcurrently(
+            model_name='personfilmwork',
+            name='person_film_work_person_id',
+        ),
+    ]
@@ -0,0 +1,264 @@
+# Generated by Django 4.0.3 on 2026-10-18 15:37
+
+from django.db import OperationalError, migrations, models, transaction
+
+# Heap pages of the old table copied per batch (8 MB)
+_BATCH_PAGES = 1024
+# Tries to lock the old table for the swap, 10 seconds each
+_SWAP_ATTEMPTS = 5
+
+# Link tables rebuilt with bigserial ids and without "created": the
+# columns, the natural key (nullable columns) and the indexes other than
+# the primary key and the foreign keys, which are copied.
+_TABLES = {
+    'genre_film_work': {
+        'columns': 'film_work_id uuid NOT NULL, genre_id uuid NOT NULL',
+        'key': ('film_work_id', 'genre_id'),
+        'nullable': (),
+        'constraints': {
+            'unique_film_genre': 'UNIQUE (film_work_id, genre_id)',
+        },
+        'indexes': {
+            'genre_film_work_genre_film': 'INDEX {0} (genre_id, film_work_id)',
+        },
+    },
+    'person_film_work': {
+        'columns': (
+            'film_work_id uuid NOT NULL, person_id uuid NOT NULL, '
+            'role varchar(15) NULL'
+        ),
+        'key': ('film_work_id', 'person_id', 'role'),
+        'nullable': ('role',),
+        'constraints': {
+            'unique_film_person_role': (
+                'UNIQUE (film_work_id, role, person_id)'
+            ),
+        },
+        'indexes': {
+            'unique_film_person_unknown_role': (
+                'UNIQUE INDEX {0} (film_work_id, person_id) '
+                'WHERE role IS NULL'
+            ),
+            'person_film_work_person_film': (
+                'INDEX {0} (person_id, film_work_id)'
+            ),
+        },
+    },
+}
+
+
+def _qualified(name):
+    return '"content"."{0}"'.format(name)
+
+
+def _same_key(spec, left, right):
+    return ' AND '.join(
+        '{0}.{2} {3} {1}.{2}'.format(
+            left, right, column,
+            'IS NOT DISTINCT FROM' if column in spec['nullable'] else '=',
+        )
+        for column in spec['key']
+    )
+
+
+def _create_copy(cursor, name, spec):
+    """Empty compact table, kept in sync with the old one by a trigger."""
+    old = _qualified(name)
+    new = _qualified('{0}_compact'.format(name))
+    columns = ', '.join(spec['key'])
+    cursor.execute('CREATE TABLE {0} (id bigserial PRIMARY KEY, {1})'.format(
+        new, spec['columns'],
+    ))
+    cursor.execute(
+        'SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint '
+        "WHERE conrelid = %s::regclass AND contype = 'f'",
+        [old],
+    )
+    for constraint, definition in cursor.fetchall():
+        cursor.execute('ALTER TABLE {0} ADD CONSTRAINT "{1}" {2}'.format(
+            new, constraint, definition,
+        ))
+    # Index names are unique in the schema: renamed on the swap
+    for constraint, definition in spec['constraints'].items():
+        cursor.execute(
+            'ALTER TABLE {0} ADD CONSTRAINT "{1}_compact" {2}'.format(
+                new, constraint, definition,
+            ),
+        )
+    for index, definition in spec['indexes'].items():
+        cursor.execute('CREATE {0}'.format(definition.format(
+            '"{0}_compact" ON {1}'.format(index, new),
+        )))
+
+    # A deleted link stays if the old table repeats it (no unique key)
+    cursor.execute(
+        'CREATE FUNCTION {sync}() RETURNS trigger LANGUAGE plpgsql AS $$ '
+        'BEGIN '
+        "IF TG_OP <> 'INSERT' THEN "
+        'DELETE FROM {new} compact WHERE {compact_key} AND NOT EXISTS ('
+        'SELECT 1 FROM {old} link WHERE {link_key}); '
+        'END IF; '
+        "IF TG_OP <> 'DELETE' THEN "
+        'INSERT INTO {new} ({columns}) VALUES ({values}) '
+        'ON CONFLICT DO NOTHING; '
+        'END IF; '
+        'RETURN NULL; '
+        'END $$'.format(
+            sync=_qualified('{0}_compact_sync'.format(name)),
+            new=new,
+            old=old,
+            compact_key=_same_key(spec, 'compact', 'OLD'),
+            link_key=_same_key(spec, 'link', 'OLD'),
+            columns=columns,
+            values=', '.join(
+                'NEW.{0}'.format(column) for column in spec['key']
+            ),
+        ),
+    )
+    cursor.execute(
+        'CREATE TRIGGER compact_sync AFTER INSERT OR UPDATE OR DELETE '
+        'ON {0} FOR EACH ROW EXECUTE FUNCTION {1}()'.format(
+            old, _qualified('{0}_compact_sync'.format(name)),
+        ),
+    )
+
+
+def _backfill(connection, name, spec):
+    """Copy the old rows in heap order, a few megabytes per transaction."""
+    old = _qualified(name)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_relation_size(%s::regclass) / '
+            "current_setting('block_size')::int",
+            [old],
+        )
+        pages = cursor.fetchone()[0]
+    # Rows written later (and moved by updates) are copied by the trigger
+    for start in range(0, pages + 1, _BATCH_PAGES):
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                # Writers wait for the batch, so it never copies a row
+                # which a concurrent delete has just removed from the copy
+                cursor.execute('LOCK TABLE {0} IN SHARE MODE'.format(old))
+                cursor.execute(
+                    'INSERT INTO {0} ({1}) SELECT {1} FROM {2} '
+                    "WHERE ctid >= '({3},0)'::tid AND ctid < '({4},0)'::tid "
+                    'ORDER BY ctid ON CONFLICT DO NOTHING'.format(
+                        _qualified('{0}_compact'.format(name)),
+                        ', '.join(spec['key']),
+                        old,
+                        start,
+                        start + _BATCH_PAGES,
+                    ),
+                )
+
+
+def _swap(cursor, name, spec):
+    compact = '{0}_compact'.format(name)
+    cursor.execute("SET LOCAL lock_timeout = '10s'")
+    cursor.execute('LOCK TABLE {0} IN ACCESS EXCLUSIVE MODE'.format(
+        _qualified(name),
+    ))
+    cursor.execute('DROP TABLE {0}'.format(_qualified(name)))
+    cursor.execute('DROP FUNCTION {0}()'.format(
+        _qualified('{0}_sync'.format(compact)),
+    ))
+    cursor.execute('ALTER TABLE {0} RENAME TO "{1}"'.format(
+        _qualified(compact), name,
+    ))
+    cursor.execute('ALTER SEQUENCE {0} RENAME TO "{1}_id_seq"'.format(
+        _qualified('{0}_id_seq'.format(compact)), name,
+    ))
+    renames = {'{0}_pkey'.format(compact): '{0}_pkey'.format(name)}
+    renames.update(
+        ('{0}_compact'.format(constraint), constraint)
+        for constraint in spec['constraints']
+    )
+    for current, final in renames.items():
+        cursor.execute(
+            'ALTER TABLE {0} RENAME CONSTRAINT "{1}" TO "{2}"'.format(
+                _qualified(name), current, final,
+            ),
+        )
+    for index in spec['indexes']:
+        cursor.execute('ALTER INDEX {0} RENAME TO "{1}"'.format(
+            _qualified('{0}_compact'.format(index)), index,
+        ))
+
+
+def compact_links(apps, schema_editor):
+    connection = schema_editor.connection
+    for name, spec in _TABLES.items():
+        with transaction.atomic(using=connection.alias):
+            with connection.cursor() as cursor:
+                _create_copy(cursor, name, spec)
+        _backfill(connection, name, spec)
+        with connection.cursor() as cursor:
+            # Indexes filled out of key order are a third empty, rebuilt
+            # tight without blocking the writes
+            cursor.execute('REINDEX TABLE CONCURRENTLY {0}'.format(
+                _qualified('{0}_compact'.format(name)),
+            ))
+        for attempt in range(1, _SWAP_ATTEMPTS + 1):
+            try:
+                with transaction.atomic(using=connection.alias):
+                    with connection.cursor() as cursor:
+                        _swap(cursor, name, spec)
+            except OperationalError:
+                # Lock timeout: long transactions use the table
+                if attempt == _SWAP_ATTEMPTS:
+                    raise
+            else:
+                break
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE {0}'.format(_qualified(name)))
+
+
+class Migration(migrations.Migration):
+    # Link tables are rebuilt online: a copy is filled in short batches
+    # (writers wait for each one) and swapped in under a brief lock.
+    atomic = False
+
+    dependencies = [
+        ('movies', '0011_through_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(compact_links),
+            ],
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name='personfilmwork',
+                    name='person_film_work_film_role',
+                ),
+                migrations.RemoveField(
+                    model_name='genrefilmwork',
+                    name='created',
+                ),
+                migrations.RemoveField(
+                    model_name='personfilmwork',
+                    name='created',
+                ),
+                migrations.AlterField(
+                    model_name='genrefilmwork',
+                    name='id',
+                    field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+                ),
+                migrations.AlterField(
+                    model_name='personfilmwork',
+                    name='id',
+                    field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+                ),
+                migrations.AddConstraint(
+                    model_name='personfilmwork',
+                    constraint=models.UniqueConstraint(fields=('film_work', 'role', 'person'), name='unique_film_person_role'),
+                ),
+                migrations.AddConstraint(
+                    model_name='personfilmwork',
+                    constraint=models.UniqueConstraint(condition=models.Q(('role__isnull', True)), fields=('film_work', 'person'), name='unique_film_person_unknown_role'),
+                ),
+            ],
+        ),
+    ]
@@ -2,8 +2,14 @@
 
 import uuid
 
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 _PERSON_NAME_MAX_LEN = 200
@@ -51,6 +57,10 @@ class Person(UUIDMixin, TimeStampedMixin):
         db_table = 'content\".\"person'
         verbose_name = _('person')
         verbose_name_plural = _('persons')
+        indexes = [
+            # admin list order
+            models.Index(fields=['full_name'], name='person_full_name'),
+        ]
 
     def __str__(self) -> str:
         return self.full_name
@@ -85,13 +95,24 @@ class FilmWork(UUIDMixin, TimeStampedMixin):
         db_table = 'content"."film_work'
         verbose_name = _('film work')
         verbose_name_plural = _('film works')
+        indexes = [
+            # keyset pagination of API goes through this order
+            models.Index(
+                fields=['creation_date', 'id'],
+                name='film_work_creation_date_id'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.title + ' ({0})'.format(self.creation_date.year)
 
 
-class GenreFilmWork(UUIDMixin):
-    """Many To Many for "FilmWork" and "Genre"."""
+class GenreFilmWork(models.Model):
+    """Many To Many for "FilmWork" and "Genre".
+
+    Keyed by a compact sequential id, "unique_film_genre" is the natural
+    key. There are many more links than films, so rows are kept narrow.
+    """
 
     film_work = models.ForeignKey(
         'FilmWork', on_delete=models.CASCADE, verbose_name=_('film work'),
@@ -101,7 +122,6 @@ class GenreFilmWork(UUIDMixin):
         'Genre', on_delete=models.CASCADE, verbose_name=_('genre'),
         db_index=False
     )
-    created = models.DateTimeField(_('created'), auto_now_add=True)
 
     class Meta:
         db_table = 'content"."genre_film_work'
@@ -111,14 +131,12 @@ class GenreFilmWork(UUIDMixin):
             models.UniqueConstraint(fields=('film_work', 'genre'),
                                     name='unique_film_genre')
         ]
+        # "unique_film_genre" serves lookups by "film_work"
         indexes = [
+            # films of a genre by an index only scan
             models.Index(
-                fields=['film_work'],
-                name='genre_film_work_film_work_id'
-            ),
-            models.Index(
-                fields=['genre'],
-                name='genre_film_work_genre_id'
+                fields=['genre', 'film_work'],
+                name='genre_film_work_genre_film'
             ),
         ]
 
@@ -127,8 +145,12 @@ class GenreFilmWork(UUIDMixin):
         return ''
 
 
-class PersonFilmWork(UUIDMixin):
-    """Many To Many for "FilmWork" and "Person"."""
+class PersonFilmWork(models.Model):
+    """Many To Many for "FilmWork" and "Person".
+
+    Keyed by a compact sequential id, the natural key is (film work,
+    role, person); see "GenreFilmWork".
+    """
 
     class Role(models.TextChoices):
         ACTOR = 'actor', _('actor')
@@ -150,22 +172,147 @@ class PersonFilmWork(UUIDMixin):
         choices=Role.choices,
         null=True
     )
-    created = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         db_table = 'content"."person_film_work'
         verbose_name = _('film person')
         verbose_name_plural = _('film persons')
+        constraints = [
+            # also serves credits of films by role, see "movies.serializers"
+            models.UniqueConstraint(
+                fields=('film_work', 'role', 'person'),
+                name='unique_film_person_role',
+            ),
+            # NULL roles are distinct for the constraint above
+            models.UniqueConstraint(
+                fields=('film_work', 'person'),
+                condition=models.Q(role__isnull=True),
+                name='unique_film_person_unknown_role',
+            ),
+        ]
+        indexes = [
+            # films of a person by an index only scan
+            models.Index(
+                fields=['person', 'film_work'],
+                name='person_film_work_person_film'
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return ''
+
+
+class FilmWorkDocument(models.Model):
+    """Denormalized API read model of "FilmWork", one row per film.
+
+    Rows are maintained by "movies.read_model", never edit them by hand.
+    """
+
+    # Same value as "FilmWork.id"
+    id = models.UUIDField(primary_key=True, editable=False)
+    creation_date = models.DateField()
+    title = models.CharField(max_length=_FILM_NAME_MAX_LEN, default='')
+    rating = models.FloatField(null=True)
+    type = models.CharField(max_length=_FILM_TYPE_NAME_MAX_LEN, default='')
+    # Weighted title and description lexemes, see "movies.search"
+    search = SearchVectorField(null=True)
+    genres = ArrayField(models.CharField(max_length=100), default=list)
+    actors = ArrayField(
+        models.CharField(max_length=_PERSON_NAME_MAX_LEN), default=list,
+    )
+    directors = ArrayField(
+        models.CharField(max_length=_PERSON_NAME_MAX_LEN), default=list,
+    )
+    writers = ArrayField(
+        models.CharField(max_length=_PERSON_NAME_MAX_LEN), default=list,
+    )
+    # Ready API response of the film
+    document = models.JSONField(encoder=DjangoJSONEncoder)
+    # Last time the document content changed, HTTP validators base on it
+    modified = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'content"."film_work_document'
         indexes = [
             models.Index(
-                fields=['film_work'],
-                name='person_film_work_film_work_id'
+                fields=['creation_date', 'id'],
+                name='film_work_doc_creation_date_id'
+            ),
+            # incremental exports walk documents in this order
+            models.Index(
+                fields=['modified', 'id'],
+                name='film_work_doc_modified_id'
+            ),
+            # list search and filters, see "movies.search"
+            GinIndex(fields=['search'], name='film_work_doc_search'),
+            GinIndex(
+                fields=['title'],
+                opclasses=['gin_trgm_ops'],
+                name='film_work_doc_title_trgm'
+            ),
+            GinIndex(fields=['genres'], name='film_work_doc_genres'),
+            GinIndex(fields=['actors'], name='film_work_doc_actors'),
+            GinIndex(fields=['directors'], name='film_work_doc_directors'),
+            GinIndex(fields=['writers'], name='film_work_doc_writers'),
+            models.Index(
+                F('rating').desc(nulls_last=True),
+                F('id').desc(),
+                name='film_work_doc_rating_id'
             ),
             models.Index(
-                fields=['person'],
-                name='person_film_work_person_id'
+                fields=['title', 'id'],
+                name='film_work_doc_title_id'
             ),
         ]
 
+
+class FilmChange(models.Model):
+    """Change feed (outbox) record: a film or its relations changed.
+
+    Rows are written by "movies.outbox" in the transaction of the change.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    # Writing transaction, the feed order and visibility base on it
+    txid = models.BigIntegerField()
+    film_work_id = models.UUIDField()
+    # Model name of the changed object, e.g. "person" for a renamed actor
+    source = models.CharField(max_length=30)
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'content"."film_change'
+        indexes = [
+            models.Index(fields=['txid', 'id'], name='film_change_txid_id'),
+            # compaction keeps the latest record of a film
+            models.Index(
+                fields=['film_work_id'], name='film_change_film_work_id',
+            ),
+            models.Index(fields=['created'], name='film_change_created'),
+        ]
+
+
+class BulkJob(UUIDMixin, TimeStampedMixin):
+    """Admin bulk action over many objects, run chunk by chunk.
+
+    Operations live in "movies.bulk", the admin progress page runs the
+    next chunk on every request.
+    """
+
+    operation = models.CharField(_('operation'), max_length=50)
+    params = models.JSONField(_('parameters'), default=dict)
+    object_ids = ArrayField(models.UUIDField())
+    total = models.PositiveIntegerField(_('total'))
+    done = models.PositiveIntegerField(_('done'), default=0)
+
+    class Meta:
+        db_table = 'content"."bulk_job'
+        verbose_name = _('bulk job')
+        verbose_name_plural = _('bulk jobs')
+
     def __str__(self) -> str:
-        return ''
+        return '{0} {1}/{2}'.format(self.operation, self.done, self.total)
+
+    @property
+    def finished(self) -> bool:
+        return self.done >= self.total
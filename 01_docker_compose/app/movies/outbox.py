@@ -0,0 +1,137 @@
+"""Change feed of the catalogue for downstream indexers.
+
+Every catalogue change writes "FilmChange" rows for the affected films
+in its own transaction, so a committed change is always in the feed.
+
+Ids of "FilmChange" are allocated before commit, so the rows become
+visible out of id order. The feed is ordered by the writing transaction
+id instead and only shows rows of transactions older than the oldest
+running one: no row can appear behind a consumer's position later.
+The lag of the feed is the age of the oldest running transaction.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+import uuid
+from typing import Iterable, Optional
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from movies.models import FilmChange, FilmWork
+from movies.pagination import InvalidCursor
+
+CHANGES_PAGE_SIZE = 500
+
+Position = tuple[int, int]
+
+
+def record_changes(film_ids: Iterable[uuid.UUID], source: str) -> None:
+    """Add records of the films to the feed in the current transaction."""
+    film_ids = list(set(film_ids))
+    if not film_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO "{0}" (txid, film_work_id, source, created) '
+            'SELECT txid_current(), film_id, %s, now() '
+            'FROM unnest(%s::uuid[]) AS film_id'.format(
+                FilmChange._meta.db_table,
+            ),
+            [source, film_ids],
+        )
+
+
+def encode_position(position: Position) -> str:
+    raw = json.dumps(list(position))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_position(token: str) -> Position:
+    padded = token + '=' * (-len(token) % 4)
+    try:
+        txid, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return int(txid), int(pk)
+    except (binascii.Error, TypeError, ValueError) as exc:
+        raise InvalidCursor(token) from exc
+
+
+def _horizon() -> int:
+    """Transactions below it are finished, their rows are final."""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+        return cursor.fetchone()[0]
+
+
+def changes_page(
+    position: Optional[Position],
+    limit: int = CHANGES_PAGE_SIZE,
+) -> tuple[list[dict], Optional[Position], bool]:
+    """Changes after the position: (changes, new position, has more).
+
+    A film changed several times within the page is listed once, with
+    the time of its last change. "deleted" films are gone for good.
+    """
+    queryset = FilmChange.objects.filter(txid__lt=_horizon())
+    if position is not None:
+        txid, pk = position
+        queryset = queryset.filter(txid__gte=txid).filter(
+            Q(txid__gt=txid) | Q(id__gt=pk),
+        )
+    rows = list(queryset.order_by('txid', 'id').values(
+        'txid', 'id', 'film_work_id', 'created',
+    )[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], position, False
+
+    changed = {}
+    for row in rows:
+        # Moved to the end: the order is of the last changes
+        changed.pop(row['film_work_id'], None)
+        changed[row['film_work_id']] = row['created']
+    existing = set(FilmWork.objects.filter(
+        id__in=list(changed),
+    ).values_list('id', flat=True))
+    changes = [
+        {
+            'id': film_id,
+            'changed_at': changed_at,
+            'deleted': film_id not in existing,
+        }
+        for film_id, changed_at in changed.items()
+    ]
+    last = rows[-1]
+    return changes, (last['txid'], last['id']), has_more
+
+
+def compact(
+    max_age: Optional[datetime.timedelta] = None,
+) -> tuple[int, int]:
+    """Drop superseded and expired records: (superseded, expired) counts.
+
+    A consumer behind a superseded record still gets the later record of
+    the same film. Consumers lagging more than "max_age" have to resync
+    from the full export.
+    """
+    table = '"{0}"'.format(FilmChange._meta.db_table)
+    with connection.cursor() as cursor:
+        # Only by a visible record: a consumer must not skip the film
+        cursor.execute(
+            'DELETE FROM {0} old USING {0} new '
+            'WHERE new.film_work_id = old.film_work_id '
+            'AND (new.txid, new.id) > (old.txid, old.id) '
+            'AND new.txid < %s'.format(table),
+            [_horizon()],
+        )
+        superseded = cursor.rowcount
+    expired = 0
+    if max_age is not None:
+        expired, _ = FilmChange.objects.filter(
+            created__lt=timezone.now() - max_age,
+        ).delete()
+    return superseded, expired
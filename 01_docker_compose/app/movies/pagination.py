@@ -0,0 +1,234 @@
+"""Pagination helpers for film work querysets."""
+
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+import uuid
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import connection
+from django.db.models import Model, Q, QuerySet, Subquery
+from django.utils.functional import cached_property
+
+CURSOR_ORDERING = ('creation_date', 'id')
+
+
+class InvalidCursor(ValueError):
+    """Client sent a cursor token which can't be decoded."""
+
+
+def _pack(values: list) -> str:
+    raw = json.dumps(values)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _unpack(token: str) -> list:
+    padded = token + '=' * (-len(token) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError) as exc:
+        raise InvalidCursor(token) from exc
+    if not isinstance(values, list):
+        raise InvalidCursor(token)
+    return values
+
+
+def encode_cursor(creation_date: datetime.date, pk: uuid.UUID) -> str:
+    """Pack a keyset position into an opaque url-safe token."""
+    return _pack([creation_date.isoformat(), str(pk)])
+
+
+def decode_cursor(token: str) -> tuple[datetime.date, uuid.UUID]:
+    """Unpack a token created by "encode_cursor"."""
+    try:
+        creation_date, pk = _unpack(token)
+        return datetime.date.fromisoformat(creation_date), uuid.UUID(pk)
+    except (TypeError, ValueError) as exc:
+        raise InvalidCursor(token) from exc
+
+
+def encode_name_cursor(name: str, pk: uuid.UUID) -> str:
+    """Pack a (name, id) keyset position, see "PersonCursorPaginator"."""
+    return _pack([name, str(pk)])
+
+
+def decode_name_cursor(token: str) -> tuple[str, uuid.UUID]:
+    """Unpack a token created by "encode_name_cursor"."""
+    try:
+        name, pk = _unpack(token)
+        if not isinstance(name, str):
+            raise InvalidCursor(token)
+        return name, uuid.UUID(pk)
+    except (TypeError, ValueError) as exc:
+        raise InvalidCursor(token) from exc
+
+
+def estimate_count(model: type[Model]) -> Optional[int]:
+    """Planner estimation of table rows, without scanning the table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table.replace('"', '')],
+        )
+        row = cursor.fetchone()
+    # "-1" means the table has never been analyzed
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+def _count_key(queryset: QuerySet) -> Optional[str]:
+    try:
+        sql, params = queryset.order_by().query.sql_with_params()
+    except EmptyResultSet:
+        return None
+    digest = hashlib.md5(  # noqa: S303
+        repr((sql, params)).encode(),
+    ).hexdigest()
+    return 'count:{0}'.format(digest)
+
+
+class _EstimatedPage(Page):
+
+    def has_next(self) -> bool:
+        paginator = self.paginator
+        if paginator.count_exact or self.number < paginator.num_pages:
+            return super().has_next()
+        # The estimation may be short of the rows
+        top = self.number * paginator.per_page
+        return bool(paginator.object_list[top:top + 1].values_list('pk'))
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator which avoids COUNT(*) over big tables on every page.
+
+    Total of a whole big table is the planner estimation, so the last
+    pages may be off a little until the next ANALYZE: a page after the
+    estimated end is still served if it has rows. Totals of filtered
+    querysets are exact, but reused for API_COUNT_CACHE_TIMEOUT seconds.
+    """
+
+    # False when "count" is an estimation
+    count_exact = True
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset.model)
+            threshold = settings.API_COUNT_ESTIMATE_THRESHOLD
+            if estimate is not None and estimate >= threshold:
+                self.count_exact = False
+                return estimate
+            return queryset.count()
+        return self.exact_count()
+
+    def exact_count(self) -> int:
+        key = _count_key(self.object_list)
+        if key is None:
+            return 0
+        return cache.get_or_set(
+            key, self.object_list.count, settings.API_COUNT_CACHE_TIMEOUT,
+        )
+
+    def validate_number(self, number) -> int:
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # Past the estimated end: "page" looks for the rows
+            if self.count_exact or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number) -> Page:
+        number = self.validate_number(number)
+        if number <= self.num_pages:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        object_list = self.object_list[bottom:bottom + self.per_page]
+        if not object_list.values_list('pk')[:1]:
+            raise EmptyPage('That page contains no results')
+        return self._get_page(object_list, number, self)
+
+    def last_page(self) -> Page:
+        """Last page by the exact total, its rows are read backwards.
+
+        Reversed order and LIMIT find them without an OFFSET scan of
+        everything before.
+        """
+        count = self.exact_count()
+        # Cached properties, computed anew from the exact total
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+        self.count_exact = True
+        number = self.num_pages
+        size = count - (number - 1) * self.per_page
+        queryset = self.object_list
+        object_list = queryset.filter(pk__in=Subquery(
+            queryset.reverse().values('pk')[:size],
+        ))
+        return self._get_page(object_list, number, self)
+
+    def _get_page(self, *args, **kwargs) -> Page:
+        return _EstimatedPage(*args, **kwargs)
+
+
+class CursorPaginator:
+    """Keyset paginator over a stable (creation_date, id) order.
+
+    Unlike "django.core.paginator.Paginator" it never runs COUNT(*) and
+    never uses OFFSET, so a deep page costs the same as the first one.
+    """
+
+    ordering = CURSOR_ORDERING
+
+    def __init__(self, queryset: QuerySet, per_page: int):
+        self.queryset = queryset.order_by(*self.ordering)
+        self.per_page = per_page
+
+    def page(self, token: Optional[str]) -> QuerySet:
+        """Return the page that starts right after "token" position."""
+        queryset = self.queryset
+        if token:
+            queryset = self.after(queryset, token)
+        # One extra row tells if there is a next page
+        return queryset[:self.per_page + 1]
+
+    def after(self, queryset: QuerySet, token: str) -> QuerySet:
+        creation_date, pk = decode_cursor(token)
+        # The plain range condition lets Postgres use the index bound,
+        # the OR part drops rows of the same date seen before.
+        return queryset.filter(
+            creation_date__gte=creation_date,
+        ).filter(Q(creation_date__gt=creation_date) | Q(id__gt=pk))
+
+    def encode(self, row: dict) -> str:
+        return encode_cursor(row['creation_date'], row['id'])
+
+    def split(self, rows: list) -> tuple[list, Optional[str]]:
+        """Cut off the look-ahead row and build the next page token."""
+        if len(rows) <= self.per_page:
+            return rows, None
+        rows = rows[:self.per_page]
+        return rows, self.encode(rows[-1])
+
+
+class PersonCursorPaginator(CursorPaginator):
+    """Keyset paginator over a stable (full_name, id) order of persons."""
+
+    ordering = ('full_name', 'id')
+
+    def after(self, queryset: QuerySet, token: str) -> QuerySet:
+        full_name, pk = decode_name_cursor(token)
+        return queryset.filter(
+            full_name__gte=full_name,
+        ).filter(Q(full_name__gt=full_name) | Q(id__gt=pk))
+
+    def encode(self, row: dict) -> str:
+        return encode_name_cursor(row['full_name'], row['id'])
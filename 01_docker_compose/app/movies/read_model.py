@@ -0,0 +1,169 @@
+"""Maintenance of "FilmWorkDocument" read model.
+
+Catalogue changes only schedule film ids; documents are recomputed once
+per transaction, right after it commits.
+"""
+
+import json
+import threading
+import uuid
+from typing import Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.dispatch import Signal
+
+from movies.admission import unbudgeted
+from movies.models import FilmWork, FilmWorkDocument
+from movies.search import SEARCH_VECTOR_SQL
+from movies.serializers import ROLE_KEYS, serialize_films
+
+REFRESH_CHUNK_SIZE = 1000
+
+_DOCUMENT_COLUMNS = (
+    'id', 'creation_date', 'title', 'rating', 'type',
+    'genres', 'actors', 'directors', 'writers',
+)
+
+# Keys of the film refresh advisory locks are hashes of ids with it
+_LOCK_SEED = 3
+_pending = threading.local()
+
+# Sent after documents commit with "film_ids", "reordered" and "previous"
+# arguments: "reordered" is True if films were added, removed or changed
+# list order, "previous" has creation dates of the documents before.
+documents_refreshed = Signal()
+
+
+def _chunks(film_ids: Iterable[uuid.UUID], size: int) -> Iterator[list]:
+    chunk = []
+    for film_id in film_ids:
+        chunk.append(film_id)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _upsert_sql() -> str:
+    columns = _DOCUMENT_COLUMNS + ('search', 'document', 'modified')
+    updates = ', '.join(
+        '{0} = EXCLUDED.{0}'.format(column) for column in columns[1:]
+    )
+    # Untouched documents keep their "modified", so HTTP validators too
+    return (
+        'INSERT INTO "{table}" AS doc ({columns}) '
+        'VALUES ({values}, {search}, %s::jsonb, now()) '
+        'ON CONFLICT (id) DO UPDATE SET {updates} '
+        'WHERE doc.document IS DISTINCT FROM EXCLUDED.document'
+    ).format(
+        table=FilmWorkDocument._meta.db_table,
+        columns=', '.join(columns),
+        values=', '.join(['%s'] * len(_DOCUMENT_COLUMNS)),
+        search=SEARCH_VECTOR_SQL,
+        updates=updates,
+    )
+
+
+def _document_row(film: dict) -> tuple:
+    return (
+        film['id'],
+        film['creation_date'],
+        film['title'],
+        film['rating'],
+        film['type'],
+        film['genres'],
+        *(film[key] for key in ROLE_KEYS.values()),
+        film['title'],
+        film['description'] or '',
+        json.dumps(film, cls=DjangoJSONEncoder),
+    )
+
+
+def _lock_films(film_ids: list) -> None:
+    """Serialize refreshes of the films till the transaction ends.
+
+    Ids come sorted, so two refreshes take the common locks in one order.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_advisory_xact_lock(hashtextextended(id::text, %s)) '
+            'FROM unnest(%s::uuid[]) AS id',
+            [_LOCK_SEED, [str(film_id) for film_id in film_ids]],
+        )
+
+
+def refresh_documents(film_ids: Iterable[uuid.UUID]) -> None:
+    """Recompute documents of the films, drop documents of deleted ones."""
+    for chunk in _chunks(sorted(set(film_ids)), REFRESH_CHUNK_SIZE):
+        with transaction.atomic():
+            _lock_films(chunk)
+            # Read after the lock: a concurrent refresh of the same film
+            # has committed, and its read can't be newer than this one
+            films = serialize_films(FilmWork.objects.filter(id__in=chunk))
+            previous = dict(FilmWorkDocument.objects.filter(
+                id__in=chunk,
+            ).values_list('id', 'creation_date'))
+            if films:
+                with connection.cursor() as cursor:
+                    cursor.executemany(
+                        _upsert_sql(), [_document_row(film) for film in films],
+                    )
+            found = {film['id'] for film in films}
+            missing = [film_id for film_id in chunk if film_id not in found]
+            if missing:
+                FilmWorkDocument.objects.filter(id__in=missing).delete()
+        # Added or removed documents shift the list, as new dates do
+        reordered = set(previous) != found or any(
+            previous.get(film['id']) != film['creation_date']
+            for film in films
+        )
+        documents_refreshed.send(
+            sender=FilmWorkDocument,
+            film_ids=chunk,
+            reordered=reordered,
+            previous=previous,
+        )
+
+
+def schedule_refresh(film_ids: Iterable[uuid.UUID]) -> None:
+    """Refresh documents of the films when the current transaction commits.
+
+    Ids are gathered in a per-thread set, so a transaction which touches
+    the same film many times (admin inlines) refreshes it once.
+    """
+    pending = getattr(_pending, 'film_ids', None)
+    if pending is None:
+        pending = _pending.film_ids = set()
+    pending.update(film_ids)
+    # Leftovers of a rolled back transaction are refreshed with the next
+    # one, it's harmless as a refresh always reads the current state.
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending() -> None:
+    pending = getattr(_pending, 'film_ids', None)
+    if not pending:
+        return
+    film_ids = set(pending)
+    # The change is committed: its fan-out must not be cut by the budget
+    # of the request, and ids stay pending until they are refreshed
+    with unbudgeted():
+        refresh_documents(film_ids)
+    pending.difference_update(film_ids)
+
+
+def rebuild_documents(chunk_size: int = REFRESH_CHUNK_SIZE) -> Iterator[int]:
+    """Recompute all the documents, yield count of processed films."""
+    film_ids = FilmWork.objects.order_by(
+        'creation_date', 'id',
+    ).values_list('id', flat=True).iterator(chunk_size=chunk_size)
+    processed = 0
+    for chunk in _chunks(film_ids, chunk_size):
+        refresh_documents(chunk)
+        processed += len(chunk)
+        yield processed
+    FilmWorkDocument.objects.exclude(
+        id__in=FilmWork.objects.values('id'),
+    ).delete()
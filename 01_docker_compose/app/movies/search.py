@@ -0,0 +1,128 @@
+"""Search, filters and sorting of the films list.
+
+Everything runs over "FilmWorkDocument" indexes: GIN over the weighted
+"search" vector for words, trigram GIN over titles for partial words and
+typos, GIN over names arrays for genre and person filters.
+"""
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db.models import F, Q, QuerySet
+from django.http import QueryDict
+
+from movies.models import FilmWork
+from movies.pagination import CURSOR_ORDERING
+
+SEARCH_CONFIG = 'english'
+
+# Title lexemes outweigh description ones in ranking
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('{0}', %s), 'A') || "
+    "setweight(to_tsvector('{0}', %s), 'B')"
+).format(SEARCH_CONFIG)
+
+# Query parameters which narrow or reorder the list
+FILTER_PARAMS = (
+    'query', 'genre', 'person', 'type', 'rating_min', 'rating_max', 'sort',
+)
+
+# Unique orders: "id" breaks ties, so pages never overlap
+SORTS = {
+    'creation_date': ('creation_date', 'id'),
+    '-creation_date': ('-creation_date', '-id'),
+    'rating': (F('rating').asc(nulls_last=True), 'id'),
+    '-rating': (F('rating').desc(nulls_last=True), '-id'),
+    'title': ('title', 'id'),
+    '-title': ('-title', '-id'),
+}
+
+_FILM_TYPES = frozenset(
+    choice for choice, _ in FilmWork._FilmType.choices if choice
+)
+
+
+class InvalidFilter(ValueError):
+    """Malformed value of a list filter."""
+
+
+def _query(params: QueryDict) -> str:
+    return params.get('query', '').strip()
+
+
+def _rating(params: QueryDict, name: str):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise InvalidFilter('{0} must be a number'.format(name))
+
+
+def match(queryset: QuerySet, query: str) -> QuerySet:
+    """Documents with all the query words or a title similar to it."""
+    words = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.filter(
+        Q(search=words) | Q(title__trigram_word_similar=query),
+    )
+
+
+def filter_documents(queryset: QuerySet, params: QueryDict) -> QuerySet:
+    """Apply filters of the request query parameters."""
+    query = _query(params)
+    if query:
+        queryset = match(queryset, query)
+
+    genres = params.getlist('genre')
+    if genres:
+        queryset = queryset.filter(genres__contains=genres)
+    for person in params.getlist('person'):
+        queryset = queryset.filter(
+            Q(actors__contains=[person]) |
+            Q(directors__contains=[person]) |
+            Q(writers__contains=[person]),
+        )
+
+    film_type = params.get('type')
+    if film_type:
+        if film_type not in _FILM_TYPES:
+            raise InvalidFilter('type must be one of: {0}'.format(
+                ', '.join(sorted(_FILM_TYPES)),
+            ))
+        queryset = queryset.filter(type=film_type)
+
+    rating_min = _rating(params, 'rating_min')
+    if rating_min is not None:
+        queryset = queryset.filter(rating__gte=rating_min)
+    rating_max = _rating(params, 'rating_max')
+    if rating_max is not None:
+        queryset = queryset.filter(rating__lte=rating_max)
+    return queryset
+
+
+def ordering(params: QueryDict) -> tuple:
+    """Order of the request: explicit sort, relevance or creation date."""
+    sort = params.get('sort')
+    if sort:
+        if sort not in SORTS:
+            raise InvalidFilter('sort must be one of: {0}'.format(
+                ', '.join(SORTS),
+            ))
+        return SORTS[sort]
+
+    query = _query(params)
+    if not query:
+        return CURSOR_ORDERING
+    words = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    relevance = (
+        SearchRank(F('search'), words) +
+        TrigramWordSimilarity(query, 'title')
+    )
+    return (relevance.desc(), *CURSOR_ORDERING)
+
+
+def is_filtered(params: QueryDict) -> bool:
+    return any(params.get(name) for name in FILTER_PARAMS)
@@ -0,0 +1,67 @@
+"""Film work to API document conversion.
+
+Films are fetched first, then every relation is loaded by a single bulk
+query keyed by "film_work_id" and stitched in Python. It avoids joining
+genres and persons to the same film rows, which multiplies rows on the
+database side.
+"""
+
+import uuid
+from collections import defaultdict
+from typing import Iterable
+
+from django.db.models import QuerySet
+
+from movies.models import GenreFilmWork, PersonFilmWork
+
+PersonRole = PersonFilmWork.Role
+
+FILM_FIELDS = ('id', 'title', 'description', 'creation_date', 'rating', 'type')
+
+# API document key for each person role
+ROLE_KEYS = {
+    PersonRole.ACTOR: 'actors',
+    PersonRole.DIRECTOR: 'directors',
+    PersonRole.WRITER: 'writers',
+}
+
+
+def genres_queryset(film_ids: Iterable[uuid.UUID]) -> QuerySet:
+    """(film_work_id, genre name) pairs of all the films."""
+    return GenreFilmWork.objects.filter(
+        film_work_id__in=film_ids,
+    ).values_list('film_work_id', 'genre__name')
+
+
+def persons_queryset(film_ids: Iterable[uuid.UUID]) -> QuerySet:
+    """(film_work_id, role, full name) of all the films credits."""
+    return PersonFilmWork.objects.filter(
+        film_work_id__in=film_ids,
+        role__in=list(ROLE_KEYS),
+    ).values_list('film_work_id', 'role', 'person__full_name')
+
+
+def serialize_films(fw_queryset: QuerySet) -> list[dict]:
+    """Convert films queryset (may be sliced) to the list of API documents.
+
+    Runs 3 queries independently of films count.
+    """
+    films = list(fw_queryset.values(*FILM_FIELDS))
+    if not films:
+        return films
+
+    film_ids = [film['id'] for film in films]
+    genres = defaultdict(set)
+    for film_id, name in genres_queryset(film_ids):
+        genres[film_id].add(name)
+    persons = defaultdict(set)
+    for film_id, role, full_name in persons_queryset(film_ids):
+        persons[(film_id, role)].add(full_name)
+
+    for film in films:
+        film_id = film['id']
+        # Sorted unique names, the same as "ArrayAgg(distinct=True)" gave
+        film['genres'] = sorted(genres[film_id])
+        for role, key in ROLE_KEYS.items():
+            film[key] = sorted(persons[(film_id, role)])
+    return films
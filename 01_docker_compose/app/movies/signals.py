@@ -0,0 +1,111 @@
+"""Catalogue change handlers.
+
+Every change is resolved to the ids of affected films. Bulk
+"QuerySet.update()" and raw SQL bypass signals: run
+"manage.py rebuild_documents" after them ("movies.bulk" operations
+schedule their refreshes themselves). Every change is also recorded in
+the change feed, in the transaction of the change. Saved and deleted
+films and persons update the typeahead index of the process as well.
+"""
+
+import logging
+
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from movies import cache as api_cache
+from movies import models as mov_model
+from movies import suggest
+from movies.outbox import record_changes
+from movies.read_model import documents_refreshed, schedule_refresh
+from movies.snapshots import publish_films
+
+logger = logging.getLogger(__name__)
+
+
+def _film_ids_of(through: type, **filters) -> list:
+    film_ids = through.objects.filter(**filters).values_list(
+        'film_work_id', flat=True,
+    )
+    return list(film_ids)
+
+
+def _films_changed(sender: type, film_ids) -> None:
+    film_ids = list(film_ids)
+    record_changes(film_ids, sender._meta.model_name)
+    schedule_refresh(film_ids)
+
+
+@receiver(post_save, sender=mov_model.FilmWork)
+@receiver(post_delete, sender=mov_model.FilmWork)
+def film_work_changed(sender, instance, **kwargs):
+    _films_changed(sender, [instance.pk])
+
+
+@receiver(post_save, sender=mov_model.Genre)
+def genre_changed(sender, instance, created, **kwargs):
+    # Deletion is seen through the cascade of "GenreFilmWork" rows
+    if not created:
+        film_ids = _film_ids_of(mov_model.GenreFilmWork, genre_id=instance.pk)
+        _films_changed(sender, film_ids)
+
+
+@receiver(post_save, sender=mov_model.Person)
+def person_changed(sender, instance, created, **kwargs):
+    if not created:
+        film_ids = _film_ids_of(
+            mov_model.PersonFilmWork, person_id=instance.pk,
+        )
+        _films_changed(sender, film_ids)
+
+
+@receiver(post_save, sender=mov_model.GenreFilmWork)
+@receiver(post_delete, sender=mov_model.GenreFilmWork)
+@receiver(post_save, sender=mov_model.PersonFilmWork)
+@receiver(post_delete, sender=mov_model.PersonFilmWork)
+def film_link_changed(sender, instance, **kwargs):
+    _films_changed(sender, [instance.film_work_id])
+
+
+@receiver(m2m_changed, sender=mov_model.GenreFilmWork)
+@receiver(m2m_changed, sender=mov_model.PersonFilmWork)
+def film_links_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """"FilmWork.genres/person" add(), remove() and clear() calls."""
+    if not reverse:
+        if action.startswith('post_'):
+            _films_changed(sender, [instance.pk])
+        return
+    related = 'genre_id' if sender is mov_model.GenreFilmWork else 'person_id'
+    if action in {'post_add', 'post_remove'}:
+        _films_changed(sender, pk_set)
+    elif action == 'pre_clear':
+        # Links are gone after clear(), so collect films beforehand
+        _films_changed(
+            sender, _film_ids_of(sender, **{related: instance.pk}),
+        )
+
+
+@receiver(post_save, sender=mov_model.FilmWork)
+@receiver(post_save, sender=mov_model.Person)
+def suggestion_saved(sender, instance, **kwargs):
+    suggest.apply_saved(instance)
+
+
+@receiver(post_delete, sender=mov_model.FilmWork)
+@receiver(post_delete, sender=mov_model.Person)
+def suggestion_deleted(sender, instance, **kwargs):
+    suggest.apply_deleted(sender, [instance.pk])
+
+
+@receiver(documents_refreshed)
+def documents_changed(sender, film_ids, reordered, previous, **kwargs):
+    api_cache.invalidate_films(film_ids, reordered)
+    if settings.API_SNAPSHOT_ON_CHANGE:
+        # Documents are committed already, the change must not fail now
+        try:
+            publish_films(film_ids, reordered, previous)
+        except OSError:
+            logger.exception('Snapshots of %d films not published', len(
+                film_ids,
+            ))
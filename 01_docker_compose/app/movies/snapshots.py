@@ -0,0 +1,344 @@
+"""Static snapshots of API responses, served by nginx without Django.
+
+Details of all the films and the pages of the unfiltered list (default
+order) are files under "API_SNAPSHOT_ROOT": the URL path plus ".json",
+with precompressed ".json.gz" and ".json.br" variants (brotli if it is
+installed). Each file is written to a temporary one and renamed, so a
+partial file is never served. Detail files are dated by the document
+"modified", as "Last-Modified" of the API, list pages by the time their
+documents were read: an older read never replaces a later one. Pages
+show the totals "MoviesListApi" shows, estimated for a big catalogue.
+
+"publish_snapshots" command publishes everything. With
+"API_SNAPSHOT_ON_CHANGE" refreshed documents are republished right
+away, with the list pages which show them. When the list order changes
+(films added, removed or dated anew) the pages after the first changed
+position shift: "API_SNAPSHOT_REORDER_PAGES" of them are republished,
+the later ones are removed and nginx falls back to Django for them
+until the next publish.
+"""
+
+import contextlib
+import gzip
+import json
+import os
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from movies.api.v1.views import MOVIES_PER_PAGE
+from movies.encoding import document_json, with_results
+from movies.models import FilmWorkDocument
+from movies.pagination import CURSOR_ORDERING, EstimatedCountPaginator
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MOVIES_DIR = Path('api', 'v1', 'movies')
+PUBLISH_CHUNK_SIZE = 2000
+
+_PAGE_PREFIX = 'page-'
+_SUFFIX = '.json'
+_FILE_MODE = 0o644
+# Ranking the whole list is cheaper than counting for this many films
+_RANK_ALL_FROM = 20
+# Advisory lock class of list page writes (the page number is the key)
+_PAGE_LOCK_CLASS = 4
+
+
+def snapshot_root() -> Optional[Path]:
+    """Directory of the snapshots, None if they are disabled."""
+    if not settings.API_SNAPSHOT_ROOT:
+        return None
+    return Path(settings.API_SNAPSHOT_ROOT)
+
+
+def detail_path(film_id: uuid.UUID) -> Path:
+    return MOVIES_DIR / '{0}{1}'.format(film_id, _SUFFIX)
+
+
+def page_path(number: int) -> Path:
+    return MOVIES_DIR / '{0}{1}{2}'.format(_PAGE_PREFIX, number, _SUFFIX)
+
+
+def _variants(content: bytes) -> Iterator[tuple[str, bytes]]:
+    yield '', content
+    yield '.gz', gzip.compress(content, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', brotli.compress(
+            content, quality=settings.API_SNAPSHOT_BROTLI_QUALITY,
+        )
+
+
+def _replace(path: Path, content: bytes, mtime: float) -> None:
+    descriptor, temporary = tempfile.mkstemp(
+        dir=path.parent, prefix='.', suffix='.tmp',
+    )
+    try:
+        with os.fdopen(descriptor, 'wb') as temporary_file:
+            temporary_file.write(content)
+        # "mkstemp" file is private, nginx workers have to read it
+        os.chmod(temporary, _FILE_MODE)
+        os.utime(temporary, (mtime, mtime))
+        os.replace(temporary, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(temporary)
+        raise
+
+
+def write(
+    root: Path,
+    relative: Path,
+    content: bytes,
+    mtime: Optional[float] = None,
+) -> bool:
+    """Publish the file with its variants, False if it's unchanged.
+
+    The plain file is replaced last: nginx looks it up first, and then
+    takes the precompressed variant the client accepts.
+    """
+    path = root / relative
+    with contextlib.suppress(FileNotFoundError):
+        # Another worker has published a later version meanwhile
+        if mtime is not None and path.stat().st_mtime > mtime:
+            return False
+        if path.read_bytes() == content:
+            return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if mtime is None:
+        mtime = time.time()
+    for suffix, variant in reversed(list(_variants(content))):
+        _replace(path.with_name(path.name + suffix), variant, mtime)
+    return True
+
+
+def remove(root: Path, relative: Path) -> None:
+    """Unpublish the file, nginx passes its requests to Django then."""
+    path = root / relative
+    for suffix in ('', '.gz', '.br'):
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path.with_name(path.name + suffix))
+
+
+def list_totals() -> tuple[int, bool, int]:
+    """Count, whether it's exact and pages, as "MoviesListApi" has them."""
+    paginator = EstimatedCountPaginator(
+        FilmWorkDocument.objects.order_by(*CURSOR_ORDERING), MOVIES_PER_PAGE,
+    )
+    return paginator.count, paginator.count_exact, paginator.num_pages
+
+
+def _page_context(number: int, totals: tuple, has_more: bool) -> dict:
+    # The same keys and values as "MoviesListApi" pages
+    count, count_exact, total_pages = totals
+    has_next = number < total_pages or (not count_exact and has_more)
+    return {
+        'count': count,
+        'count_exact': count_exact,
+        'total_pages': total_pages,
+        'prev': number - 1 if number > 1 else None,
+        'next': number + 1 if has_next else None,
+    }
+
+
+def _write_page(
+    root: Path,
+    number: int,
+    totals: tuple,
+    bodies: list,
+    has_more: bool,
+    read_at: float,
+) -> bool:
+    content = with_results(
+        _page_context(number, totals, has_more),
+        (body.encode() for body in bodies),
+    )
+    # Another process may write the page at the same time
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_advisory_xact_lock(%s, %s)',
+                [_PAGE_LOCK_CLASS, number],
+            )
+        return write(root, page_path(number), content, read_at)
+
+
+def _documents():
+    return FilmWorkDocument.objects.order_by(*CURSOR_ORDERING).annotate(
+        body=document_json(),
+    )
+
+
+def _published(root: Path) -> Iterator[Path]:
+    directory = root / MOVIES_DIR
+    if directory.is_dir():
+        for path in directory.iterdir():
+            if path.name.endswith(_SUFFIX):
+                yield path
+
+
+def publish_all(root: Path) -> Iterator[tuple[int, int]]:
+    """Publish every detail and list page, yield (films, files written).
+
+    Documents are read once, in list order, and unchanged files are
+    skipped. Snapshots of films and pages which are gone are removed.
+    """
+    read_at = time.time()
+    totals = list_totals()
+    published = set()
+    films = written = 0
+    number = 0
+    page = []
+    rows = _documents().values_list('id', 'modified', 'body').iterator(
+        chunk_size=PUBLISH_CHUNK_SIZE,
+    )
+    for film_id, modified, body in rows:
+        if len(page) == MOVIES_PER_PAGE:
+            number += 1
+            written += _write_page(root, number, totals, page, True, read_at)
+            page = []
+        relative = detail_path(film_id)
+        published.add(relative.name)
+        written += write(root, relative, body.encode(), modified.timestamp())
+        page.append(body)
+        films += 1
+        if films % PUBLISH_CHUNK_SIZE == 0:
+            yield films, written
+    number += 1
+    written += _write_page(root, number, totals, page, False, read_at)
+    published.update(page_path(index).name for index in range(1, number + 1))
+
+    for path in _published(root):
+        if path.name not in published:
+            remove(root, path.relative_to(root))
+    yield films, written
+
+
+def _position(creation_date, film_id) -> int:
+    """Films before the (creation_date, id) list position, as they are."""
+    sql = 'SELECT count(*) FROM "{0}" WHERE ({1}) < (%s, %s)'.format(
+        FilmWorkDocument._meta.db_table, ', '.join(CURSOR_ORDERING),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [creation_date, film_id])
+        return cursor.fetchone()[0]
+
+
+def _page_numbers(film_ids: list) -> set[int]:
+    """List pages which show the films now."""
+    table = FilmWorkDocument._meta.db_table
+    columns = ', '.join(CURSOR_ORDERING)
+    if len(film_ids) < _RANK_ALL_FROM:
+        # Films before one are counted by an index-only scan
+        sql = (
+            'SELECT (SELECT count(*) FROM "{0}" WHERE ({1}) < ({2})) '
+            '/ %s + 1 FROM "{0}" AS film WHERE id = ANY(%s::uuid[])'
+        ).format(table, columns, ', '.join(
+            'film.{0}'.format(column) for column in CURSOR_ORDERING
+        ))
+    else:
+        sql = (
+            'SELECT (position - 1) / %s + 1 FROM ('
+            'SELECT id, row_number() OVER (ORDER BY {1}) AS position '
+            'FROM "{0}") AS ranked WHERE id = ANY(%s::uuid[])'
+        ).format(table, columns)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql, [MOVIES_PER_PAGE, [str(film_id) for film_id in film_ids]],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def _publish_pages(root: Path, first: int, last: int) -> int:
+    """Republish list pages from "first" to "last", return the last one.
+
+    Pages are read by one query, with a look-ahead row for "next".
+    """
+    read_at = time.time()
+    totals = list_totals()
+    start = (first - 1) * MOVIES_PER_PAGE
+    bodies = list(_documents().values_list('body', flat=True)[
+        start:last * MOVIES_PER_PAGE + 1
+    ])
+    number = first
+    while True:
+        offset = (number - first) * MOVIES_PER_PAGE
+        page = bodies[offset:offset + MOVIES_PER_PAGE]
+        if not page and number > 1:
+            return number - 1
+        has_more = len(bodies) > offset + MOVIES_PER_PAGE
+        _write_page(root, number, totals, page, has_more, read_at)
+        if not has_more or number == last:
+            return number
+        number += 1
+
+
+def _published_totals(root: Path) -> Optional[tuple]:
+    with contextlib.suppress(FileNotFoundError, ValueError):
+        context = json.loads((root / page_path(1)).read_bytes())
+        return context['count'], context['count_exact'], context[
+            'total_pages'
+        ]
+    return None
+
+
+def _republish_reordered(root: Path, keys: list) -> None:
+    """Republish the pages shifted by a list order change.
+
+    Pages before the first changed position only change with the totals.
+    """
+    first = _position(*min(keys)) // MOVIES_PER_PAGE + 1 if keys else 1
+    if _published_totals(root) != list_totals():
+        first = 1
+    last = _publish_pages(
+        root, first, first + settings.API_SNAPSHOT_REORDER_PAGES - 1,
+    )
+    for path in _published(root):
+        name = path.name
+        if name.startswith(_PAGE_PREFIX) and int(
+            name[len(_PAGE_PREFIX):-len(_SUFFIX)],
+        ) > last:
+            remove(root, path.relative_to(root))
+
+
+def publish_films(
+    film_ids: Iterable[uuid.UUID],
+    reordered: bool,
+    previous: Optional[dict] = None,
+) -> None:
+    """Republish details of the films and the list pages showing them.
+
+    "previous" has creation dates of the films before the change.
+    """
+    root = snapshot_root()
+    if root is None:
+        return
+    film_ids = list(film_ids)
+    rows = _documents().filter(id__in=film_ids).values_list(
+        'id', 'modified', 'creation_date', 'body',
+    )
+    found = {}
+    for film_id, modified, creation_date, body in rows:
+        found[film_id] = creation_date
+        write(root, detail_path(film_id), body.encode(), modified.timestamp())
+    for film_id in film_ids:
+        if film_id not in found:
+            remove(root, detail_path(film_id))
+
+    if reordered:
+        # Old and new positions of the films, the list shifts after both
+        keys = [*(previous or {}).items(), *found.items()]
+        _republish_reordered(root, [
+            (creation_date, film_id) for film_id, creation_date in keys
+        ])
+        return
+    for number in sorted(_page_numbers(list(found))):
+        _publish_pages(root, number, number)
@@ -0,0 +1,406 @@
+"""In-memory typeahead over film titles and person names.
+
+Every process keeps a "PrefixIndex" per kind, loaded on the first
+lookup and rebuilt when older than "SUGGEST_MAX_AGE" seconds. Saves and
+deletes of the process itself are applied right away, after commit
+(see "movies.signals"); other processes see them on the next rebuild.
+
+A name is found by a prefix of any of its words, and of the words which
+follow: "han" and "tom han" both find "Tom Hanks". Keys are normalized
+(case folded, accents dropped, punctuation is a space) and kept as
+UTF-8 in one buffer, so an index is a few flat arrays and no objects per
+name. Memory budget is 80 MB per million names (ids, keys, labels and
+4 bytes a word; "bench_suggest" command measures it), a load takes
+20-30 seconds per million. Matches are ranked by popularity: film
+rating, person credits.
+"""
+
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from array import array
+from bisect import bisect_right
+from functools import partial
+from typing import Callable, Iterable, Optional
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count
+
+from movies.models import FilmWork, Person
+
+SUGGEST_MAX_LIMIT = 50
+
+_NON_WORD = re.compile(r'[\W_]+')
+_SEPARATOR = 0
+# Above any byte of an UTF-8 key: "prefix + _BEYOND" ends the prefix range
+_BEYOND = b'\xff'
+_ID_SIZE = 16
+# Rankings of prefixes with more words are cached
+_SCAN_LIMIT = 256
+_CACHED_PREFIXES = 10000
+# Rebuild without the dropped names once they are this share of all
+_GARBAGE_SHARE = 0.25
+
+
+def normalize(text: str) -> str:
+    """Lowercase words of letters and digits, without accents."""
+    text = text.casefold()
+    if not text.isascii():
+        text = ''.join(
+            char for char in unicodedata.normalize('NFKD', text)
+            if not unicodedata.combining(char)
+        )
+    return ' '.join(_NON_WORD.sub(' ', text).split())
+
+
+class PrefixIndex:
+    """Sorted word keys of names, ranked by the name score.
+
+    Name i has its id at "ids[16 * i]", normalized key and display label
+    in the "keys" and "labels" buffers from "key_starts[i]" and
+    "label_starts[i]". "entries" are the buffer offsets of words, sorted
+    by the key bytes from the word to the end of the name, "ranked" are
+    the names by descending score.
+
+    A prefix of few words ranks the names of its entries. For a common
+    one it is cheaper to check names in score order until enough match
+    (about sqrt(limit * names) checks when matches are spread evenly, at
+    most as many as the entries), and the ranking is cached.
+    """
+
+    def __init__(self, rows: Iterable[tuple[uuid.UUID, str, float]] = ()):
+        self._lock = threading.Lock()
+        self._load(rows)
+
+    def _load(self, rows: Iterable[tuple[uuid.UUID, str, float]]) -> None:
+        self._ids = bytearray()
+        self._keys = bytearray()
+        self._key_starts = array('I')
+        self._labels = bytearray()
+        self._label_starts = array('I')
+        self._scores = array('f')
+        self._dropped = set()
+        # Ranked names of common prefixes
+        self._top = {}
+        offsets = []
+        for item_id, label, score in rows:
+            offsets.extend(self._append(item_id, label, score))
+        offsets.sort(key=self._key_at)
+        self._entries = array('I', offsets)
+        # Stable sort: equal scores in the load order
+        self._ranked = array('I', sorted(
+            range(len(self._scores)), key=self._scores.__getitem__,
+            reverse=True,
+        ))
+
+    def __len__(self) -> int:
+        return len(self._scores) - len(self._dropped)
+
+    def memory(self) -> int:
+        """Bytes taken by the buffers and arrays."""
+        arrays = (
+            self._key_starts, self._label_starts, self._scores,
+            self._entries, self._ranked,
+        )
+        return len(self._ids) + len(self._keys) + len(self._labels) + sum(
+            len(values) * values.itemsize for values in arrays
+        )
+
+    def _append(self, item_id: uuid.UUID, label: str, score: float) -> list:
+        """Store the name, return the offsets of its words."""
+        start = len(self._keys)
+        self._ids += item_id.bytes
+        self._key_starts.append(start)
+        self._keys += normalize(label).encode()
+        self._keys.append(_SEPARATOR)
+        self._label_starts.append(len(self._labels))
+        self._labels += label.encode()
+        self._scores.append(score)
+        return self._words(start)
+
+    def _words(self, start: int) -> list[int]:
+        """Offsets of the words of the key at the start."""
+        end = self._keys.index(_SEPARATOR, start)
+        if end == start:
+            return []
+        offsets = [start]
+        position = self._keys.find(b' ', start, end)
+        while position != -1:
+            offsets.append(position + 1)
+            position = self._keys.find(b' ', position + 1, end)
+        return offsets
+
+    def _key_at(self, offset: int) -> bytes:
+        return bytes(self._keys[offset:self._keys.index(_SEPARATOR, offset)])
+
+    def _item_at(self, offset: int) -> int:
+        return bisect_right(self._key_starts, offset) - 1
+
+    def _id(self, item: int) -> uuid.UUID:
+        return uuid.UUID(bytes=bytes(
+            self._ids[item * _ID_SIZE:(item + 1) * _ID_SIZE],
+        ))
+
+    def _label(self, item: int) -> str:
+        end = (
+            self._label_starts[item + 1]
+            if item + 1 < len(self._label_starts) else len(self._labels)
+        )
+        return self._labels[self._label_starts[item]:end].decode()
+
+    def _lower_bound(self, prefix: bytes) -> int:
+        """First entry whose key is not below the prefix."""
+        # A longer key is cut, a shorter one meets the separator (below
+        # every key byte): either way cut keys compare as whole ones
+        size = len(prefix)
+        low, high = 0, len(self._entries)
+        while low < high:
+            middle = (low + high) // 2
+            offset = self._entries[middle]
+            if self._keys[offset:offset + size] < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _rank(self, low: int, high: int, limit: int) -> list[int]:
+        """Best names of the entries, equal scores in the load order."""
+        items = sorted({
+            self._item_at(self._entries[index]) for index in range(low, high)
+        })
+        return heapq.nlargest(limit, items, key=self._scores.__getitem__)
+
+    def _walk(
+        self, prefix: bytes, limit: int, budget: int,
+    ) -> Optional[list[int]]:
+        """Best names with a word starting the prefix, in score order.
+
+        None if more than "budget" names are checked: the matches are
+        mostly the low scored ones.
+        """
+        inner = b' ' + prefix
+        items = []
+        for checked, item in enumerate(self._ranked):
+            if checked == budget:
+                return None
+            if item in self._dropped:
+                continue
+            start = self._key_starts[item]
+            key = self._keys[start:self._keys.index(_SEPARATOR, start)]
+            if key.startswith(prefix) or inner in key:
+                items.append(item)
+                if len(items) == limit:
+                    break
+        return items
+
+    def search(self, query: str, limit: int) -> list[tuple[uuid.UUID, str]]:
+        """(id, label) of the best names with a word starting the query."""
+        prefix = normalize(query).encode()
+        if not prefix or limit < 1:
+            return []
+        with self._lock:
+            low = self._lower_bound(prefix)
+            high = self._lower_bound(prefix + _BEYOND)
+            if high - low <= _SCAN_LIMIT:
+                items = self._rank(low, high, limit)
+            else:
+                items = self._top.get(prefix)
+                if items is None:
+                    items = self._ranking(prefix, low, high)
+            return [
+                (self._id(item), self._label(item)) for item in items[:limit]
+            ]
+
+    def _ranking(self, prefix: bytes, low: int, high: int) -> list[int]:
+        items = None
+        # Names to check in score order, until enough of them match
+        if high - low > math.sqrt(SUGGEST_MAX_LIMIT * len(self._ranked)):
+            items = self._walk(prefix, SUGGEST_MAX_LIMIT, high - low)
+        if items is None:
+            items = self._rank(low, high, SUGGEST_MAX_LIMIT)
+        if len(self._top) >= _CACHED_PREFIXES:
+            self._top.clear()
+        self._top[prefix] = items
+        return items
+
+    def _find(self, item_id: uuid.UUID) -> Optional[int]:
+        position = self._ids.find(item_id.bytes)
+        while position != -1 and position % _ID_SIZE:
+            position = self._ids.find(item_id.bytes, position + 1)
+        return None if position == -1 else position // _ID_SIZE
+
+    def _forget(self, offsets: Iterable[int]) -> None:
+        """Drop cached rankings of every prefix of the keys."""
+        for offset in offsets:
+            key = self._key_at(offset)
+            for size in range(1, len(key) + 1):
+                self._top.pop(key[:size], None)
+
+    def _drop(self, item: int) -> float:
+        """Remove the words of the name, return its score."""
+        offsets = self._words(self._key_starts[item])
+        self._forget(offsets)
+        for offset in offsets:
+            index = self._lower_bound(self._key_at(offset))
+            while self._entries[index] != offset:
+                index += 1
+            del self._entries[index]
+        # Its id and place in "ranked" stay until the next compaction
+        self._ids[item * _ID_SIZE:(item + 1) * _ID_SIZE] = bytes(_ID_SIZE)
+        self._dropped.add(item)
+        return self._scores[item]
+
+    def _rank_position(self, score: float) -> int:
+        """Place in "ranked" after the names scored the same or higher."""
+        low, high = 0, len(self._ranked)
+        while low < high:
+            middle = (low + high) // 2
+            if self._scores[self._ranked[middle]] >= score:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def put(
+        self,
+        item_id: uuid.UUID,
+        label: str,
+        score: Optional[float] = None,
+    ) -> None:
+        """Add or rename the name, None score keeps the current one."""
+        with self._lock:
+            item = self._find(item_id)
+            if item is not None:
+                current = self._drop(item)
+                if score is None:
+                    score = current
+            score = score or 0
+            offsets = self._append(item_id, label, score)
+            self._forget(offsets)
+            for offset in offsets:
+                index = self._lower_bound(self._key_at(offset))
+                self._entries.insert(index, offset)
+            self._ranked.insert(
+                self._rank_position(score), len(self._scores) - 1,
+            )
+            self._compact()
+
+    def discard(self, item_id: uuid.UUID) -> None:
+        with self._lock:
+            item = self._find(item_id)
+            if item is not None:
+                self._drop(item)
+                self._compact()
+
+    def _compact(self) -> None:
+        if len(self._dropped) <= len(self._scores) * _GARBAGE_SHARE:
+            return
+        self._load([
+            (self._id(item), self._label(item), self._scores[item])
+            for item in range(len(self._scores))
+            if item not in self._dropped
+        ])
+
+
+def _film_rows():
+    rows = FilmWork.objects.values_list('id', 'title', 'rating')
+    for film_id, title, rating in rows.iterator():
+        yield film_id, title, rating or 0
+
+
+def _person_rows():
+    rows = Person.objects.annotate(
+        credits=Count('personfilmwork'),
+    ).values_list('id', 'full_name', 'credits')
+    yield from rows.iterator()
+
+
+# Kind -> rows of (id, label, score)
+SOURCES: dict[str, Callable] = {
+    'films': _film_rows,
+    'persons': _person_rows,
+}
+# Model -> kind and (label, score) of an instance. Credits don't change
+# with the person, None keeps the score
+_MODELS = {
+    FilmWork: ('films', lambda film: (film.title, film.rating or 0)),
+    Person: ('persons', lambda person: (person.full_name, None)),
+}
+
+# Kind -> (index, monotonic time of the load)
+_indexes = {}
+_loading = threading.Lock()
+
+
+def get_index(kind: str) -> PrefixIndex:
+    """Index of the kind, loaded (again) if missing or too old.
+
+    While one thread loads an old index anew, others keep using it.
+    """
+    loaded = _indexes.get(kind)
+    if loaded is None:
+        with _loading:
+            # Another thread may have loaded it meanwhile
+            loaded = _indexes.get(kind)
+            if loaded is None:
+                loaded = _load(kind)
+    elif time.monotonic() - loaded[1] > settings.SUGGEST_MAX_AGE:
+        if _loading.acquire(blocking=False):
+            try:
+                loaded = _load(kind)
+            finally:
+                _loading.release()
+    return loaded[0]
+
+
+def _load(kind: str) -> tuple[PrefixIndex, float]:
+    loaded = (PrefixIndex(SOURCES[kind]()), time.monotonic())
+    _indexes[kind] = loaded
+    return loaded
+
+
+def loaded_index(kind: str) -> Optional[PrefixIndex]:
+    """Index of the kind if this process has one, to apply a change."""
+    loaded = _indexes.get(kind)
+    return None if loaded is None else loaded[0]
+
+
+def suggest(query: str, limit: int) -> dict[str, list]:
+    """Best films and persons for a typed prefix."""
+    return {
+        'films': [
+            {'id': film_id, 'title': title}
+            for film_id, title in get_index('films').search(query, limit)
+        ],
+        'persons': [
+            {'id': person_id, 'full_name': full_name}
+            for person_id, full_name in get_index('persons').search(
+                query, limit,
+            )
+        ],
+    }
+
+
+def apply_saved(instance: models.Model) -> None:
+    """Put a saved film or person to the index of the process on commit."""
+    kind, suggestion = _MODELS[type(instance)]
+    index = loaded_index(kind)
+    if index is not None:
+        transaction.on_commit(partial(
+            index.put, instance.pk, *suggestion(instance),
+        ))
+
+
+def apply_deleted(model: type, item_ids: Iterable) -> None:
+    """Drop deleted films or persons from the index on commit."""
+    index = loaded_index(_MODELS[model][0])
+    if index is not None:
+        item_ids = list(item_ids)
+        transaction.on_commit(lambda: [
+            index.discard(item_id) for item_id in item_ids
+        ])
@@ -0,0 +1,171 @@
+"""Reproducible synthetic catalogue of controllable size.
+
+The same spec (seed included) always gives the same rows and ids, which
+are derived from row numbers, so huge catalogues are generated as a
+stream without keeping ids in memory.
+"""
+
+import bisect
+import datetime
+import itertools
+import random
+import uuid
+from dataclasses import dataclass
+from typing import Iterator
+
+from movies.loader import TABLES, copy_batch
+from movies.models import FilmWork, PersonFilmWork
+
+_NAMESPACE = uuid.UUID('6f1c1f0e-3a52-4c7e-9a55-2b0c93c0e6a1')
+_FIRST_DATE = datetime.date(1950, 1, 1)
+_DAYS = 365 * 72
+_WORDS = (
+    'star', 'night', 'war', 'love', 'city', 'dark', 'river', 'king', 'last',
+    'secret', 'storm', 'house', 'road', 'fire', 'winter', 'blood', 'dream',
+    'island', 'shadow', 'golden', 'lost', 'wild', 'silent', 'iron', 'empire',
+    'ghost', 'summer', 'heart', 'ocean', 'hunter', 'crown', 'return', 'space',
+    'mountain', 'garden', 'machine', 'mirror', 'journey', 'legend', 'game',
+)
+_FIRST_NAMES = (
+    'Anna', 'Boris', 'Clara', 'David', 'Elena', 'Frank', 'Grace', 'Henry',
+    'Irina', 'James', 'Kate', 'Leon', 'Maria', 'Nikolay', 'Olga', 'Peter',
+    'Rosa', 'Sergey', 'Tom', 'Vera',
+)
+_LAST_NAMES = (
+    'Adams', 'Brown', 'Clark', 'Davis', 'Evans', 'Fisher', 'Green', 'Hill',
+    'Ivanov', 'Jones', 'King', 'Lee', 'Miller', 'Novak', 'Orlov', 'Parker',
+    'Quinn', 'Reed', 'Smith', 'Turner',
+)
+
+
+@dataclass(frozen=True)
+class CatalogueSpec:
+    """Size and shape of a synthetic catalogue."""
+
+    films: int = 10000
+    persons: int = 5000
+    genres: int = 25
+    genres_per_film: tuple[int, int] = (1, 3)
+    persons_per_film: tuple[int, int] = (3, 15)
+    # Zipf exponent of person popularity, 0 - all persons are equal
+    person_skew: float = 1.0
+    seed: int = 0
+
+
+def _uuid(kind: str, *numbers: int) -> uuid.UUID:
+    return uuid.uuid5(_NAMESPACE, '-'.join((kind, *map(str, numbers))))
+
+
+def film_id(number: int) -> uuid.UUID:
+    return _uuid('film', number)
+
+
+def person_id(number: int) -> uuid.UUID:
+    return _uuid('person', number)
+
+
+def genre_id(number: int) -> uuid.UUID:
+    return _uuid('genre', number)
+
+
+def _random(spec: CatalogueSpec, table: str) -> random.Random:
+    # Own generator per table: tables are reproducible one by one
+    return random.Random('{0}-{1}'.format(spec.seed, table))
+
+
+def _words(rnd: random.Random, low: int, high: int) -> str:
+    return ' '.join(rnd.choices(_WORDS, k=rnd.randint(low, high)))
+
+
+def genre_rows(spec: CatalogueSpec) -> Iterator[dict]:
+    for number in range(spec.genres):
+        yield {
+            'id': genre_id(number),
+            'name': 'synthetic genre {0}'.format(number),
+        }
+
+
+def person_rows(spec: CatalogueSpec) -> Iterator[dict]:
+    rnd = _random(spec, 'person')
+    for number in range(spec.persons):
+        yield {
+            'id': person_id(number),
+            'full_name': '{0} {1} {2}'.format(
+                rnd.choice(_FIRST_NAMES), rnd.choice(_LAST_NAMES), number,
+            ),
+        }
+
+
+def film_rows(spec: CatalogueSpec) -> Iterator[dict]:
+    rnd = _random(spec, 'film')
+    film_types = [choice for choice, _ in FilmWork._FilmType.choices if choice]
+    for number in range(spec.films):
+        yield {
+            'id': film_id(number),
+            'title': _words(rnd, 1, 4).title(),
+            'description': _words(rnd, 10, 40).capitalize() + '.',
+            'creation_date': _FIRST_DATE + datetime.timedelta(
+                days=rnd.randrange(_DAYS),
+            ),
+            'rating': round(rnd.uniform(0, 10), 1),
+            'type': rnd.choices(film_types, weights=(4, 1))[0],
+        }
+
+
+def genre_link_rows(spec: CatalogueSpec) -> Iterator[dict]:
+    rnd = _random(spec, 'genre_film_work')
+    low, high = spec.genres_per_film
+    for film in range(spec.films):
+        count = min(rnd.randint(low, high), spec.genres)
+        for genre in rnd.sample(range(spec.genres), count):
+            yield {
+                'film_work_id': film_id(film),
+                'genre_id': genre_id(genre),
+            }
+
+
+def person_link_rows(spec: CatalogueSpec) -> Iterator[dict]:
+    rnd = _random(spec, 'person_film_work')
+    low, high = spec.persons_per_film
+    # Popular persons (low numbers) get most of the credits
+    cumulative = list(itertools.accumulate(
+        1 / (rank ** spec.person_skew) for rank in range(1, spec.persons + 1)
+    ))
+    total = cumulative[-1]
+    last = spec.persons - 1
+    roles = (
+        PersonFilmWork.Role.ACTOR,
+        PersonFilmWork.Role.DIRECTOR,
+        PersonFilmWork.Role.WRITER,
+    )
+    for film in range(spec.films):
+        persons = {
+            min(bisect.bisect(cumulative, rnd.random() * total), last)
+            for _ in range(rnd.randint(low, high))
+        }
+        for person in sorted(persons):
+            yield {
+                'film_work_id': film_id(film),
+                'person_id': person_id(person),
+                'role': rnd.choices(roles, weights=(8, 1, 1))[0],
+            }
+
+
+def seed_catalogue(
+    spec: CatalogueSpec,
+    batch_size: int = 10000,
+) -> Iterator[tuple[str, int]]:
+    """Load the catalogue, yield (table name, rows done) per batch."""
+    generators = (
+        genre_rows, person_rows, film_rows, genre_link_rows, person_link_rows,
+    )
+    for table, generator in zip(TABLES, generators):
+        rows = generator(spec)
+        done = 0
+        while True:
+            batch = list(itertools.islice(rows, batch_size))
+            if not batch:
+                break
+            copy_batch(table, batch)
+            done += len(batch)
+            yield table.name, done
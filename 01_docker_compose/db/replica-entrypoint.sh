@@ -0,0 +1,15 @@
+#!/bin/sh
+# Streaming replica of PRIMARY_HOST, cloned on the first start
+set -e
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+  until pg_isready -h "$PRIMARY_HOST" -p "$PRIMARY_PORT"; do
+    sleep 1
+  done
+  # "-R" writes the standby configuration, "-X stream" the WAL of the copy
+  PGPASSWORD="$POSTGRES_PASSWORD" pg_basebackup -h "$PRIMARY_HOST" \
+    -p "$PRIMARY_PORT" -U "$POSTGRES_USER" -D "$PGDATA" -R -X stream
+fi
+
+# Skips initialization of the populated directory, fixes its owner
+exec docker-entrypoint.sh postgres
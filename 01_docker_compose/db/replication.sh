@@ -0,0 +1,4 @@
+#!/bin/sh
+# Let "postgres-replica" service stream WAL from this server (first
+# start of an empty data directory only, like any init script)
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"